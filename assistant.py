@@ -0,0 +1,151 @@
+import argparse
+import time
+
+from services.env_loader import EnvLoader
+from services.rag_engine import CORPORA, RagEngine, format_citations
+from services.behavior_analysis_services import analyze_behavior_text
+from services.behavior_worker import BehaviorAnalysisQueue, behavior_analysis_options
+from services.interaction_log import InteractionLog
+from services.telemetry import METRICS, format_summary
+
+
+def format_latency(metrics):
+    """Formats streaming metrics as 'first token 0.84s, 12.3 tokens/s, total 9.10s'."""
+    parts = []
+    if metrics["time_to_first_token"] is not None:
+        parts.append(f"first token {metrics['time_to_first_token']:.2f}s")
+    if metrics["tokens_per_second"] is not None:
+        parts.append(f"{metrics['tokens_per_second']:.1f} tokens/s")
+    if metrics["total_time"] is not None:
+        parts.append(f"total {metrics['total_time']:.2f}s")
+    return ", ".join(parts)
+
+
+def log_turn(interaction_log, record, markers, seconds):
+    """Completes a turn record with its behavior markers and queues it."""
+    record["markers"] = markers
+    record["timings"]["behavior_analysis"] = seconds
+    interaction_log.write(record)
+
+
+def run_chat(corpora=None):
+    """
+    Interactive loop answering from one or more corpora with a single engine.
+
+    Every turn is written to the structured interaction log (LOG_DIR).
+
+    Args:
+        corpora (list): Corpus names from CORPORA (all of them when omitted)
+    """
+    env = EnvLoader()
+    engine = RagEngine(env, corpora=corpora)
+    if not engine.retrievers:
+        print("⚠️ No documents found to index.")
+        return
+
+    interaction_log = InteractionLog.from_env(env)
+    analysis = None
+    if env.BEHAVIOR_WORKERS > 0:
+        analysis = BehaviorAnalysisQueue.from_env(
+            env,
+            lambda record, markers, seconds: log_turn(
+                interaction_log, record, markers, seconds
+            ),
+        )
+
+    if env.STARTUP_PROFILE:
+        print(engine.startup.report())
+
+    print("\n" + "=" * 60)
+    print("Chat is ready!")
+    print(f"Corpora: {', '.join(engine.retrievers)}")
+    print("Ask about climate change and psychology.")
+    print("Type 'exit' or 'quit' to finish.")
+    print("=" * 60)
+
+    while True:
+        print("\n🎤 Enter your question")
+        question = input("You: ")
+
+        if question.lower() in ["exit", "quit"]:
+            print("👋 Shutting down the assistant. See you!")
+            break
+
+        if not question.strip():
+            continue
+
+        began = time.perf_counter()
+        if env.STREAM_ANSWERS:
+            response = engine.stream_query(question)
+            print("Assistant: ", end="", flush=True)
+            for token in response:
+                print(token, end="", flush=True)
+            print()
+            answer = response.response
+            latency = response.metrics()
+            print(f"⏱️ {format_latency(latency)}")
+        else:
+            response = engine.query(question)
+            answer = response.response
+            latency = {}
+            print(f"Assistant: {answer}")
+
+        metadata = response.metadata or {}
+        if metadata.get("cache"):
+            print(f"⚡ Answer served from the {metadata['cache']} cache.")
+        if metadata.get("prompt_tokens"):
+            tokens = metadata["prompt_tokens"]
+            print(f"✂️ Prompt compressed from {tokens['before']} to {tokens['after']} tokens.")
+        if metadata.get("citations"):
+            print(f"📚 Sources:\n{format_citations(metadata['citations'])}")
+
+        record = {
+            "corpora": list(engine.retrievers),
+            "question": question,
+            "answer": answer,
+            "cache": metadata.get("cache"),
+            "sources": [n.node.node_id for n in response.source_nodes],
+            "timings": dict(metadata.get("timings", {})),
+            "prompt_tokens": metadata.get("prompt_tokens"),
+            "answer_seconds": time.perf_counter() - began,
+            **latency,
+        }
+        if analysis is not None:
+            analysis.submit(answer, record)
+            print("🧠 Behavior analysis queued.")
+            continue
+
+        print("🧠 Evaluating behavioral markers of the response...")
+        began = time.perf_counter()
+        markers = analyze_behavior_text(answer, **behavior_analysis_options(env))
+        print("📊 Markers:", markers)
+        log_turn(interaction_log, record, markers, time.perf_counter() - began)
+
+    if analysis is not None:
+        if analysis.pending():
+            print(f"⏳ Waiting for {analysis.pending()} behavior analyses to finish...")
+        analysis.close()
+    interaction_log.close()
+    print(f"💾 Conversation logged to {interaction_log.path}")
+    if engine.telemetry is not None:
+        print(format_summary(METRICS.summary()))
+    engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ask questions across several document corpora at once."
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=sorted(CORPORA),
+        help="Corpus to search (repeatable). Defaults to all of them.",
+    )
+    args = parser.parse_args()
+
+    run_chat(args.corpus)
+
+
+if __name__ == "__main__":
+    main()
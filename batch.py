@@ -0,0 +1,181 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from loaders.question_loader import load_questions
+from services.behavior_analysis_services import analyze_behavior_text
+from services.behavior_worker import behavior_analysis_options
+from services.env_loader import EnvLoader
+from services.rag_engine import CORPORA, RagEngine, citations
+from services.telemetry import METRICS, format_summary
+
+
+def completed_ids(path):
+    """
+    Ids already answered in an earlier run of the same output file.
+
+    Records with an 'error' are not counted, so failed questions are retried.
+    A truncated last line (the process died mid-write) is ignored.
+    """
+    done = set()
+    if not Path(path).exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+class ResultWriter:
+    """Appends one JSON line per result, flushed right away as the checkpoint."""
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a+", encoding="utf-8")
+        self._lock = threading.Lock()
+        # A partial last line would merge with the next record
+        self._file.seek(0, 2)
+        if self._file.tell():
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def answer(engine, item, embedding, corpora, behavior_options):
+    """Runs one question through retrieval, generation and behavior analysis."""
+    record = {"id": item["id"], "question": item["question"]}
+    began = time.perf_counter()
+    try:
+        response = engine.query(item["question"], corpora, embedding=embedding)
+        metadata = response.metadata or {}
+        record.update(
+            {
+                "answer": response.response,
+                "cache": metadata.get("cache"),
+                "sources": citations(response.source_nodes),
+                "timings": metadata.get("timings", {}),
+                "prompt_tokens": metadata.get("prompt_tokens"),
+            }
+        )
+        if behavior_options is not None:
+            analysis_began = time.perf_counter()
+            record["behavior"] = analyze_behavior_text(response.response, **behavior_options)
+            record["timings"]["behavior_analysis"] = time.perf_counter() - analysis_began
+    except Exception as e:
+        record["error"] = repr(e)
+    record["seconds"] = time.perf_counter() - began
+    return record
+
+
+def run(args):
+    questions = load_questions(args.input, field=args.field)
+    if args.limit:
+        questions = questions[: args.limit]
+    done = completed_ids(args.output)
+    pending = [q for q in questions if q["id"] not in done]
+    if done:
+        print(
+            f"⏭️ Resuming: {len(questions) - len(pending)} of {len(questions)} "
+            "already answered."
+        )
+    if not pending:
+        print("✅ Nothing left to answer.")
+        return
+
+    env = EnvLoader()
+    engine = RagEngine(env, corpora=args.corpus)
+    behavior_options = behavior_analysis_options(env) if args.behavior else None
+    writer = ResultWriter(args.output)
+    try:
+        print(f"🧮 Embedding {len(pending)} questions...")
+        began = time.perf_counter()
+        embeddings = []
+        try:
+            for start in range(0, len(pending), args.embed_batch_size):
+                batch = pending[start : start + args.embed_batch_size]
+                embeddings.extend(engine.embed_queries([q["question"] for q in batch]))
+            print(f"   done in {time.perf_counter() - began:.2f}s")
+        except Exception as e:
+            # Each question then gets embedded (or searched lexically) on its own
+            print(f"⚠️ Batch embedding failed ({e!r}); embedding per question.")
+            embeddings = [None] * len(pending)
+
+        print(f"💬 Answering with {args.parallel} parallel workers...")
+        failed = 0
+        with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+            futures = [
+                pool.submit(answer, engine, item, embedding, args.corpus, behavior_options)
+                for item, embedding in zip(pending, embeddings)
+            ]
+            for finished, future in enumerate(as_completed(futures), start=1):
+                record = future.result()
+                writer.write(record)
+                if "error" in record:
+                    failed += 1
+                    print(f"❌ [{finished}/{len(pending)}] {record['id']}: {record['error']}")
+                else:
+                    print(
+                        f"✅ [{finished}/{len(pending)}] {record['id']} "
+                        f"({record['seconds']:.2f}s)"
+                    )
+        print(f"📝 Results appended to {args.output}" + (f", {failed} failed" if failed else ""))
+        if engine.telemetry is not None:
+            print(format_summary(METRICS.summary()))
+    finally:
+        writer.close()
+        engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer a file of questions (prompts text or JSONL) into a JSONL file. "
+        "Re-running with the same output resumes where it stopped."
+    )
+    parser.add_argument("input", help="Questions: a text file or a .jsonl file")
+    parser.add_argument("--output", help="Results JSONL (default <input>.results.jsonl)")
+    parser.add_argument(
+        "--field", help="JSONL field holding the question (default: question/prompt/text...)"
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=sorted(CORPORA),
+        help="Corpus to query (repeatable). Defaults to all of them.",
+    )
+    parser.add_argument(
+        "--parallel", type=int, default=2, help="Questions answered at the same time"
+    )
+    parser.add_argument(
+        "--behavior", action="store_true", help="Also run behavior analysis on each answer"
+    )
+    parser.add_argument("--limit", type=int, help="Answer only the first N questions")
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=256,
+        help="Questions per embedding request",
+    )
+    args = parser.parse_args()
+    args.output = args.output or str(Path(args.input).with_suffix(".results.jsonl"))
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
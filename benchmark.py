@@ -0,0 +1,274 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fake_ollama import FakeOllama
+from benchmarks.fake_pinecone import FakePinecone
+from loaders.question_loader import load_questions
+from log_query import percentile
+
+# Metrics compared against a baseline: (path in the results, higher is better)
+TRACKED_METRICS = [
+    (("extraction", "documents_per_second"), True),
+    (("ingestion", "chunks_per_second"), True),
+    (("retrieval", "p50"), False),
+    (("retrieval", "p95"), False),
+    (("end_to_end", "p50"), False),
+    (("end_to_end", "p95"), False),
+    (("behavior_analysis", "p50"), False),
+    (("peak_rss_mb",), False),
+]
+
+
+def latency_summary(samples) -> dict:
+    """Count, mean and nearest-rank percentiles of latencies in seconds."""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": max(samples),
+    }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(function, *args, **kwargs):
+    began = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - began
+
+
+def run(args) -> dict:
+    """Runs every stage against the fake servers and returns the results."""
+    ollama_server = FakeOllama(
+        embed_latency=args.embed_latency,
+        prompt_token_latency=args.prompt_token_latency,
+        token_latency=args.token_latency,
+        answer_tokens=args.answer_tokens,
+    )
+    pinecone_server = FakePinecone(request_latency=args.pinecone_latency)
+    questions = [q["question"] for q in load_questions(args.questions)]
+    questions = questions[: args.limit] if args.limit else questions
+    questions = questions * args.repeat
+
+    with ollama_server, pinecone_server, tempfile.TemporaryDirectory() as workdir:
+        os.environ.update(
+            {
+                "OLLAMA_HOST": ollama_server.url,
+                "PINECONE_CONTROLLER_HOST": pinecone_server.url,
+                "PINECONE_API_KEY": "benchmark",
+                "VECTOR_BACKEND": "pinecone",
+                "CACHE_DIR": str(Path(workdir) / "cache"),
+                "LOG_DIR": str(Path(workdir) / "logs"),
+                "INGEST_WORKERS": str(args.workers),
+                "EMBEDDING_CACHE": str(args.with_caches),
+                "ANSWER_CACHE": str(args.with_caches),
+            }
+        )
+        # Imported once the environment points at the fake servers: the
+        # ollama client library reads OLLAMA_HOST when it is first used
+        from chatbot import gather_documents
+        from services.behavior_analysis_services import analyze_behavior_text
+        from services.behavior_worker import behavior_analysis_options
+        from services.env_loader import EnvLoader
+        from services.rag_engine import CORPORA, RagEngine
+
+        corpora = args.corpus or ["llama"]
+        subfolders = [CORPORA[name].subfolder for name in corpora]
+
+        print("📄 Extracting PDFs with gather_documents...")
+        documents, extraction_seconds = [], 0.0
+        for subfolder in dict.fromkeys(subfolders):
+            found, seconds = timed(
+                gather_documents, args.data_folder, subfolder, workers=args.workers
+            )
+            documents.extend(found)
+            extraction_seconds += seconds
+
+        print("📥 Ingesting into the fake Pinecone index...")
+        env = EnvLoader()
+        engine, ingestion_seconds = timed(RagEngine, env, corpora=corpora)
+        chunks = pinecone_server.vector_count()
+
+        print(f"🔎 Retrieving for {len(questions)} questions...")
+        retrieval = [timed(engine.retrieve, q)[1] for q in questions]
+
+        print(f"💬 Answering {len(questions)} questions...")
+        end_to_end, answers, prompt_tokens = [], [], []
+        for question in questions:
+            response, seconds = timed(engine.query, question)
+            end_to_end.append(seconds)
+            answers.append(response.response)
+            if (response.metadata or {}).get("prompt_tokens"):
+                prompt_tokens.append(response.metadata["prompt_tokens"])
+
+        print("🧠 Analyzing behavior markers...")
+        options = behavior_analysis_options(env)
+        behavior = [timed(analyze_behavior_text, a, **options)[1] for a in answers]
+
+        ollama_requests = dict(ollama_server.requests)
+        pinecone_requests = dict(pinecone_server.requests)
+
+    results = {
+        "timestamp": datetime.datetime.now().astimezone().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            key: value for key, value in vars(args).items() if key not in ("output", "baseline")
+        },
+        "extraction": {
+            "documents": len(documents),
+            "seconds": extraction_seconds,
+            "documents_per_second": len(documents) / extraction_seconds
+            if extraction_seconds
+            else None,
+        },
+        "ingestion": {
+            "chunks": chunks,
+            "seconds": ingestion_seconds,
+            "chunks_per_second": chunks / ingestion_seconds if ingestion_seconds else None,
+        },
+        "retrieval": latency_summary(retrieval),
+        "end_to_end": latency_summary(end_to_end),
+        "behavior_analysis": latency_summary(behavior),
+        "peak_rss_mb": peak_rss_mb(),
+        "requests": {"ollama": ollama_requests, "pinecone": pinecone_requests},
+    }
+    if prompt_tokens:
+        results["prompt_tokens"] = {
+            "before_mean": sum(t["before"] for t in prompt_tokens) / len(prompt_tokens),
+            "after_mean": sum(t["after"] for t in prompt_tokens) / len(prompt_tokens),
+        }
+    return results
+
+
+def _lookup(results, path):
+    for key in path:
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints each tracked metric next to its baseline value.
+
+    Returns:
+        list: Names of the metrics that got worse by more than `tolerance`
+    """
+    regressions = []
+    for path, higher_is_better in TRACKED_METRICS:
+        current, previous = _lookup(results, path), _lookup(baseline, path)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        name = ".".join(path)
+        flag = "❌" if worse > tolerance else "✅"
+        print(f"{flag} {name}: {previous:.4f} -> {current:.4f} ({change:+.1%})")
+        if worse > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark ingestion, retrieval and answering against local "
+        "Ollama and Pinecone stand-ins."
+    )
+    parser.add_argument("--data-folder", default="data")
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        help="Corpus to ingest and query (repeatable, default 'llama': every PDF)",
+    )
+    parser.add_argument("--questions", default="data/prompts/prompts.txt")
+    parser.add_argument("--limit", type=int, help="Use only the first N questions")
+    parser.add_argument("--repeat", type=int, default=1, help="Ask every question N times")
+    parser.add_argument("--workers", type=int, default=1, help="PDF parsing processes")
+    parser.add_argument(
+        "--with-caches",
+        action="store_true",
+        help="Keep the embedding and answer caches on (cold at start)",
+    )
+    parser.add_argument("--embed-latency", type=float, default=0.002, help="Seconds per text")
+    parser.add_argument(
+        "--prompt-token-latency",
+        type=float,
+        default=0.0005,
+        help="Seconds per prompt token before the first generated token",
+    )
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Seconds per token")
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument(
+        "--pinecone-latency", type=float, default=0.005, help="Seconds per data plane call"
+    )
+    parser.add_argument("--output", help="Results file (default benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.10,
+        help="Relative slowdown tolerated before --baseline reports a regression",
+    )
+    args = parser.parse_args()
+
+    results = run(args)
+
+    output = Path(
+        args.output
+        or Path("benchmarks/results") / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    print("\n" + "=" * 60)
+    print(
+        f"📄 extraction: {results['extraction']['documents_per_second'] or 0:.1f} docs/s, "
+        f"📥 ingestion: {results['ingestion']['chunks_per_second'] or 0:.1f} chunks/s"
+    )
+    for stage in ("retrieval", "end_to_end", "behavior_analysis"):
+        summary = results[stage]
+        if summary["count"]:
+            print(
+                f"⏱️ {stage}: p50 {summary['p50']:.3f}s, p95 {summary['p95']:.3f}s, "
+                f"p99 {summary['p99']:.3f}s"
+            )
+    print(f"💾 peak RSS {results['peak_rss_mb']:.0f} MB, results saved to {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"⚠️ Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import datetime
+import hashlib
+import json
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from services.bm25_index import tokenize
+
+ANSWER = (
+    "Extreme weather and rising temperatures are linked to anxiety, stress and "
+    "lower wellbeing, and community support and green spaces help people cope. "
+)
+
+
+@lru_cache(maxsize=100_000)
+def _token_vector(token, dimension):
+    seed = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+
+
+def fake_embedding(text, dimension=768):
+    """
+    Deterministic embedding: the normalized sum of per-token random vectors.
+
+    Texts sharing vocabulary get similar vectors, so retrieval over it
+    returns plausible neighbours without a model.
+    """
+    vector = np.zeros(dimension, dtype=np.float32)
+    for token in tokenize(text) or [text]:
+        vector += _token_vector(token, dimension)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def _resolve(schema, root):
+    if "$ref" in schema:
+        return _resolve(root["$defs"][schema["$ref"].rsplit("/", 1)[-1]], root)
+    return schema
+
+
+def fake_instance(schema, root=None, items=1):
+    """Builds a minimal value matching a JSON schema (objects, arrays, strings)."""
+    root = root or schema
+    schema = _resolve(schema, root)
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            name: fake_instance(prop, root, items)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [fake_instance(schema["items"], root) for _ in range(items)]
+    if kind in ("number", "integer"):
+        return 0
+    if kind == "boolean":
+        return False
+    return "neutral"
+
+
+class FakeOllama:
+    """
+    Local HTTP server answering the Ollama API endpoints the app uses.
+
+    /api/embed returns deterministic embeddings, /api/chat and /api/generate
+    return a fixed answer (streamed as NDJSON when asked) or, when a JSON
+    schema is given as `format`, a minimal object matching it. Latencies
+    simulate a CPU-bound model: prompt processing per prompt token, then
+    one delay per generated token.
+    """
+
+    def __init__(
+        self,
+        embed_latency=0.0,
+        prompt_token_latency=0.0,
+        token_latency=0.0,
+        answer_tokens=60,
+        dimension=768,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.embed_latency = embed_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+        self.dimension = dimension
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def _answer_tokens(self, body):
+        words = ANSWER.split()
+        count = body.get("options", {}).get("num_predict") or self.answer_tokens
+        count = min(count, self.answer_tokens) if count > 0 else self.answer_tokens
+        return [words[i % len(words)] + " " for i in range(count)]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunk(self, payload):
+                data = json.dumps(payload).encode() + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": []})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                fake._count(self.path)
+                if self.path == "/api/embed":
+                    texts = body.get("input", [])
+                    texts = [texts] if isinstance(texts, str) else texts
+                    time.sleep(fake.embed_latency * len(texts))
+                    self._send_json(
+                        {
+                            "model": body.get("model", ""),
+                            "embeddings": [fake_embedding(t, fake.dimension) for t in texts],
+                        }
+                    )
+                elif self.path == "/api/embeddings":
+                    time.sleep(fake.embed_latency)
+                    self._send_json(
+                        {"embedding": fake_embedding(body.get("prompt", ""), fake.dimension)}
+                    )
+                elif self.path in ("/api/chat", "/api/generate"):
+                    self._generate(body, chat=self.path == "/api/chat")
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def _generate(self, body, chat):
+                if chat:
+                    prompt = " ".join(m.get("content") or "" for m in body.get("messages", []))
+                else:
+                    prompt = body.get("prompt", "")
+                time.sleep(fake.prompt_token_latency * len(prompt) / 4)
+
+                schema = body.get("format")
+                if isinstance(schema, dict):
+                    answers = len(re.findall(r"Answer \d+:", prompt)) or 1
+                    tokens = [json.dumps(fake_instance(schema, items=answers))]
+                elif schema == "json":
+                    tokens = ["{}"]
+                else:
+                    tokens = fake._answer_tokens(body)
+
+                def message(content, done):
+                    payload = {
+                        "model": body.get("model", ""),
+                        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                        "done": done,
+                    }
+                    if chat:
+                        payload["message"] = {"role": "assistant", "content": content}
+                    else:
+                        payload["response"] = content
+                    if done:
+                        payload.update(
+                            done_reason="stop",
+                            prompt_eval_count=len(prompt) // 4,
+                            eval_count=len(tokens),
+                        )
+                    return payload
+
+                if not body.get("stream", True):
+                    time.sleep(fake.token_latency * len(tokens))
+                    self._send_json(message("".join(tokens), True))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(fake.token_latency)
+                    self._send_chunk(message(token, False))
+                self._send_chunk(message("", True))
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
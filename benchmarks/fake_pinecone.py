@@ -0,0 +1,331 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+
+def matches_filter(metadata, condition):
+    """Evaluates a Pinecone metadata filter ($eq, $ne, $in, $nin, $gt(e), $lt(e), $and, $or)."""
+    if not condition:
+        return True
+    for key, expected in condition.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in expected):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, c) for c in expected):
+                return False
+            continue
+        value = metadata.get(key)
+        operators = expected if isinstance(expected, dict) else {"$eq": expected}
+        for operator, operand in operators.items():
+            if operator == "$eq":
+                ok = value == operand or isinstance(value, list) and operand in value
+            elif operator == "$ne":
+                ok = value != operand
+            elif operator == "$in":
+                ok = value in operand
+            elif operator == "$nin":
+                ok = value not in operand
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                ok = {
+                    "$gt": value > operand,
+                    "$gte": value >= operand,
+                    "$lt": value < operand,
+                    "$lte": value <= operand,
+                }[operator]
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            if not ok:
+                return False
+    return True
+
+
+class FakeIndex:
+    def __init__(self, name, dimension, metric):
+        self.name = name
+        self.dimension = dimension
+        self.metric = metric
+        self.namespaces = {}
+        self.lock = threading.Lock()
+
+    def count(self):
+        with self.lock:
+            return sum(len(ns) for ns in self.namespaces.values())
+
+
+class FakePinecone:
+    """
+    Local HTTP server following the Pinecone control and data plane REST API.
+
+    Point the client at it with PINECONE_CONTROLLER_HOST. Every index is
+    served from `<url>/data/<index name>`, which describe_index returns as
+    the index host. Vectors live in memory and queries are exact searches;
+    `request_latency` adds a fixed delay to each data plane call and
+    `throttle_rate` answers that share of them with 429 Too Many Requests.
+    """
+
+    def __init__(self, request_latency=0.0, throttle_rate=0.0, host="127.0.0.1", port=0):
+        self.request_latency = request_latency
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(0)
+        self.indexes = {}
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def vector_count(self):
+        return sum(index.count() for index in self.indexes.values())
+
+    def _count(self, operation):
+        with self._lock:
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+
+    def _throttled(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.throttle_rate
+
+    def _describe(self, index):
+        return {
+            "name": index.name,
+            "dimension": index.dimension,
+            "metric": index.metric,
+            "host": f"{self.url}/data/{index.name}",
+            "vector_type": "dense",
+            "deletion_protection": "disabled",
+            "spec": {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+            "status": {"ready": True, "state": "Ready"},
+        }
+
+    # Data plane operations: each takes the index and the request body
+
+    def _upsert(self, index, body):
+        namespace = body.get("namespace", "")
+        with index.lock:
+            store = index.namespaces.setdefault(namespace, {})
+            for vector in body.get("vectors", []):
+                values = np.asarray(vector["values"], dtype=np.float32)
+                if index.metric == "cosine":
+                    values = values / (np.linalg.norm(values) or 1.0)
+                store[vector["id"]] = (values, vector.get("metadata") or {})
+        return {"upsertedCount": len(body.get("vectors", []))}
+
+    def _query(self, index, body):
+        namespace = body.get("namespace", "")
+        top_k = body.get("topK", 10)
+        with index.lock:
+            store = index.namespaces.get(namespace, {})
+            if "id" in body and body["id"] in store:
+                query = store[body["id"]][0]
+            else:
+                query = np.asarray(body.get("vector", []), dtype=np.float32)
+            items = [
+                (vector_id, values, metadata)
+                for vector_id, (values, metadata) in store.items()
+                if matches_filter(metadata, body.get("filter"))
+            ]
+        if not items or not query.size:
+            return {"matches": [], "namespace": namespace}
+        matrix = np.stack([values for _, values, _ in items])
+        if index.metric == "euclidean":
+            scores = -np.linalg.norm(matrix - query, axis=1)
+        else:
+            if index.metric == "cosine":
+                query = query / (np.linalg.norm(query) or 1.0)
+            scores = matrix @ query
+        best = np.argsort(-scores)[:top_k]
+        matches = []
+        for i in best:
+            vector_id, values, metadata = items[i]
+            match = {"id": vector_id, "score": float(scores[i])}
+            if body.get("includeValues"):
+                match["values"] = values.tolist()
+            if body.get("includeMetadata"):
+                match["metadata"] = metadata
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace, "usage": {"readUnits": 1}}
+
+    def _delete(self, index, body):
+        namespace = body.get("namespace", "")
+        with index.lock:
+            store = index.namespaces.get(namespace, {})
+            if body.get("deleteAll"):
+                store.clear()
+            elif body.get("filter"):
+                for vector_id in [
+                    i for i, (_, m) in store.items() if matches_filter(m, body["filter"])
+                ]:
+                    del store[vector_id]
+            for vector_id in body.get("ids") or []:
+                store.pop(vector_id, None)
+        return {}
+
+    def _stats(self, index, body):
+        with index.lock:
+            namespaces = {
+                name: {"vectorCount": len(store)} for name, store in index.namespaces.items()
+            }
+        return {
+            "namespaces": namespaces,
+            "dimension": index.dimension,
+            "indexFullness": 0.0,
+            "totalVectorCount": sum(ns["vectorCount"] for ns in namespaces.values()),
+        }
+
+    def _fetch(self, index, query):
+        namespace = query.get("namespace", [""])[0]
+        with index.lock:
+            store = index.namespaces.get(namespace, {})
+            vectors = {
+                vector_id: {
+                    "id": vector_id,
+                    "values": store[vector_id][0].tolist(),
+                    "metadata": store[vector_id][1],
+                }
+                for vector_id in query.get("ids", [])
+                if vector_id in store
+            }
+        return {"vectors": vectors, "namespace": namespace}
+
+    def _list(self, index, query):
+        namespace = query.get("namespace", [""])[0]
+        prefix = query.get("prefix", [""])[0]
+        limit = int(query.get("limit", ["100"])[0])
+        start = int(query.get("paginationToken", ["0"])[0])
+        with index.lock:
+            ids = sorted(i for i in index.namespaces.get(namespace, {}) if i.startswith(prefix))
+        page = ids[start : start + limit]
+        response = {"vectors": [{"id": i} for i in page], "namespace": namespace}
+        if start + limit < len(ids):
+            response["pagination"] = {"next": str(start + limit)}
+        return response
+
+    def _handler(self):
+        fake = self
+        operations = {
+            "vectors/upsert": fake._upsert,
+            "query": fake._query,
+            "vectors/delete": fake._delete,
+            "describe_index_stats": fake._stats,
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _data_plane(self, parts):
+                """Returns (index, operation) for /data/<index>/<operation> paths."""
+                if len(parts) < 3 or parts[0] != "data":
+                    return None, None
+                index = fake.indexes.get(parts[1])
+                return index, "/".join(parts[2:])
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts == ["indexes"]:
+                    self._send_json(
+                        {"indexes": [fake._describe(i) for i in fake.indexes.values()]}
+                    )
+                elif len(parts) == 2 and parts[0] == "indexes":
+                    index = fake.indexes.get(parts[1])
+                    if index is None:
+                        self._send_json({"error": {"code": "NOT_FOUND"}, "status": 404}, 404)
+                    else:
+                        self._send_json(fake._describe(index))
+                else:
+                    index, operation = self._data_plane(parts)
+                    if index is None:
+                        self._send_json({"error": "not found"}, 404)
+                        return
+                    fake._count(operation)
+                    time.sleep(fake.request_latency)
+                    if fake._throttled():
+                        self._send_json({"error": {"code": "RESOURCE_EXHAUSTED"}}, 429)
+                    elif operation == "describe_index_stats":
+                        self._send_json(fake._stats(index, {}))
+                    elif operation == "vectors/fetch":
+                        self._send_json(fake._fetch(index, parse_qs(url.query)))
+                    elif operation == "vectors/list":
+                        self._send_json(fake._list(index, parse_qs(url.query)))
+                    else:
+                        self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                parts = urlparse(self.path).path.strip("/").split("/")
+                body = self._body()
+                if parts == ["indexes"]:
+                    name = body["name"]
+                    if name in fake.indexes:
+                        self._send_json({"error": {"code": "ALREADY_EXISTS"}, "status": 409}, 409)
+                        return
+                    fake.indexes[name] = FakeIndex(
+                        name, body.get("dimension"), body.get("metric", "cosine")
+                    )
+                    self._send_json(fake._describe(fake.indexes[name]), 201)
+                    return
+                index, operation = self._data_plane(parts)
+                if index is None or operation not in operations:
+                    self._send_json({"error": "not found"}, 404)
+                    return
+                fake._count(operation)
+                time.sleep(fake.request_latency)
+                if fake._throttled():
+                    self._send_json({"error": {"code": "RESOURCE_EXHAUSTED"}}, 429)
+                    return
+                self._send_json(operations[operation](index, body))
+
+            def do_DELETE(self):
+                parts = urlparse(self.path).path.strip("/").split("/")
+                if len(parts) == 2 and parts[0] == "indexes" and parts[1] in fake.indexes:
+                    del fake.indexes[parts[1]]
+                    self.send_response(202)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+        return Handler
@@ -1,105 +1,60 @@
-import os
-from pathlib import Path
-
-from llama_index.core import VectorStoreIndex, StorageContext, Document
-from llama_index.embeddings.ollama import OllamaEmbedding
-from llama_index.llms.ollama import Ollama
-from llama_index.vector_stores.pinecone import PineconeVectorStore
+from llama_index.core import Document
 
 # from llama_index.embeddings.pinecone import PineconeEmbedding
 
 from loaders.csv_loader import CSVLoader
-from loaders.pdf_loader import PDFLoader
+from loaders.pdf_loader import find_pdf_files, iter_chunks, iter_pdf_pages
 
+from assistant import format_latency
 from services.env_loader import EnvLoader
-from services.pinecone_service import PineconeService
+from services.rag_engine import RagEngine, format_citations
 
 
-def gather_documents(data_folder="data", subfolder=None):
+def iter_documents(data_folder="data", subfolder=None, workers=1):
     """
-    Collects and processes all CSV and PDF documents from the specified folder.
+    Lazily yields a Document per chunk of every PDF in the specified folder.
+
+    Files are parsed, chunked and yielded one at a time, so memory does not
+    grow with the number of PDFs.
 
     Args:
         data_folder (str): Root folder containing 'spreadsheets' and 'pdfs' subfolders
+        subfolder (str): Corpus subfolder to read (every PDF when omitted)
+        workers (int): Number of processes used to parse PDFs. With more than
+            one worker, files are split into page ranges parsed in parallel.
 
-    Returns:
-        list: List of Document objects ready for indexing
+    Yields:
+        Document: One per chunk
     """
-    documents = []
+    pdf_files = find_pdf_files(data_folder, subfolder)
+    for pdf_file, pages, elapsed in iter_pdf_pages(pdf_files, workers=workers):
+        count = 0
+        for chunk in iter_chunks(pages):
+            count += 1
+            yield Document(text=chunk)
+        print(
+            f"PDF '{pdf_file.name}' processed successfully "
+            f"({len(pages)} pages, {count} chunks, {elapsed:.2f}s)."
+        )
+
 
-    # Process PDF files
-    pdf_folder = Path(data_folder) / subfolder
-    for pdf_file in pdf_folder.glob("*.pdf"):
-        chunks = PDFLoader(pdf_file).extract_text_chunks()
-        documents.extend(Document(text=c) for c in chunks)
-        print(f"PDF '{pdf_file.name}' processed successfully.")
+def gather_documents(data_folder="data", subfolder=None, workers=1):
+    """
+    Collects the Documents of iter_documents into a list.
 
-    return documents
+    Returns:
+        list: List of Document objects ready for indexing
+    """
+    return list(iter_documents(data_folder, subfolder, workers))
 
 
 def main():
     env = EnvLoader()
 
-    pc = PineconeService(api_key=env.PINECONE_API_KEY)
-
-    index_name = "llama-integration-example"
-    namespace = "default"
-
-    # Connect to Pinecone index
-    print(f"Connecting to Pinecone index '{index_name}'...")
-    pinecone_index = pc.pc.Index(index_name)
-
-    vector_store = PineconeVectorStore(
-        pinecone_index=pinecone_index, namespace=namespace
-    )
-
-    # Initialize embedding model (Ollama local model)
-    embedding_model = OllamaEmbedding(model_name="nomic-embed-text")
-
-    # Create storage context for vector operations
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-    # Check if index already has vectors
-    stats = pinecone_index.describe_index_stats()
-    total_vectors = (
-        stats.get("namespaces", {}).get(namespace, {}).get("vector_count", 0)
-    )
-
-    if total_vectors == 0:
-        print(
-            f"Index '{index_name}' is empty. Indexing all PDFs and CSVs from '{Path('data')}'..."
-        )
-
-        # Gather all documents from data folder
-        documents = gather_documents("data")
-
-        if documents:
-            # Create index and embed all documents
-            print(f"Embedding and indexing {len(documents)} documents...")
-            index = VectorStoreIndex.from_documents(
-                documents, storage_context=storage_context, embed_model=embedding_model
-            )
-            print(f"{len(documents)} documents indexed successfully!")
-        else:
-            print("⚠️ No documents found to index.")
-            return
-    else:
-        print(f"📊 Loading existing index with {total_vectors} vectors...")
-        index = VectorStoreIndex.from_vector_store(
-            vector_store=vector_store, embed_model=embedding_model
-        )
-        print(f"Index loaded successfully with {total_vectors} vectors.")
-
-    # Initialize LLM (Large Language Model)
-    print("🤖 Initializing Ollama LLM (phi3 model)")
-    llm = Ollama(
-        model="phi3",
-        request_timeout=120.0,  # 2 minutes timeout for responses
-        context_window=8000,  # Maximum context size
-    )
-
-    # Create query engine with retrieval settings
-    query_engine = index.as_query_engine(llm=llm, similarity_top_k=3)
+    engine = RagEngine(env, corpora=["llama"])
+    if not engine.retrievers:
+        print("⚠️ No documents found to index.")
+        return
 
     # Interactive chatbot loop
     print("\n" + "=" * 60)
@@ -117,8 +72,17 @@ def main():
             continue
 
         print("🔍 Searching documents...")
-        response = query_engine.query(question)
-        print(f"Bot: {response.response}")
+        if env.STREAM_ANSWERS:
+            response = engine.stream_query(question)
+            print("Bot: ", end="", flush=True)
+            for token in response:
+                print(token, end="", flush=True)
+            print(f"\n⏱️ {format_latency(response.metrics())}")
+        else:
+            response = engine.query(question)
+            print(f"Bot: {response.response}")
+        if response.metadata.get("citations"):
+            print(f"📚 Sources:\n{format_citations(response.metadata['citations'])}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+import argparse
+import time
+
+from loaders.pdf_loader import chunk_pages, find_pdf_files, iter_pdf_pages
+from loaders.pdf_text_cache import PDFTextCache
+from services.chunk_dedup import NearDuplicateIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Try chunking settings on the PDFs of data/ using cached page text."
+    )
+    parser.add_argument("--data-folder", default="data")
+    parser.add_argument("--subfolder", help="Corpus subfolder (all PDFs when omitted)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--splitter", choices=["chars", "tokens"], default="chars")
+    parser.add_argument("--cache-dir", default=".cache")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        help="Also count the near-duplicate chunks ingestion would drop",
+    )
+    args = parser.parse_args()
+
+    cache = PDFTextCache(args.cache_dir)
+    dedup = NearDuplicateIndex(args.dedup_threshold) if args.dedup_threshold else None
+    pdf_files = find_pdf_files(args.data_folder, args.subfolder)
+
+    began = time.perf_counter()
+    total_chunks = total_chars = parse_time = total_duplicates = 0
+    for path, pages, elapsed in iter_pdf_pages(pdf_files, workers=args.workers, cache=cache):
+        chunks = chunk_pages(
+            pages,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            splitter=args.splitter,
+        )
+        chars = sum(len(c) for c in chunks)
+        total_chunks += len(chunks)
+        total_chars += chars
+        parse_time += elapsed
+        average = chars / len(chunks) if chunks else 0
+        line = f"{path.name}: {len(chunks)} chunks, {average:.0f} chars on average"
+        if dedup is not None:
+            duplicates = 0
+            for chunk in chunks:
+                signature = dedup.signature(chunk)
+                if dedup.find(signature) is None:
+                    dedup.add(path.name, signature)
+                else:
+                    duplicates += 1
+            total_duplicates += duplicates
+            line += f", {duplicates} near-duplicates"
+        print(line)
+
+    print(
+        f"📊 {len(pdf_files)} PDFs, {total_chunks} chunks, {total_chars} chars "
+        f"in {time.perf_counter() - began:.2f}s ({parse_time:.2f}s parsing)"
+    )
+    if dedup is not None:
+        print(f"♻️ {total_duplicates} near-duplicate chunks at threshold {dedup.threshold}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,167 @@
-import pandas as pd
+import re
+from string import Formatter
+
+from llama_index.core import Document
+
+DEFAULT_TEMPLATE = (
+    "Data: {date}. Temperatura média: {average_temperature}°C. "
+    "Umidade: {humidity}%. Índice de ansiedade: {anxiety_index}."
+)
+
+# Subset of the format spec mini-language that maps to printf-style
+# formatting, so whole columns are formatted at once
+_SPEC = re.compile(
+    r"(?:(?P<fill>.)?(?P<align>[<>^]))?(?P<sign>[+ -])?(?P<zero>0)?"
+    r"(?P<width>\d+)?(?:\.(?P<precision>\d+))?(?P<type>[deEfFgG%s]?)"
+)
+NUMERIC_TYPES = set("deEfFgG%")
+
+
+def _parse_spec(spec):
+    match = _SPEC.fullmatch(spec)
+    if match is None:
+        raise ValueError(f"Unsupported format spec in CSV template: {spec!r}")
+    return match.groupdict()
+
+
+def _printf_format(spec):
+    """printf-style equivalent of a numeric format spec (e.g. '.1f' -> '%.1f')."""
+    parts = _parse_spec(spec)
+    if parts["fill"] or parts["align"] not in (None, "<", ">"):
+        raise ValueError(f"Unsupported alignment in numeric format spec: {spec!r}")
+    flags = "-" if parts["align"] == "<" else ""
+    flags += "" if parts["sign"] in (None, "-") else parts["sign"]
+    flags += parts["zero"] or ""
+    width = parts["width"] or ""
+    precision = f".{parts['precision']}" if parts["precision"] is not None else ""
+    kind = "f" if parts["type"] == "%" else parts["type"]
+    return f"%{flags}{width}{precision}{kind}"
 
 
 class CSVLoader:
-    def __init__(self, path):
+    """
+    Turns spreadsheet rows into sentences using a column template.
+
+    The template is a str.format string whose fields are column names. Only
+    those columns are read, in chunks, and each sentence is built with
+    vectorized string concatenation over the whole chunk instead of per-row
+    Python.
+    """
+
+    def __init__(self, path, template=DEFAULT_TEMPLATE, dtypes=None):
+        """
+        Args:
+            path (str): CSV file
+            template (str): Sentence template, e.g. "Data: {date}. ..." or
+                "{average_temperature:.1f}". Numeric specs (types d, e, f,
+                g and %, with sign, zero padding, width and precision) read
+                their column as numbers; other specs pad or cut text. Only
+                the '!s' conversion is supported.
+            dtypes (dict): Column dtypes; columns not listed are read as text,
+                which keeps their original formatting and skips number
+                parsing, unless the template gives them a numeric spec
+        """
         self.path = path
+        self.template = template
+        self.parts = []
+        numeric = {}
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if conversion not in (None, "s"):
+                raise ValueError(
+                    f"Unsupported conversion '!{conversion}' for '{field}' in CSV template."
+                )
+            kind = _parse_spec(spec)["type"] if field and spec else ""
+            if kind in NUMERIC_TYPES:
+                # Validated here so a bad template fails before reading the file
+                _printf_format(spec)
+                numeric.setdefault(field, set()).add(kind)
+            self.parts.append((literal, field, spec))
+        self.columns = list(dict.fromkeys(f for _, f, _ in self.parts if f))
+        self.dtypes = {column: "string" for column in self.columns}
+        for column, kinds in numeric.items():
+            # 'd' needs whole numbers; any other numeric spec reads floats
+            self.dtypes[column] = "Int64" if kinds == {"d"} else "float64"
+        self.dtypes.update(dtypes or {})
+
+    @staticmethod
+    def _format(column, spec):
+        """Formats a whole column with one format spec; missing values stay NA."""
+        import numpy as np
+        import pandas as pd
+
+        parts = _parse_spec(spec)
+        if parts["type"] in NUMERIC_TYPES:
+            values = pd.to_numeric(column)
+            present = values.notna().to_numpy()
+            numbers = values.to_numpy(dtype="float64", na_value=np.nan)[present]
+            if parts["type"] == "%":
+                numbers = numbers * 100
+            if parts["type"] == "d":
+                numbers = numbers.astype(np.int64)
+            formatted = np.char.mod(_printf_format(spec), numbers)
+            if parts["type"] == "%":
+                formatted = np.char.add(formatted, "%")
+            result = pd.Series(pd.NA, index=column.index, dtype="string")
+            result[present] = formatted
+            return result
+
+        text = column.astype("string")
+        if parts["precision"] is not None:
+            text = text.str.slice(0, int(parts["precision"]))
+        if parts["width"]:
+            side = {"<": "right", ">": "left", "^": "both"}.get(parts["align"], "right")
+            text = text.str.pad(int(parts["width"]), side=side, fillchar=parts["fill"] or " ")
+        return text
+
+    def _render(self, df):
+        """Builds the sentence of every row of a chunk as one Series."""
+        import pandas as pd
+
+        text = pd.Series("", index=df.index, dtype="string")
+        for literal, field, spec in self.parts:
+            if literal:
+                text = text + literal
+            if field:
+                column = df[field]
+                column = self._format(column, spec) if spec else column.astype("string")
+                text = text + column.fillna("")
+        return text
+
+    def iter_texts(self, chunksize=100_000):
+        """Yields one sentence per row, reading `chunksize` rows at a time."""
+        # pandas is imported on use: it is heavy and only spreadsheets need it
+        import pandas as pd
+
+        for chunk in pd.read_csv(
+            self.path, usecols=self.columns, dtype=self.dtypes, chunksize=chunksize
+        ):
+            yield from self._render(chunk).tolist()
+
+    def iter_documents(self, rows_per_document=50, chunksize=100_000):
+        """
+        Lazily yields Documents grouping `rows_per_document` consecutive rows.
+
+        Each Document carries the source path and its [row_start, row_end)
+        range in metadata.
+        """
+        import pandas as pd
+
+        row = 0
+        for chunk in pd.read_csv(
+            self.path, usecols=self.columns, dtype=self.dtypes, chunksize=chunksize
+        ):
+            texts = self._render(chunk).tolist()
+            for start in range(0, len(texts), rows_per_document):
+                group = texts[start : start + rows_per_document]
+                yield Document(
+                    text="\n".join(group),
+                    metadata={
+                        "source": str(self.path),
+                        "row_start": row + start,
+                        "row_end": row + start + len(group),
+                    },
+                )
+            row += len(texts)
 
     def to_text_list(self):
-        df = pd.read_csv(self.path)
-
-        # Está estático
-        texts = [
-            f"Data: {row['date']}. Temperatura média: {row['average_temperature']}°C. Umidade: {row['humidity']}%. Índice de ansiedade: {row['anxiety_index']}."
-            for _, row in df.iterrows()
-        ]
-        return texts
+        return list(self.iter_texts())
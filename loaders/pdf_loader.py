@@ -1,17 +1,304 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 from pypdf import PdfReader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from services.ingestion_manifest import file_sha256
+from services.telemetry import observe_stage, traced
 
-class PDFLoader:
-    def __init__(self, path):
-        self.path = path
 
-    def extract_text_chunks(self, chunk_size=1000, chunk_overlap=100):
-        reader = PdfReader(self.path)
-        text = "\n".join(
-            page.extract_text() for page in reader.pages if page.extract_text()
+def find_pdf_files(data_folder="data", subfolder=None):
+    """
+    Lists the PDF files of a corpus folder in a stable order.
+
+    Args:
+        data_folder (str): Root data folder
+        subfolder (str): Corpus subfolder (e.g. 'news'). When omitted, every
+            PDF below data_folder is returned.
+
+    Returns:
+        list: Sorted list of Path objects
+    """
+    if subfolder:
+        return sorted((Path(data_folder) / subfolder).glob("*.pdf"))
+    return sorted(Path(data_folder).rglob("*.pdf"))
+
+
+def _extract_page_range(path, start, stop):
+    """Worker task: extracts the text of pages [start, stop) of one PDF."""
+    began = time.perf_counter()
+    reader = PdfReader(path)
+    texts = [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+    return texts, time.perf_counter() - began
+
+
+def extract_pages_parallel(paths, workers=None, pages_per_task=8, files_ahead=None):
+    """
+    Extracts the page texts of several PDFs on a process pool.
+
+    Work is split per file and per page range, so a single large PDF is
+    spread across all workers. Results are yielded per file, in the order of
+    `paths`, with pages in their original order.
+
+    Args:
+        paths (list): PDF paths
+        workers (int): Number of worker processes (defaults to the CPU count)
+        pages_per_task (int): Pages parsed by each pool task
+        files_ahead (int): Files submitted ahead of the one being consumed
+            (defaults to `workers`). Bounds how many parsed files wait in
+            memory when the consumer is slower than the pool.
+
+    Yields:
+        tuple: (path, list of page texts, seconds spent parsing the file)
+    """
+    workers = workers or os.cpu_count() or 1
+    files_ahead = files_ahead or workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        def submit(path):
+            page_count = len(PdfReader(path).pages)
+            return path, [
+                pool.submit(
+                    _extract_page_range,
+                    str(path),
+                    start,
+                    min(start + pages_per_task, page_count),
+                )
+                for start in range(0, page_count, pages_per_task)
+            ]
+
+        remaining = iter(paths)
+        pending = deque()
+        while True:
+            while len(pending) <= files_ahead:
+                path = next(remaining, None)
+                if path is None:
+                    break
+                pending.append(submit(path))
+            if not pending:
+                return
+            path, futures = pending.popleft()
+            pages, elapsed = [], 0.0
+            for future in futures:
+                texts, seconds = future.result()
+                pages.extend(texts)
+                elapsed += seconds
+            yield path, pages, elapsed
+
+
+def iter_pdf_pages(paths, workers=1, cache=None):
+    """
+    Extracts the page texts of several PDFs, in order.
+
+    PDFs found in `cache` (a PDFTextCache) are not parsed at all; the others
+    are parsed (with extract_pages_parallel when more than one worker is
+    requested) and stored in it. Only the file being yielded (plus the few
+    parsed ahead) is held in memory.
+
+    Yields:
+        tuple: (path, list of page texts, seconds spent parsing the file)
+    """
+    cached = {}
+    if cache is not None:
+        for path in paths:
+            file_hash = file_sha256(path)
+            if cache.contains(path, file_hash):
+                cached[path] = file_hash
+    to_parse = [path for path in paths if path not in cached]
+
+    if workers and workers > 1:
+        parsed = extract_pages_parallel(to_parse, workers=workers)
+    else:
+        parsed = _extract_pages_sequential(to_parse)
+
+    for path in paths:
+        if path in cached:
+            yield path, cache.get(path, cached[path]), 0.0
+            continue
+        parsed_path, pages, elapsed = next(parsed)
+        observe_stage("pdf_parse", elapsed)
+        if cache is not None:
+            cache.put(parsed_path, pages)
+        yield parsed_path, pages, elapsed
+
+
+def _extract_pages_sequential(paths):
+    for path in paths:
+        began = time.perf_counter()
+        pages = PDFLoader(path).extract_pages()
+        yield path, pages, time.perf_counter() - began
+
+
+def _text_splitter(chunk_size, chunk_overlap, splitter):
+    # Imported here: startup only needs it when a corpus has to be re-chunked
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    if splitter == "tokens":
+        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name="cl100k_base",
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
         )
-        splitter = RecursiveCharacterTextSplitter(
+    if splitter == "chars":
+        return RecursiveCharacterTextSplitter(
             chunk_size=chunk_size, chunk_overlap=chunk_overlap
         )
-        return splitter.split_text(text)
+    raise ValueError("Unsupported splitter: use 'chars' or 'tokens'.")
+
+
+def _split_window(text_splitter, buffer):
+    """
+    Splits the joined text of (page number, text) pieces.
+
+    Returns:
+        list: (chunk, first page, last page, per-page pieces of the chunk)
+    """
+    text = "\n".join(piece for _, piece in buffer)
+    segments, start = [], 0
+    for page, piece in buffer:
+        segments.append((page, start, start + len(piece)))
+        start += len(piece) + 1
+
+    spans, cursor, previous = [], 0, None
+    for chunk in text_splitter.split_text(text):
+        begin = text.find(chunk, cursor)
+        if begin < 0:
+            # Not a verbatim slice (never the case with the recursive
+            # splitter): reuse the span of the previous chunk
+            first, last = previous or (buffer[0][0], buffer[-1][0])
+            spans.append((chunk, first, last, [(first, chunk)]))
+            continue
+        end = begin + len(chunk)
+        pieces = [
+            (page, text[max(begin, seg_start) : min(end, seg_end)])
+            for page, seg_start, seg_end in segments
+            if seg_start < end and seg_end > begin
+        ]
+        previous = pieces[0][0], pieces[-1][0]
+        spans.append((chunk, *previous, pieces))
+        cursor = begin + 1
+    return spans
+
+
+def iter_chunk_spans(
+    pages, chunk_size=1000, chunk_overlap=100, splitter="chars", window_chunks=64
+):
+    """
+    Lazily splits page texts into overlapping chunks, with their page span.
+
+    Pages are consumed as they come and split one window of roughly
+    `window_chunks` chunks at a time, so a long document is never joined
+    into one string. The last chunk of each window starts the next one,
+    which keeps chunk boundaries the same as splitting the whole text for
+    files that fit in one window.
+
+    Args:
+        pages (iterable): Page texts
+        chunk_size (int): Maximum chunk length, in characters or tokens
+        chunk_overlap (int): Length shared by consecutive chunks
+        splitter (str): 'chars' to measure characters, or 'tokens' to measure
+            tokens so chunks fit the nomic-embed-text context. Tokens are
+            counted with tiktoken's cl100k_base, a close stand-in for the
+            model's own WordPiece vocabulary.
+        window_chunks (int): Approximate chunks per window
+
+    Yields:
+        tuple: (chunk text, first page, last page), pages numbered from 1
+    """
+    text_splitter = _text_splitter(chunk_size, chunk_overlap, splitter)
+    # Window length in characters (a token is about four characters)
+    window = window_chunks * chunk_size * (4 if splitter == "tokens" else 1)
+    buffer, length = [], 0
+    for number, page in enumerate(pages, 1):
+        if not page:
+            continue
+        buffer.append((number, page))
+        length += len(page) + 1
+        if length >= window:
+            spans = _split_window(text_splitter, buffer)
+            yield from (span[:3] for span in spans[:-1])
+            # The last chunk is carried as its per-page pieces, so its page
+            # span survives and the joined text stays the same
+            buffer = spans[-1][3] if spans else []
+            length = len(spans[-1][0]) if spans else 0
+    if buffer:
+        yield from (span[:3] for span in _split_window(text_splitter, buffer))
+
+
+def iter_chunks(pages, chunk_size=1000, chunk_overlap=100, splitter="chars", window_chunks=64):
+    """
+    Lazily splits page texts into overlapping chunks (see iter_chunk_spans).
+
+    Yields:
+        str: Chunk text
+    """
+    for chunk, _, _ in iter_chunk_spans(
+        pages, chunk_size, chunk_overlap, splitter, window_chunks
+    ):
+        yield chunk
+
+
+@traced("chunking")
+def chunk_pages(pages, chunk_size=1000, chunk_overlap=100, splitter="chars"):
+    """
+    Splits extracted page texts into overlapping chunks (see iter_chunks).
+
+    Returns:
+        list: Chunk strings
+    """
+    return list(iter_chunks(pages, chunk_size, chunk_overlap, splitter))
+
+
+@traced("chunking")
+def chunk_page_spans(pages, chunk_size=1000, chunk_overlap=100, splitter="chars"):
+    """
+    Splits extracted page texts into overlapping chunks (see iter_chunk_spans).
+
+    Returns:
+        list: (chunk text, first page, last page) tuples
+    """
+    return list(iter_chunk_spans(pages, chunk_size, chunk_overlap, splitter))
+
+
+class PDFLoader:
+    def __init__(self, path, cache=None):
+        """
+        Args:
+            path (str): PDF file
+            cache (PDFTextCache): Optional cache of extracted page text
+        """
+        self.path = path
+        self.cache = cache
+
+    def extract_pages(self):
+        """Returns the text of every page, extracting each page only once."""
+        if self.cache is not None:
+            pages = self.cache.get(self.path)
+            if pages is not None:
+                return pages
+        reader = PdfReader(self.path)
+        pages = [page.extract_text() or "" for page in reader.pages]
+        if self.cache is not None:
+            self.cache.put(self.path, pages)
+        return pages
+
+    def extract_text_chunks(
+        self, chunk_size=1000, chunk_overlap=100, pages=None, splitter="chars"
+    ):
+        """
+        Splits the PDF text into overlapping chunks.
+
+        Args:
+            chunk_size (int): Maximum characters (or tokens) per chunk
+            chunk_overlap (int): Characters (or tokens) shared by consecutive chunks
+            pages (list): Page texts already extracted (e.g. by
+                extract_pages_parallel). Read from the cache or parsed from
+                the file when omitted.
+            splitter (str): 'chars' or 'tokens', see chunk_pages
+        """
+        if pages is None:
+            pages = self.extract_pages()
+        return chunk_pages(pages, chunk_size, chunk_overlap, splitter)
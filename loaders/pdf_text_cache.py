@@ -0,0 +1,46 @@
+import gzip
+import json
+import os
+from pathlib import Path
+
+import pypdf
+
+from services.ingestion_manifest import file_sha256
+
+# Bump when the extraction logic changes so stale page text is ignored
+EXTRACTOR_VERSION = f"pypdf-{pypdf.__version__}-1"
+
+
+class PDFTextCache:
+    """
+    Extracted page text stored by file content hash and extractor version.
+
+    Each PDF becomes one gzip-compressed JSON list of page texts, so
+    re-chunking never needs to parse the PDF again.
+    """
+
+    def __init__(self, cache_dir=".cache"):
+        self.dir = Path(cache_dir) / "pdf_text"
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry(self, path, file_hash=None):
+        file_hash = file_hash or file_sha256(path)
+        return self.dir / f"{file_hash}-{EXTRACTOR_VERSION}.json.gz"
+
+    def contains(self, path, file_hash=None) -> bool:
+        return self._entry(path, file_hash).exists()
+
+    def get(self, path, file_hash=None):
+        """Returns the cached page texts of a PDF, or None."""
+        entry = self._entry(path, file_hash)
+        if not entry.exists():
+            return None
+        with gzip.open(entry, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, path, pages, file_hash=None):
+        entry = self._entry(path, file_hash)
+        tmp_path = entry.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(pages, f, ensure_ascii=False)
+        os.replace(tmp_path, entry)
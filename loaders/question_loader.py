@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+# JSONL fields tried, in order, for the question text and its identifier
+QUESTION_FIELDS = ("question", "prompt", "text", "body", "title")
+ID_FIELDS = ("id", "question_id", "request_id")
+
+
+def load_questions(path, field=None):
+    """
+    Reads questions from a prompts text file or a JSONL file.
+
+    Text files in the data/prompts format keep only their 'pt-br:' and 'en:'
+    lines; other text files are read one question per non-empty line. JSONL
+    records use `field` (or the first of QUESTION_FIELDS they have) as the
+    question and their id/request_id, when present, as identifier.
+
+    Returns:
+        list: dicts with 'id' and 'question' (ids are unique within the file)
+    """
+    path = Path(path)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    questions = []
+
+    if path.suffix == ".jsonl":
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            fields = [field] if field else QUESTION_FIELDS
+            text = next((record[f] for f in fields if record.get(f)), None)
+            if text is None:
+                continue
+            identifier = next((record[f] for f in ID_FIELDS if record.get(f)), None)
+            questions.append({"id": str(identifier or number), "question": str(text).strip()})
+        return questions
+
+    for number, line in enumerate(lines, start=1):
+        label, _, text = line.partition(":")
+        if label.strip() in ("pt-br", "en") and text.strip():
+            questions.append({"id": f"{number}-{label.strip()}", "question": text.strip()})
+    if not questions:
+        questions = [
+            {"id": str(number), "question": line.strip()}
+            for number, line in enumerate(lines, start=1)
+            if line.strip()
+        ]
+    return questions
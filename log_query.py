@@ -0,0 +1,101 @@
+import argparse
+import datetime
+import json
+import math
+
+from services.interaction_log import iter_log_records
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (pct in 0-100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def parse_date(value):
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return moment
+
+
+def parse_until(value):
+    """
+    Exclusive upper bound for --until: a date alone covers that whole day,
+    so it ends at the next midnight.
+    """
+    try:
+        day = datetime.date.fromisoformat(value)
+    except ValueError:
+        return parse_date(value) + datetime.timedelta(microseconds=1)
+    next_day = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time())
+    return next_day.astimezone()
+
+
+def matches(record, args):
+    if args.corpus and args.corpus not in record.get("corpora", []):
+        return False
+    if args.since or args.until:
+        moment = parse_date(record["ts"])
+        if args.since and moment < args.since:
+            return False
+        if args.until and moment >= args.until:
+            return False
+    if args.emotion:
+        emotion = str((record.get("markers") or {}).get("predominant_emotion", ""))
+        if args.emotion.casefold() not in emotion.casefold():
+            return False
+    return True
+
+
+def filtered(args):
+    return (r for r in iter_log_records(args.log_dir) if matches(r, args))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Search the structured interaction logs (JSONL, rotated .gz included)."
+    )
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--corpus", help="Only turns that searched this corpus")
+    parser.add_argument("--since", type=parse_date, help="ISO date/time, inclusive")
+    parser.add_argument(
+        "--until", type=parse_until, help="ISO date/time, inclusive (a date covers the whole day)"
+    )
+    parser.add_argument("--emotion", help="Substring of the predominant emotion")
+    parser.add_argument(
+        "--slower-than-p",
+        type=float,
+        metavar="PCT",
+        help="Only turns whose answer time is at or above this percentile",
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="Print counts and latency percentiles only"
+    )
+    args = parser.parse_args()
+
+    # Streaming passes: only latencies are ever held in memory
+    threshold = None
+    if args.stats or args.slower_than_p is not None:
+        latencies = [r.get("answer_seconds", 0.0) for r in filtered(args)]
+        if args.stats:
+            print(f"turns: {len(latencies)}")
+            for pct in (50, 95, 99):
+                value = percentile(latencies, pct)
+                print(f"p{pct} answer_seconds: {value:.2f}" if value is not None else f"p{pct}: -")
+            return
+        threshold = percentile(latencies, args.slower_than_p)
+        if threshold is None:
+            return
+
+    for record in filtered(args):
+        if threshold is not None and record.get("answer_seconds", 0.0) < threshold:
+            continue
+        print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from services.behavior_analysis_services import analyze_behavior_text
+from services.behavior_worker import behavior_analysis_options
+from services.env_loader import EnvLoader
+from services.interaction_log import InteractionLog
+from services.metadata_filters import build_filters
+from services.rag_engine import CORPORA, RagEngine, citations
+from services.telemetry import METRICS
+
+
+class QueueFull(Exception):
+    pass
+
+
+class AdmissionQueue:
+    """
+    Per-resource concurrency limits behind a bounded waiting line.
+
+    Each corpus (and behavior analysis) may run `limit` requests at once. A
+    request that would have to wait while `max_waiting` others are already
+    waiting is rejected with QueueFull instead of piling up.
+    """
+
+    def __init__(self, resources, limit, max_waiting):
+        self.limits = {name: asyncio.Semaphore(limit) for name in resources}
+        self.max_waiting = max_waiting
+        self.waiting = 0
+
+    async def acquire(self, names):
+        names = sorted(names)
+        busy = any(self.limits[name].locked() for name in names)
+        if busy and self.waiting >= self.max_waiting:
+            raise QueueFull()
+        self.waiting += 1
+        acquired = []
+        try:
+            # Sorted order keeps multi-corpus requests from deadlocking
+            for name in names:
+                await self.limits[name].acquire()
+                acquired.append(name)
+        except BaseException:
+            self.release(acquired)
+            raise
+        finally:
+            self.waiting -= 1
+        return names
+
+    def release(self, names):
+        for name in names:
+            self.limits[name].release()
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that calls `on_close` however the response ends.
+
+    The body generator may never run (a client gone before streaming
+    starts) and Starlette skips background tasks on disconnect, so the
+    callback runs around the whole ASGI call instead.
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+
+class QueryRequest(BaseModel):
+    question: str
+    corpora: Optional[List[str]] = None
+    # Metadata filters applied before ranking: source files (relative to the
+    # data folder), chunk language ('pt' or 'en') and a page range
+    sources: Optional[List[str]] = None
+    language: Optional[str] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+
+    def filters(self):
+        return build_filters(
+            source=self.sources,
+            language=self.language,
+            page_from=self.page_from,
+            page_to=self.page_to,
+        )
+
+
+class BehaviorRequest(BaseModel):
+    text: str
+
+
+def sse(event, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def create_app(env=None, corpora=None) -> FastAPI:
+    """
+    Builds the HTTP service around one warm RagEngine.
+
+    The engine, its Ollama clients and the Pinecone index handles are created
+    once at startup, so every request reuses the same HTTP connection pools.
+    Blocking work runs in the threadpool; the admission queue bounds how much
+    of it each corpus gets.
+    """
+    env = env or EnvLoader()
+    state = {}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        engine = await run_in_threadpool(RagEngine, env, corpora)
+        state["engine"] = engine
+        state["log"] = InteractionLog.from_env(env)
+        state["admission"] = AdmissionQueue(
+            [*engine.retrievers, "behavior"],
+            limit=env.CORPUS_CONCURRENCY,
+            max_waiting=env.ADMISSION_QUEUE_SIZE,
+        )
+        print(f"🚀 Serving corpora: {', '.join(engine.retrievers) or 'none'}")
+        if env.STARTUP_PROFILE:
+            print(engine.startup.report())
+        yield
+        print("🛑 Shutting down: flushing logs...")
+        state["log"].close()
+        engine.close()
+
+    app = FastAPI(title="Climate & mental health RAG", lifespan=lifespan)
+
+    def selected(request: QueryRequest):
+        engine = state["engine"]
+        names = request.corpora or list(engine.retrievers)
+        unknown = [name for name in names if name not in engine.retrievers]
+        if unknown:
+            raise HTTPException(
+                404, f"Unknown corpora {unknown}; available: {list(engine.retrievers)}"
+            )
+        return names
+
+    async def admit(names):
+        try:
+            return await state["admission"].acquire(names)
+        except QueueFull:
+            raise HTTPException(
+                429, "Too many requests waiting, retry shortly.", headers={"Retry-After": "1"}
+            )
+
+    def log_turn(names, question, answer, metadata, sources, seconds, **extra):
+        state["log"].write(
+            {
+                "corpora": names,
+                "question": question,
+                "answer": answer,
+                "cache": metadata.get("cache"),
+                "sources": [s["id"] for s in sources],
+                "timings": dict(metadata.get("timings", {})),
+                "prompt_tokens": metadata.get("prompt_tokens"),
+                "answer_seconds": seconds,
+                "transport": "http",
+                **extra,
+            }
+        )
+
+    @app.get("/health")
+    async def health():
+        engine = state["engine"]
+        return {"status": "ok", "corpora": list(engine.retrievers)}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(
+            METRICS.render_prometheus(), media_type="text/plain; version=0.0.4"
+        )
+
+    @app.post("/query")
+    async def query(request: QueryRequest):
+        names = selected(request)
+        began = time.perf_counter()
+        admitted = await admit(names)
+        try:
+            response = await run_in_threadpool(
+                state["engine"].query, request.question, names, filters=request.filters()
+            )
+        finally:
+            state["admission"].release(admitted)
+        metadata = response.metadata or {}
+        sources = citations(response.source_nodes)
+        seconds = time.perf_counter() - began
+        log_turn(names, request.question, response.response, metadata, sources, seconds)
+        return {
+            "answer": response.response,
+            "cache": metadata.get("cache"),
+            "sources": sources,
+            "timings": metadata.get("timings", {}),
+            "prompt_tokens": metadata.get("prompt_tokens"),
+            "seconds": seconds,
+        }
+
+    @app.post("/query/stream")
+    async def query_stream(request: QueryRequest):
+        """Streams the answer as server-sent events: 'token'..., then 'done'."""
+        names = selected(request)
+        began = time.perf_counter()
+        admitted = await admit(names)
+        try:
+            stream = await run_in_threadpool(
+                state["engine"].stream_query,
+                request.question,
+                names,
+                filters=request.filters(),
+            )
+        except BaseException:
+            state["admission"].release(admitted)
+            raise
+
+        async def events():
+            async for token in iterate_in_threadpool(iter(stream)):
+                yield sse("token", {"text": token})
+            sources = citations(stream.source_nodes)
+            seconds = time.perf_counter() - began
+            yield sse(
+                "done",
+                {
+                    "answer": stream.response,
+                    "cache": stream.metadata.get("cache"),
+                    "sources": sources,
+                    "timings": stream.metadata.get("timings", {}),
+                    "prompt_tokens": stream.metadata.get("prompt_tokens"),
+                    **stream.metrics(),
+                },
+            )
+            log_turn(
+                names,
+                request.question,
+                stream.response,
+                stream.metadata,
+                sources,
+                seconds,
+                **stream.metrics(),
+            )
+
+        # The slot is freed when the response closes, even if the body
+        # generator never starts
+        return ReleasingStreamingResponse(
+            events(),
+            on_close=lambda: state["admission"].release(admitted),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.post("/behavior")
+    async def behavior(request: BehaviorRequest):
+        began = time.perf_counter()
+        admitted = await admit(["behavior"])
+        try:
+            markers = await run_in_threadpool(
+                analyze_behavior_text, request.text, **behavior_analysis_options(env)
+            )
+        finally:
+            state["admission"].release(admitted)
+        return {"markers": markers, "seconds": time.perf_counter() - began}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the RAG assistant over HTTP.")
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=sorted(CORPORA),
+        help="Corpus to serve (repeatable). Defaults to all of them.",
+    )
+    parser.add_argument("--host", help="Defaults to SERVER_HOST")
+    parser.add_argument("--port", type=int, help="Defaults to SERVER_PORT")
+    args = parser.parse_args()
+
+    env = EnvLoader()
+    uvicorn.run(
+        create_app(env, args.corpus),
+        host=args.host or env.SERVER_HOST,
+        port=args.port or env.SERVER_PORT,
+        timeout_graceful_shutdown=env.SERVER_SHUTDOWN_TIMEOUT,
+    )
+
+
+if __name__ == "__main__":
+    main()
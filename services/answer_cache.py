@@ -0,0 +1,167 @@
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+class AnswerCache:
+    """
+    Two-tier persistent cache of final answers.
+
+    Tier 1 matches the normalised question text exactly. Tier 2 compares the
+    question embedding with the cached ones and accepts the best match above
+    `threshold`. Entries are scoped by corpus selection and tagged with the
+    index version they were answered from; a new version drops the scope.
+    """
+
+    def __init__(self, path, threshold=0.92, ttl=7 * 24 * 3600, max_entries=5000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._matrices = {}
+        self._versions = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, scope TEXT NOT NULL, version TEXT NOT NULL, "
+            "question TEXT NOT NULL, answer TEXT NOT NULL, embedding BLOB, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers(scope)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, env):
+        """Returns the cache configured in EnvLoader, or None when disabled."""
+        if not env.ANSWER_CACHE:
+            return None
+        return cls(
+            Path(env.CACHE_DIR) / "answers.sqlite3",
+            threshold=env.ANSWER_CACHE_THRESHOLD,
+            ttl=env.ANSWER_CACHE_TTL,
+            max_entries=env.ANSWER_CACHE_MAX_ENTRIES,
+        )
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        text = unicodedata.normalize("NFKC", question).casefold()
+        text = re.sub(r"[^\w\s]", " ", text)
+        return " ".join(text.split())
+
+    def _key(self, question, scope):
+        return f"{scope}\0{self.normalize(question)}"
+
+    def _sync_scope(self, scope, version):
+        """Drops expired entries and those answered from an older index version."""
+        if self._versions.get(scope) == version:
+            return
+        self._conn.execute(
+            "DELETE FROM answers WHERE scope = ? AND (version != ? OR created < ?)",
+            (scope, version, time.time() - self.ttl),
+        )
+        self._conn.commit()
+        self._versions[scope] = version
+        self._matrices.pop(scope, None)
+
+    def _touch(self, key):
+        self._conn.execute(
+            "UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        self._conn.commit()
+
+    def get_exact(self, question, scope, version) -> Optional[str]:
+        key = self._key(question, scope)
+        with self._lock:
+            self._sync_scope(scope, version)
+            row = self._conn.execute(
+                "SELECT answer FROM answers WHERE key = ? AND created >= ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(key)
+            self.exact_hits += 1
+            return row[0]
+
+    def get_similar(self, embedding, scope, version) -> Optional[str]:
+        with self._lock:
+            self._sync_scope(scope, version)
+            if scope not in self._matrices:
+                rows = self._conn.execute(
+                    "SELECT key, created, embedding FROM answers "
+                    "WHERE scope = ? AND embedding IS NOT NULL AND created >= ?",
+                    (scope, time.time() - self.ttl),
+                ).fetchall()
+                keys = [r[0] for r in rows]
+                created = np.array([r[1] for r in rows], dtype=np.float64)
+                matrix = np.array([array("f", r[2]) for r in rows], dtype=np.float32)
+                self._matrices[scope] = (keys, created, matrix)
+            keys, created, matrix = self._matrices[scope]
+            if not keys:
+                self.misses += 1
+                return None
+
+            # The matrix outlives the TTL of its rows on a long-running server
+            cutoff = time.time() - self.ttl
+            query = np.asarray(embedding, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1)
+            scores = np.where(created >= cutoff, matrix @ query, -np.inf)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            row = self._conn.execute(
+                "SELECT answer FROM answers WHERE key = ? AND created >= ?",
+                (keys[best], cutoff),
+            ).fetchone()
+            if row is None:
+                self._matrices.pop(scope, None)
+                self.misses += 1
+                return None
+            self._touch(keys[best])
+            self.semantic_hits += 1
+            return row[0]
+
+    def put(self, question, scope, version, answer, embedding=None):
+        blob = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            blob = (vector / (np.linalg.norm(vector) or 1)).tobytes()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, scope, version, question, answer, embedding, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(question, scope), scope, version, question, answer, blob, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE key IN ("
+                    "SELECT key FROM answers ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self._matrices.clear()
+            else:
+                self._matrices.pop(scope, None)
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
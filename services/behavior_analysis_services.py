@@ -1,13 +1,91 @@
 import ollama
 import json
 import re
-from typing import Optional
+from functools import lru_cache
+from typing import List, Optional
 
+from pydantic import BaseModel, ValidationError
 
-def analyze_behavior_text(text: str) -> dict:
+from services.telemetry import record_ollama_tokens, traced
+
+
+class BehaviorMarkers(BaseModel):
+    """Schema the constrained analysis must produce (keys always in English)."""
+
+    tone: str
+    predominant_emotion: str
+    confidence_level: str
+    stress_signals: List[str]
+    behavioral_summary: str
+
+
+class BehaviorMarkersBatch(BaseModel):
+    results: List[BehaviorMarkers]
+
+
+@lru_cache(maxsize=1)
+def _client():
+    # Created on first use so OLLAMA_HOST exported by EnvLoader is honored
+    return ollama.Client()
+
+
+def extract_json_block(text: str, opening="{", closing="}") -> Optional[str]:
+    """Attempt to clean code fences and extra instructions, returning only the JSON."""
+    cleaned = text
+
+    # Remove ```json ... ``` fences if present
+    if cleaned.startswith("```"):
+        cleaned = re.sub(r"^```[a-zA-Z0-9_-]*\s*", "", cleaned, count=1)
+        if "```" in cleaned:
+            cleaned = cleaned.split("```", 1)[0]
+
+    cleaned = cleaned.strip()
+
+    start = cleaned.find(opening)
+    end = cleaned.rfind(closing)
+    if start != -1 and end != -1 and end > start:
+        return cleaned[start : end + 1]
+    return None
+
+
+def _generate_constrained(prompt, schema, max_tokens, retries):
+    """
+    Generates JSON that Ollama constrains to `schema`, validating the result.
+
+    The schema is passed as the output format, so generation stops at the end
+    of the object and `num_predict` bounds it even if the model misbehaves.
+
+    Returns:
+        tuple: (validated model or None, raw output of the last attempt)
+    """
+    raw_output = ""
+    for _ in range(retries + 1):
+        response = _client().generate(
+            model="phi3",
+            prompt=prompt,
+            format=schema.model_json_schema(),
+            options={"num_predict": max_tokens, "temperature": 0},
+        )
+        record_ollama_tokens("behavior_analysis", response)
+        raw_output = response["response"].strip()
+        try:
+            return schema.model_validate_json(raw_output), raw_output
+        except ValidationError:
+            continue
+    return None, raw_output
+
+
+@traced("behavior_analysis")
+def analyze_behavior_text(
+    text: str, constrained: bool = True, max_tokens: int = 256, retries: int = 1
+) -> dict:
     """
     Analyze behavioral markers using an LLM via Ollama.
     Returns a JSON with the markers.
+
+    In constrained mode the output follows the BehaviorMarkers schema, is
+    capped at `max_tokens` and is retried at most `retries` times when it
+    fails validation.
     """
 
     prompt = f"""
@@ -23,31 +101,28 @@ def analyze_behavior_text(text: str) -> dict:
     - behavioral_summary
     """
 
-    response = ollama.generate(
+    if constrained:
+        markers, raw_output = _generate_constrained(
+            prompt + "\n    Write every value in English and keep it short.\n",
+            BehaviorMarkers,
+            max_tokens,
+            retries,
+        )
+        if markers is not None:
+            return markers.model_dump()
+        return {
+            "error": "Response did not match the behavior markers schema.",
+            "raw": raw_output,
+        }
+
+    response = _client().generate(
         model="phi3",
         prompt=prompt
     )
+    record_ollama_tokens("behavior_analysis", response)
 
     raw_output = response["response"].strip()
 
-    def extract_json_block(text: str) -> Optional[str]:
-        """Attempt to clean code fences and extra instructions, returning only the JSON."""
-        cleaned = text
-
-        # Remove ```json ... ``` fences if present
-        if cleaned.startswith("```"):
-            cleaned = re.sub(r"^```[a-zA-Z0-9_-]*\s*", "", cleaned, count=1)
-            if "```" in cleaned:
-                cleaned = cleaned.split("```", 1)[0]
-
-        cleaned = cleaned.strip()
-
-        start = cleaned.find("{")
-        end = cleaned.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            return cleaned[start : end + 1]
-        return None
-
     json_candidate = extract_json_block(raw_output)
 
     # Ensure the JSON returned is a dictionary
@@ -60,4 +135,80 @@ def analyze_behavior_text(text: str) -> dict:
     return {
         "error": "Failed to convert response into JSON.",
         "raw": raw_output,
-    }
\ No newline at end of file
+    }
+
+
+@traced("behavior_analysis_batch")
+def analyze_behavior_batch(
+    texts: List[str], constrained: bool = True, max_tokens: int = 256, retries: int = 1
+) -> List[dict]:
+    """
+    Analyze behavioral markers of several answers with a single LLM call.
+
+    Falls back to one analyze_behavior_text call per answer when the model
+    does not return one object per answer.
+    """
+    options = {"constrained": constrained, "max_tokens": max_tokens, "retries": retries}
+    if len(texts) == 1:
+        return [analyze_behavior_text(texts[0], **options)]
+
+    answers = "\n\n".join(
+        f"Answer {i}:\n{text}" for i, text in enumerate(texts, start=1)
+    )
+
+    if constrained:
+        # Matches BehaviorMarkersBatch: the answers are wrapped in "results"
+        prompt = f"""
+
+    {answers}
+
+    Return ONLY a valid JSON object with a "results" array holding one object per answer, in order, each with the fields:
+    - tone
+    - predominant_emotion
+    - confidence_level
+    - stress_signals
+    - behavioral_summary
+
+    Write every value in English and keep it short.
+    """
+        batch, _ = _generate_constrained(
+            prompt,
+            BehaviorMarkersBatch,
+            max_tokens * len(texts),
+            retries,
+        )
+        if batch is not None and len(batch.results) == len(texts):
+            return [markers.model_dump() for markers in batch.results]
+        return [analyze_behavior_text(text, **options) for text in texts]
+
+    prompt = f"""
+
+    {answers}
+
+    Return ONLY a valid JSON array with one object per answer, in order, each with the fields:
+    - tone
+    - predominant_emotion
+    - confidence_level
+    - stress_signals
+    - behavioral_summary
+    """
+    response = _client().generate(
+        model="phi3",
+        prompt=prompt
+    )
+    record_ollama_tokens("behavior_analysis", response)
+
+    json_candidate = extract_json_block(response["response"].strip(), "[", "]")
+    if json_candidate:
+        try:
+            results = json.loads(json_candidate)
+        except json.JSONDecodeError:
+            results = None
+        if (
+            isinstance(results, list)
+            and len(results) == len(texts)
+            and all(isinstance(r, dict) for r in results)
+        ):
+            return results
+
+    return [analyze_behavior_text(text, **options) for text in texts]
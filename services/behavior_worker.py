@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+import traceback
+
+from services.behavior_analysis_services import analyze_behavior_batch
+
+_STOP = object()
+
+
+def behavior_analysis_options(env) -> dict:
+    """Keyword arguments for analyze_behavior_text/batch taken from EnvLoader."""
+    return {
+        "constrained": env.BEHAVIOR_CONSTRAINED,
+        "max_tokens": env.BEHAVIOR_MAX_TOKENS,
+        "retries": env.BEHAVIOR_RETRIES,
+    }
+
+
+class BehaviorAnalysisQueue:
+    """
+    Runs behavior analysis off the interactive loop.
+
+    Answers are queued with `submit` and picked up by a pool of worker
+    threads. When several answers are waiting, a worker takes up to
+    `batch_size` of them and analyzes them in one LLM call. Each result is
+    handed to `on_result(context, markers, seconds)` as soon as it is ready,
+    `seconds` being the analysis time attributed to that answer.
+    """
+
+    def __init__(
+        self, on_result, workers=1, batch_size=4, max_pending=100, analysis_options=None
+    ):
+        self.on_result = on_result
+        self.batch_size = batch_size
+        self.analysis_options = analysis_options or {}
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._threads = [
+            threading.Thread(target=self._work, name=f"behavior-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_env(cls, env, on_result):
+        return cls(
+            on_result,
+            workers=env.BEHAVIOR_WORKERS,
+            batch_size=env.BEHAVIOR_BATCH_SIZE,
+            analysis_options=behavior_analysis_options(env),
+        )
+
+    def submit(self, text, context=None):
+        """Queues an answer; blocks only if `max_pending` answers are waiting."""
+        self._queue.put((text, context))
+
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                self._queue.task_done()
+                return
+
+            jobs, stop = [job], False
+            while len(jobs) < self.batch_size:
+                try:
+                    extra = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is _STOP:
+                    stop = True
+                    break
+                jobs.append(extra)
+
+            began = time.perf_counter()
+            try:
+                results = analyze_behavior_batch(
+                    [text for text, _ in jobs], **self.analysis_options
+                )
+            except Exception as exc:
+                traceback.print_exc()
+                results = [{"error": f"Behavior analysis failed: {exc}"}] * len(jobs)
+
+            seconds = (time.perf_counter() - began) / len(jobs)
+
+            for (_, context), markers in zip(jobs, results):
+                try:
+                    self.on_result(context, markers, seconds)
+                except Exception:
+                    traceback.print_exc()
+            for _ in jobs:
+                self._queue.task_done()
+
+            if stop:
+                self._queue.task_done()
+                return
+
+    def close(self):
+        """Waits for every queued answer to be analyzed, then stops the workers."""
+        self._queue.join()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
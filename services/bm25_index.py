@@ -0,0 +1,223 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+from services.metadata_filters import to_sql
+
+# Common function words of the two corpus languages (accents already stripped)
+STOPWORDS_EN = set(
+    """
+    a an and are as at be by for from has have in is it its of on or that the
+    this to was were will with which who what how can into than then there
+    these those their they our we you your not but also more most such
+    """.split()
+)
+STOPWORDS_PT = set(
+    """
+    o os as um uma uns umas de do da dos das em no na nos nas por para com
+    sem sob que se ao aos e ou mas como mais menos muito ja foi sao ser ter
+    esta este isso essa esse sua seu suas seus pelo pela pelos pelas entre
+    """.split()
+)
+STOPWORDS = STOPWORDS_EN | STOPWORDS_PT
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _fold(text):
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def detect_language(text, min_hits=3):
+    """
+    Guesses whether a chunk is Portuguese or English.
+
+    Counts the stopwords only one of the two languages uses ('a', 'as' and
+    'e' are shared); a language wins with at least `min_hits` words and
+    twice as many as the other.
+
+    Returns:
+        str: 'pt', 'en' or 'unknown'
+    """
+    english = portuguese = 0
+    for token in _TOKEN.findall(_fold(text)):
+        if token in STOPWORDS_EN and token not in STOPWORDS_PT:
+            english += 1
+        elif token in STOPWORDS_PT and token not in STOPWORDS_EN:
+            portuguese += 1
+    if english >= min_hits and english >= 2 * portuguese:
+        return "en"
+    if portuguese >= min_hits and portuguese >= 2 * english:
+        return "pt"
+    return "unknown"
+
+
+def tokenize(text):
+    """
+    Lexical tokens for Portuguese and English text.
+
+    Accents are stripped and case folded (so 'saúde' matches 'saude'),
+    stopwords dropped and a trailing plural 's' removed from longer words.
+    Short tokens such as acronyms ('PTSD', 'SAD') are kept as they are.
+    """
+    tokens = []
+    for token in _TOKEN.findall(_fold(text)):
+        if token in STOPWORDS or token.isdigit() and len(token) < 4:
+            continue
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    Persistent inverted index with BM25 scoring over the chunks of a namespace.
+
+    Postings are (term, doc, tf) integer rows in a WITHOUT ROWID SQLite
+    table, so a query reads only the postings of its own terms and the index
+    is updated incrementally as chunks are added or removed.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                doc INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL,
+                length INTEGER NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, doc INTEGER NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc);
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def for_namespace(cls, index_name, namespace, cache_dir=".cache"):
+        return cls(Path(cache_dir) / "bm25" / f"{index_name}__{namespace}.sqlite3")
+
+    def ids(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT id FROM docs")}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def add(self, documents):
+        """
+        Indexes chunks given as (id, text, metadata) tuples; known IDs are skipped.
+        """
+        with self._lock:
+            for doc_id, text, metadata in documents:
+                tokens = tokenize(text)
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO docs (id, length, text, metadata) VALUES (?, ?, ?, ?)",
+                    (doc_id, len(tokens), text, json.dumps(metadata, ensure_ascii=False)),
+                )
+                if not cursor.rowcount:
+                    continue
+                doc = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc, tf) VALUES (?, ?, ?)",
+                    [(term, doc, tf) for term, tf in Counter(tokens).items()],
+                )
+            self._conn.commit()
+
+    def remove(self, ids):
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = list(ids[start : start + 500])
+                placeholders = ",".join("?" * len(batch))
+                docs = [
+                    row[0]
+                    for row in self._conn.execute(
+                        f"SELECT doc FROM docs WHERE id IN ({placeholders})", batch
+                    )
+                ]
+                if not docs:
+                    continue
+                doc_marks = ",".join("?" * len(docs))
+                self._conn.execute(f"DELETE FROM postings WHERE doc IN ({doc_marks})", docs)
+                self._conn.execute(f"DELETE FROM docs WHERE doc IN ({doc_marks})", docs)
+            self._conn.commit()
+
+    def search(self, query, top_k=3, filters=None):
+        """
+        Ranks chunks against a query with BM25.
+
+        Args:
+            query (str): Question text
+            top_k (int): Number of chunks returned
+            filters (MetadataFilters): Only rank chunks whose metadata match
+
+        Returns:
+            list: (id, text, metadata, score) tuples, best first
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            total, total_length = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs"
+            ).fetchone()
+            if not total:
+                return []
+            average_length = total_length / total
+
+            allowed = None
+            if filters is not None and filters.filters:
+                clause, params = to_sql(filters, column="metadata")
+                allowed = {
+                    row[0]
+                    for row in self._conn.execute(
+                        f"SELECT doc FROM docs WHERE {clause}", params
+                    )
+                }
+
+            scores = Counter()
+            for term in terms:
+                postings = self._conn.execute(
+                    "SELECT p.doc, p.tf, d.length FROM postings p "
+                    "JOIN docs d ON d.doc = p.doc WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf, length in postings:
+                    if allowed is not None and doc not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = scores.most_common(top_k)
+            if not best:
+                return []
+            placeholders = ",".join("?" * len(best))
+            rows = {
+                row[0]: row[1:]
+                for row in self._conn.execute(
+                    f"SELECT doc, id, text, metadata FROM docs WHERE doc IN ({placeholders})",
+                    [doc for doc, _ in best],
+                )
+            }
+        return [
+            (rows[doc][0], rows[doc][1], json.loads(rows[doc][2]), score)
+            for doc, score in best
+        ]
@@ -0,0 +1,216 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# Smallest prime above 2**32: (a * x + b) stays below 2**64 for 32-bit a, b, x
+_PRIME = np.uint64(4294967311)
+_WORD = re.compile(r"\w+")
+
+DEDUP_SCOPES = ("corpus", "global")
+
+
+def chunk_set_version(ids) -> str:
+    """Fingerprint of the chunk IDs a file keeps; changes whenever they do."""
+    digest = hashlib.sha256()
+    for chunk_id in sorted(ids):
+        digest.update(chunk_id.encode("utf-8") + b"\n")
+    return digest.hexdigest()[:16]
+
+
+def shingles(text, size=5):
+    """
+    Overlapping word n-grams of a chunk, after folding case and accents.
+
+    Texts shorter than `size` words give a single shingle, so short
+    repeated lines (headers, captions) are still compared.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    words = _WORD.findall(text)
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class SignatureStore:
+    """
+    Persistent MinHash signatures keyed by chunk hash.
+
+    Signatures only depend on the chunk text, so a sync can compare new
+    chunks against the chunks of unchanged files without chunking them again.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            "hash TEXT PRIMARY KEY, signature BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, hashes) -> dict:
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    self._conn.execute(
+                        f"SELECT hash, signature FROM signatures WHERE hash IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                )
+        return {h: np.frombuffer(blob, dtype=np.uint32) for h, blob in found.items()}
+
+    def put_many(self, items):
+        """Stores (chunk hash, signature) pairs."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO signatures (hash, signature) VALUES (?, ?)",
+                [(h, signature.astype(np.uint32).tobytes()) for h, signature in items],
+            )
+            self._conn.commit()
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH index of the chunks kept so far, used to drop near-duplicates.
+
+    Each chunk is reduced to `num_perm` MinHash values over its word
+    shingles; the signature is cut into `bands` bands and chunks sharing any
+    band become candidates. A candidate is a duplicate when the fraction of
+    equal MinHash values (an estimate of the shingle Jaccard similarity)
+    reaches `threshold`.
+
+    Chunks are registered under a label, '<scope>/<source file>', and every
+    source keeps a version (see chunk_set_version) so files whose duplicates
+    point to a source that changed can be synced again.
+    """
+
+    def __init__(
+        self, threshold=0.85, num_perm=128, bands=16, shingle_size=5, store=None, seed=1
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.store = store
+        random = np.random.RandomState(seed)
+        self._a = random.randint(1, 2**32, size=num_perm, dtype=np.uint64)
+        self._b = random.randint(0, 2**32, size=num_perm, dtype=np.uint64)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = []
+        self._labels = []
+        self._versions = {}
+
+    @classmethod
+    def from_env(cls, env):
+        """Returns the index configured in EnvLoader, or None when disabled."""
+        if not env.CHUNK_DEDUP:
+            return None
+        if env.DEDUP_SCOPE not in DEDUP_SCOPES:
+            raise ValueError("Unsupported DEDUP_SCOPE: use 'corpus' or 'global'.")
+        return cls(
+            threshold=env.DEDUP_THRESHOLD,
+            store=SignatureStore(Path(env.CACHE_DIR) / "minhash.sqlite3"),
+        )
+
+    def settings(self) -> dict:
+        """What the kept chunks depend on; recorded in the manifest."""
+        return {
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+        }
+
+    def signature(self, text):
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(text, self.shingle_size)),
+            dtype=np.uint64,
+        )
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [
+            signature[i * self.rows : (i + 1) * self.rows].tobytes()
+            for i in range(self.bands)
+        ]
+
+    def find(self, signature):
+        """Returns the label of the most similar indexed chunk above the threshold."""
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(key, ()))
+        best, best_similarity = None, self.threshold
+        for row in candidates:
+            similarity = np.count_nonzero(self._signatures[row] == signature) / self.num_perm
+            if similarity >= best_similarity:
+                best, best_similarity = self._labels[row], similarity
+        return best
+
+    def add(self, label, signature):
+        row = len(self._signatures)
+        self._signatures.append(signature)
+        self._labels.append(label)
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, []).append(row)
+
+    def version(self, label):
+        return self._versions.get(label)
+
+    def add_source(self, label, entries):
+        """
+        Indexes the stored chunks of an unchanged file.
+
+        Args:
+            entries (list): Manifest chunk entries ('id' and 'hash')
+        """
+        signatures = self.store.get_many([e["hash"] for e in entries]) if self.store else {}
+        for entry in entries:
+            signature = signatures.get(entry["hash"])
+            # A chunk without a stored signature is not compared against
+            if signature is not None:
+                self.add(label, signature)
+        self._versions[label] = chunk_set_version(e["id"] for e in entries)
+
+    def filter(self, label, nodes):
+        """
+        Drops the nodes of one file that duplicate an indexed chunk.
+
+        Kept nodes are indexed, so later chunks of the same file and later
+        files are compared against them too.
+
+        Returns:
+            tuple: (kept nodes, number dropped, {keeper label: version} of
+            the other files the dropped chunks duplicate)
+        """
+        signatures = [(node.metadata["chunk_hash"], self.signature(node.text)) for node in nodes]
+        if self.store is not None:
+            self.store.put_many(signatures)
+        kept, dropped, duplicate_of = [], 0, {}
+        for node, (_, signature) in zip(nodes, signatures):
+            keeper = self.find(signature)
+            if keeper is None:
+                self.add(label, signature)
+                kept.append(node)
+                continue
+            dropped += 1
+            if keeper != label:
+                duplicate_of[keeper] = self._versions.get(keeper)
+        self._versions[label] = chunk_set_version(node.node_id for node in kept)
+        return kept, dropped, duplicate_of
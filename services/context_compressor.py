@@ -0,0 +1,165 @@
+import math
+import re
+from functools import lru_cache
+
+import tiktoken
+from llama_index.core.prompts.default_prompts import DEFAULT_TEXT_QA_PROMPT
+from llama_index.core.schema import MetadataMode, NodeWithScore, TextNode
+
+from services.bm25_index import tokenize
+
+# PDF text wraps lines mid-sentence: only blank lines end a paragraph
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # cl100k_base as in chunk_pages: close enough to phi3's tokenizer to
+    # compare prompt sizes
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoding().encode(text, disallowed_special=()))
+
+
+def split_sentences(text):
+    sentences = (" ".join(s.split()) for s in _SENTENCE_END.split(text))
+    return [s for s in sentences if len(s) > 1]
+
+
+def prompt_tokens(question, nodes) -> int:
+    """Tokens of the QA prompt phi3 receives for these nodes."""
+    context = "\n\n".join(n.node.get_content(metadata_mode=MetadataMode.LLM) for n in nodes)
+    return count_tokens(DEFAULT_TEXT_QA_PROMPT.format(context_str=context, query_str=question))
+
+
+class ContextCompressor:
+    """
+    Reranks over-fetched candidates and trims them to a token budget.
+
+    Candidates are rescored by blending their retrieval rank with how much
+    of the question's vocabulary (idf-weighted over the candidates) they
+    cover. The best `top_k` are then reduced to their query-relevant
+    sentences, kept in document order, until the context reaches
+    `token_budget` tokens.
+    """
+
+    def __init__(self, top_k=3, token_budget=600, rank_weight=0.3):
+        """
+        Args:
+            top_k (int): Nodes kept after reranking
+            token_budget (int): Maximum tokens of compressed context
+            rank_weight (float): Share of the score given to retrieval order
+        """
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.rank_weight = rank_weight
+
+    @classmethod
+    def from_env(cls, env, top_k=3):
+        """Builds the compressor configured in EnvLoader, or None when disabled."""
+        if not env.CONTEXT_COMPRESSION:
+            return None
+        return cls(top_k=top_k, token_budget=env.CONTEXT_TOKEN_BUDGET)
+
+    @staticmethod
+    def _weights(terms, texts):
+        """Smoothed idf of each query term over the given texts."""
+        token_sets = [set(tokenize(t)) for t in texts]
+        return {
+            term: math.log(1 + (len(token_sets) + 1) / (1 + sum(term in s for s in token_sets)))
+            for term in terms
+        }
+
+    @staticmethod
+    def _coverage(weights, text):
+        total = sum(weights.values())
+        if not total:
+            return 0.0
+        tokens = set(tokenize(text))
+        return sum(w for term, w in weights.items() if term in tokens) / total
+
+    def rerank(self, question, nodes):
+        """Returns the `top_k` best candidates, rescored in [0, 1]."""
+        terms = set(tokenize(question))
+        texts = [n.node.get_content() for n in nodes]
+        weights = self._weights(terms, texts)
+        scored = []
+        for rank, (node, text) in enumerate(zip(nodes, texts)):
+            score = (
+                self.rank_weight / (rank + 1)
+                + (1 - self.rank_weight) * self._coverage(weights, text)
+            )
+            scored.append(NodeWithScore(node=node.node, score=score))
+        scored.sort(key=lambda n: n.score, reverse=True)
+        return scored[: self.top_k]
+
+    def compress(self, question, nodes):
+        """
+        Keeps the query-relevant sentences of each node within the budget.
+
+        Sentences are taken best first across all nodes and those sharing no
+        term with the question are left out; a node left with no sentence is
+        dropped, but the best sentence overall is always kept.
+        """
+        terms = set(tokenize(question))
+        sentences = [
+            (index, position, sentence)
+            for index, node in enumerate(nodes)
+            for position, sentence in enumerate(split_sentences(node.node.get_content()))
+        ]
+        weights = self._weights(terms, [s for _, _, s in sentences])
+        ranked = sorted(
+            sentences,
+            key=lambda s: (self._coverage(weights, s[2]), -s[0], -s[1]),
+            reverse=True,
+        )
+
+        # Without query terms to match, fill the budget in document order
+        relevant_only = any(weights.values())
+        if not relevant_only:
+            ranked = sentences
+
+        kept, used = set(), 0
+        for index, position, sentence in ranked:
+            cost = count_tokens(sentence)
+            if kept and used + cost > self.token_budget:
+                continue
+            if kept and relevant_only and not self._coverage(weights, sentence):
+                continue
+            kept.add((index, position))
+            used += cost
+
+        compressed = []
+        for index, node in enumerate(nodes):
+            parts = [s for i, p, s in sentences if i == index and (i, p) in kept]
+            if not parts:
+                continue
+            source = node.node
+            compressed.append(
+                NodeWithScore(
+                    node=TextNode(
+                        id_=source.node_id,
+                        text=" ".join(parts),
+                        metadata=source.metadata,
+                        excluded_embed_metadata_keys=source.excluded_embed_metadata_keys,
+                        excluded_llm_metadata_keys=source.excluded_llm_metadata_keys,
+                    ),
+                    score=node.score,
+                )
+            )
+        return compressed
+
+    def __call__(self, question, nodes):
+        """
+        Reranks and compresses retrieved candidates.
+
+        Returns:
+            tuple: (compressed nodes, prompt token counts {'before', 'after'}
+                where 'before' is the prompt of the top_k uncompressed
+                candidates as retrieved)
+        """
+        before = prompt_tokens(question, nodes[: self.top_k])
+        compressed = self.compress(question, self.rerank(question, nodes))
+        return compressed, {"before": before, "after": prompt_tokens(question, compressed)}
@@ -0,0 +1,212 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import List, Optional
+
+from llama_index.core.embeddings import BaseEmbedding
+from pydantic import PrivateAttr
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (provider, model, text hash).
+
+    Vectors are stored as packed float32 blobs in a SQLite file and evicted
+    least-recently-used once `max_entries` is exceeded.
+    """
+
+    def __init__(self, path, max_entries=200_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, env):
+        """Returns the cache configured in EnvLoader, or None when disabled."""
+        if not env.EMBEDDING_CACHE:
+            return None
+        return cls(
+            Path(env.CACHE_DIR) / "embeddings.sqlite3",
+            max_entries=env.EMBEDDING_CACHE_MAX_ENTRIES,
+        )
+
+    @staticmethod
+    def make_key(provider, model, kind, text) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{provider}:{model}:{kind}:{digest}"
+
+    def get_many(self, keys) -> List[Optional[List[float]]]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        vectors = []
+        for key in keys:
+            blob = found.get(key)
+            vectors.append(array("f", blob).tolist() if blob is not None else None)
+        return vectors
+
+    def put_many(self, items):
+        """Stores a {key: vector} mapping and evicts the oldest entries if needed."""
+        now = time.time()
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def lookup(self, provider, model, kind, texts, compute):
+        """
+        Returns embeddings for `texts`, calling `compute` only for the misses.
+
+        Args:
+            compute (callable): Receives the list of missing texts and returns
+                their embeddings in the same order
+        """
+        keys = [self.make_key(provider, model, kind, t) for t in texts]
+        vectors = self.get_many(keys)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            computed = compute([texts[i] for i in missing])
+            self.put_many({keys[i]: v for i, v in zip(missing, computed)})
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+    async def alookup(self, provider, model, kind, texts, compute):
+        """Async variant of lookup; `compute` is a coroutine function."""
+        keys = [self.make_key(provider, model, kind, t) for t in texts]
+        vectors = self.get_many(keys)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            computed = await compute([texts[i] for i in missing])
+            self.put_many({keys[i]: v for i, v in zip(missing, computed)})
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+
+class CachedEmbedding(BaseEmbedding):
+    """llama-index embedding that serves repeated texts from an EmbeddingCache."""
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _provider: str = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache: EmbeddingCache, provider="ollama"):
+        super().__init__(
+            model_name=inner.model_name, embed_batch_size=inner.embed_batch_size
+        )
+        self._inner = inner
+        self._cache = cache
+        self._provider = provider
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._cache.lookup(
+            self._provider,
+            self.model_name,
+            "query",
+            [query],
+            lambda texts: [self._inner._get_query_embedding(texts[0])],
+        )[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        async def compute(texts):
+            return [await self._inner._aget_query_embedding(texts[0])]
+
+        vectors = await self._cache.alookup(
+            self._provider, self.model_name, "query", [query], compute
+        )
+        return vectors[0]
+
+    def get_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """Embeds several queries, computing the misses in one inner batch."""
+
+        def compute(texts):
+            if hasattr(self._inner, "get_query_embeddings"):
+                return self._inner.get_query_embeddings(texts)
+            return [self._inner._get_query_embedding(text) for text in texts]
+
+        return self._cache.lookup(self._provider, self.model_name, "query", queries, compute)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._cache.lookup(
+            self._provider,
+            self.model_name,
+            "text",
+            texts,
+            self._inner._get_text_embeddings,
+        )
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self._cache.alookup(
+            self._provider,
+            self.model_name,
+            "text",
+            texts,
+            self._inner._aget_text_embeddings,
+        )
+
@@ -1,18 +1,67 @@
-from langchain_pinecone import PineconeEmbeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from services.embedding_cache import EmbeddingCache
 
 
 class EmbeddingFactory:
     @staticmethod
-    def create(provider: str, api_key: str):
+    def create(provider: str, api_key: str, cache: EmbeddingCache = None):
         provider = provider.lower()
+        # Provider packages are imported on use: each pulls in its own SDK
         if provider == "openai":
-            return PineconeEmbeddings(
-                model="multilingual-e5-large", pinecone_api_key=api_key
-            )
+            from langchain_pinecone import PineconeEmbeddings
+
+            model = "multilingual-e5-large"
+            embedding = PineconeEmbeddings(model=model, pinecone_api_key=api_key)
         elif provider == "google":
-            return GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001", google_api_key=api_key
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+            model = "models/embedding-001"
+            embedding = GoogleGenerativeAIEmbeddings(
+                model=model, google_api_key=api_key
             )
         else:
             raise ValueError("Embedding não suportado: use 'openai' ou 'google'.")
+
+        if cache is not None:
+            return CachedLangchainEmbeddings(embedding, cache, provider, model)
+        return embedding
+
+
+class CachedLangchainEmbeddings(Embeddings):
+    """langchain Embeddings wrapper backed by the same EmbeddingCache."""
+
+    def __init__(self, inner, cache: EmbeddingCache, provider, model):
+        self.inner = inner
+        self.cache = cache
+        self.provider = provider
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cache.lookup(
+            self.provider, self.model, "text", texts, self.inner.embed_documents
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cache.lookup(
+            self.provider,
+            self.model,
+            "query",
+            [text],
+            lambda texts: [self.inner.embed_query(texts[0])],
+        )[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.cache.alookup(
+            self.provider, self.model, "text", texts, self.inner.aembed_documents
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        async def compute(texts):
+            return [await self.inner.aembed_query(texts[0])]
+
+        return (
+            await self.cache.alookup(self.provider, self.model, "query", [text], compute)
+        )[0]
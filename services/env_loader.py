@@ -5,12 +5,125 @@ from decouple import config
 class EnvLoader:
     def __init__(self):
         self.OPENAI_API_KEY = config("OPENAI_API_KEY", default=None)
-        self.PINECONE_API_KEY = config("PINECONE_API_KEY")
+        # 'pinecone', 'local' (memory-mapped store under LOCAL_VECTOR_DIR) or
+        # 'snapshot' (read-only search of the SNAPSHOT_DIR files)
+        self.VECTOR_BACKEND = config("VECTOR_BACKEND", default="pinecone").strip().lower()
+        if self.VECTOR_BACKEND in ("local", "snapshot"):
+            self.PINECONE_API_KEY = config("PINECONE_API_KEY", default="")
+        else:
+            self.PINECONE_API_KEY = config("PINECONE_API_KEY")
         self.GOOGLE_API_KEY = config("GOOGLE_API_KEY", default=None)
         self.PINECONE_CLOUD = config("PINECONE_CLOUD", default="aws")
         self.PINECONE_REGION = config("PINECONE_REGION", default="us-east-1")
+        # Pinecone data plane: gRPC transport (needs 'pinecone[grpc]'), parallel
+        # requests, retries on 429/5xx and seconds index stats are reused
+        self.PINECONE_GRPC = config("PINECONE_GRPC", default=False, cast=bool)
+        self.PINECONE_POOL_THREADS = config("PINECONE_POOL_THREADS", default=8, cast=int)
+        self.PINECONE_RETRIES = config("PINECONE_RETRIES", default=4, cast=int)
+        self.PINECONE_STATS_TTL = config("PINECONE_STATS_TTL", default=10.0, cast=float)
+        self.LOCAL_VECTOR_DIR = config("LOCAL_VECTOR_DIR", default=".vectors")
+        # Coarse IVF partition for large local namespaces (0 = exact search)
+        self.LOCAL_IVF_LISTS = config("LOCAL_IVF_LISTS", default=0, cast=int)
+        self.LOCAL_IVF_NPROBE = config("LOCAL_IVF_NPROBE", default=8, cast=int)
+        # Share of dead (deleted or replaced) rows that triggers a compaction (0 = never)
+        self.LOCAL_COMPACT_RATIO = config("LOCAL_COMPACT_RATIO", default=0.3, cast=float)
+        # Namespace snapshots (snapshot.py): folder and vector compression
+        # ('int8', 'pq' or 'float32')
+        self.SNAPSHOT_DIR = config("SNAPSHOT_DIR", default=".snapshots")
+        self.SNAPSHOT_COMPRESSION = config("SNAPSHOT_COMPRESSION", default="int8")
+        # Ollama server (the ollama client library reads the same variable)
+        self.OLLAMA_HOST = config("OLLAMA_HOST", default="http://localhost:11434")
+        # Seconds to wait for a phi3 answer
+        self.LLM_REQUEST_TIMEOUT = config(
+            "LLM_REQUEST_TIMEOUT", default=100020.0, cast=float
+        )
+        # Print answers token by token as phi3 generates them
+        self.STREAM_ANSWERS = config("STREAM_ANSWERS", default=True, cast=bool)
+        # Background behavior analysis (0 workers = analyze before the next prompt)
+        self.BEHAVIOR_WORKERS = config("BEHAVIOR_WORKERS", default=1, cast=int)
+        self.BEHAVIOR_BATCH_SIZE = config("BEHAVIOR_BATCH_SIZE", default=4, cast=int)
+        # Schema-constrained behavior analysis with a generated-token cap
+        self.BEHAVIOR_CONSTRAINED = config("BEHAVIOR_CONSTRAINED", default=True, cast=bool)
+        self.BEHAVIOR_MAX_TOKENS = config("BEHAVIOR_MAX_TOKENS", default=256, cast=int)
+        self.BEHAVIOR_RETRIES = config("BEHAVIOR_RETRIES", default=1, cast=int)
+        # Structured JSONL interaction log (buffered, rotated and gzip-compressed)
+        self.LOG_DIR = config("LOG_DIR", default="logs")
+        self.LOG_BATCH_SIZE = config("LOG_BATCH_SIZE", default=50, cast=int)
+        self.LOG_FLUSH_INTERVAL = config("LOG_FLUSH_INTERVAL", default=2.0, cast=float)
+        self.LOG_MAX_BYTES = config("LOG_MAX_BYTES", default=20 * 1024 * 1024, cast=int)
+        self.LOG_MAX_AGE = config("LOG_MAX_AGE", default=86400, cast=int)
+        # Number of processes used to parse PDFs during ingestion (1 = sequential)
+        self.INGEST_WORKERS = config("INGEST_WORKERS", default=1, cast=int)
+        # Local folder for ingestion manifests and other caches
+        self.CACHE_DIR = config("CACHE_DIR", default=".cache")
+        # Reuse extracted PDF page text across runs (stored in CACHE_DIR)
+        self.PDF_TEXT_CACHE = config("PDF_TEXT_CACHE", default=True, cast=bool)
+        # Chunking: 'chars' or 'tokens' (sizes are then counted in tokens)
+        self.CHUNK_SPLITTER = config("CHUNK_SPLITTER", default="chars")
+        self.CHUNK_SIZE = config("CHUNK_SIZE", default=1000, cast=int)
+        self.CHUNK_OVERLAP = config("CHUNK_OVERLAP", default=100, cast=int)
+        # Drop near-duplicate chunks (MinHash LSH) before embedding, within a
+        # corpus or, with DEDUP_SCOPE='global', across the corpora loaded together
+        self.CHUNK_DEDUP = config("CHUNK_DEDUP", default=True, cast=bool)
+        self.DEDUP_THRESHOLD = config("DEDUP_THRESHOLD", default=0.85, cast=float)
+        self.DEDUP_SCOPE = config("DEDUP_SCOPE", default="corpus")
+        # Concurrent embed/upsert pipeline
+        self.EMBED_BATCH_SIZE = config("EMBED_BATCH_SIZE", default=32, cast=int)
+        self.EMBED_CONCURRENCY = config("EMBED_CONCURRENCY", default=4, cast=int)
+        self.UPSERT_BATCH_SIZE = config("UPSERT_BATCH_SIZE", default=200, cast=int)
+        self.PIPELINE_QUEUE_SIZE = config("PIPELINE_QUEUE_SIZE", default=8, cast=int)
+        # Persistent embedding cache (stored in CACHE_DIR)
+        self.EMBEDDING_CACHE = config("EMBEDDING_CACHE", default=True, cast=bool)
+        self.EMBEDDING_CACHE_MAX_ENTRIES = config(
+            "EMBEDDING_CACHE_MAX_ENTRIES", default=200_000, cast=int
+        )
+        # Answer cache: exact and embedding-similarity matches (stored in CACHE_DIR)
+        self.ANSWER_CACHE = config("ANSWER_CACHE", default=True, cast=bool)
+        self.ANSWER_CACHE_THRESHOLD = config(
+            "ANSWER_CACHE_THRESHOLD", default=0.92, cast=float
+        )
+        self.ANSWER_CACHE_TTL = config("ANSWER_CACHE_TTL", default=604800, cast=int)
+        self.ANSWER_CACHE_MAX_ENTRIES = config(
+            "ANSWER_CACHE_MAX_ENTRIES", default=5000, cast=int
+        )
+        # Retrieval: 'dense', 'hybrid' (BM25 + dense, rank-fused) or 'lexical'
+        self.RETRIEVAL_MODE = config("RETRIEVAL_MODE", default="hybrid")
+        self.RRF_K = config("RRF_K", default=60, cast=int)
+        # Seconds to wait for the query embedding before answering from BM25 alone
+        self.EMBED_TIMEOUT = config("EMBED_TIMEOUT", default=5.0, cast=float)
+        # Rerank RERANK_CANDIDATES hits and keep their relevant sentences only
+        self.CONTEXT_COMPRESSION = config("CONTEXT_COMPRESSION", default=True, cast=bool)
+        self.RERANK_CANDIDATES = config("RERANK_CANDIDATES", default=10, cast=int)
+        self.CONTEXT_TOKEN_BUDGET = config("CONTEXT_TOKEN_BUDGET", default=600, cast=int)
+        # Stage timings and token counts (METRICS_PORT serves /metrics, 0 = off)
+        self.TELEMETRY = config("TELEMETRY", default=True, cast=bool)
+        self.METRICS_PORT = config("METRICS_PORT", default=0, cast=int)
+        # Interface /metrics listens on ('0.0.0.0' exposes it on every one)
+        self.METRICS_HOST = config("METRICS_HOST", default="127.0.0.1")
+        # Seconds between stage summaries printed to the console (0 = off)
+        self.METRICS_SUMMARY_INTERVAL = config(
+            "METRICS_SUMMARY_INTERVAL", default=0.0, cast=float
+        )
+        # HTTP service (server.py): concurrent requests per corpus and how many
+        # may wait for a slot before new ones get 429
+        self.SERVER_HOST = config("SERVER_HOST", default="127.0.0.1")
+        self.SERVER_PORT = config("SERVER_PORT", default=8000, cast=int)
+        self.CORPUS_CONCURRENCY = config("CORPUS_CONCURRENCY", default=2, cast=int)
+        self.ADMISSION_QUEUE_SIZE = config("ADMISSION_QUEUE_SIZE", default=32, cast=int)
+        self.SERVER_SHUTDOWN_TIMEOUT = config(
+            "SERVER_SHUTDOWN_TIMEOUT", default=30, cast=int
+        )
+        # Fast start: cache Pinecone index metadata for INDEX_METADATA_TTL
+        # seconds and load the models into Ollama in the background
+        self.FAST_START = config("FAST_START", default=False, cast=bool)
+        self.INDEX_METADATA_TTL = config("INDEX_METADATA_TTL", default=3600, cast=int)
+        # How long Ollama keeps the models loaded after a request (e.g. '30m')
+        self.MODEL_KEEP_ALIVE = config("MODEL_KEEP_ALIVE", default="30m")
+        # Print how long each startup phase took
+        self.STARTUP_PROFILE = config("STARTUP_PROFILE", default=False, cast=bool)
 
         os.environ["OPENAI_API_KEY"] = self.OPENAI_API_KEY or ""
         os.environ["PINECONE_API_KEY"] = self.PINECONE_API_KEY
+        os.environ["OLLAMA_HOST"] = self.OLLAMA_HOST
         if self.GOOGLE_API_KEY:
             os.environ["GOOGLE_API_KEY"] = self.GOOGLE_API_KEY
@@ -0,0 +1,54 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+
+class IndexMetadataCache:
+    """
+    Remembers slow-to-fetch vector index facts (existence, vector counts).
+
+    Entries live in a small JSON file and expire after `ttl` seconds, so a
+    restart within the TTL skips the list_indexes/describe_index_stats round
+    trips to Pinecone.
+    """
+
+    def __init__(self, path, ttl=3600):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        try:
+            self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @classmethod
+    def from_env(cls, env):
+        """Returns the cache used in FAST_START mode, or None otherwise."""
+        if not env.FAST_START or env.INDEX_METADATA_TTL <= 0:
+            return None
+        return cls(Path(env.CACHE_DIR) / "index_metadata.json", ttl=env.INDEX_METADATA_TTL)
+
+    def get(self, key):
+        """Returns the cached value, or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.time() - entry["at"] > self.ttl:
+            return None
+        return entry["value"]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = {"value": value, "at": time.time()}
+            self._save()
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self._entries), encoding="utf-8")
+        temporary.replace(self.path)
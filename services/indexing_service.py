@@ -0,0 +1,423 @@
+import threading
+from pathlib import Path
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.schema import TextNode
+
+from loaders.pdf_loader import chunk_page_spans, find_pdf_files, iter_pdf_pages
+from services.bm25_index import detect_language
+from services.chunk_dedup import chunk_set_version
+from services.ingestion_manifest import (
+    IngestionCheckpoint,
+    file_sha256,
+    text_sha256,
+    vector_id,
+)
+from services.ingestion_pipeline import IngestionPipeline
+from services.local_vector_store import LocalVectorStore
+from services.snapshot import SnapshotVectorStore
+from services.telemetry import METRICS
+
+
+# Bumped whenever build_chunk_nodes writes different metadata: namespaces
+# stored with an older version are upserted again (see sync_corpus)
+CHUNK_METADATA_VERSION = 2
+# Metadata kept for filtering only; the LLM still sees the source and pages
+LLM_EXCLUDED_METADATA = ["chunk_hash", "corpus", "language"]
+
+
+def build_chunk_nodes(source, spans, corpus=None):
+    """
+    Turns the chunks of one source file into nodes with deterministic IDs.
+
+    Every node carries the metadata retrieval can be filtered on: source
+    file, corpus, page span (1-based, inclusive), detected language and
+    chunk hash. None of it is embedded, so it never changes a vector.
+
+    Args:
+        source (str): File path relative to the data folder
+        spans (list): (chunk text, first page, last page) tuples, see
+            chunk_page_spans
+        corpus (str): Name of the corpus the file is indexed for
+
+    Returns:
+        tuple: (list of TextNode, list of manifest chunk entries)
+    """
+    nodes, entries, seen = [], [], {}
+    for chunk, page_start, page_end in spans:
+        chunk_hash = text_sha256(chunk)
+        occurrence = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = occurrence + 1
+
+        node_id = vector_id(source, chunk_hash, occurrence)
+        metadata = {
+            "source": source,
+            "corpus": corpus or "",
+            "page_start": page_start,
+            "page_end": page_end,
+            "language": detect_language(chunk),
+            "chunk_hash": chunk_hash,
+        }
+        nodes.append(
+            TextNode(
+                id_=node_id,
+                text=chunk,
+                metadata=metadata,
+                excluded_embed_metadata_keys=list(metadata),
+                excluded_llm_metadata_keys=LLM_EXCLUDED_METADATA,
+            )
+        )
+        entries.append({"id": node_id, "hash": chunk_hash})
+    return nodes, entries
+
+
+def _stale_dependents(manifest, scope, changed, file_hashes, dedup):
+    """
+    Adds to `changed` the unchanged files whose dropped near-duplicates point
+    to a file that changed, was removed or now keeps other chunks.
+    """
+
+    def current_version(label):
+        label_scope, _, source = label.partition("/")
+        if label_scope != scope:
+            return dedup.version(label)
+        if source in changed or source not in file_hashes:
+            return None
+        return chunk_set_version(manifest.chunk_ids(source))
+
+    found = True
+    while found:
+        found = False
+        for source, file_hash in file_hashes.items():
+            if source in changed:
+                continue
+            for label, version in manifest.duplicate_of(source).items():
+                if current_version(label) != version:
+                    changed[source] = file_hash
+                    found = True
+                    break
+
+
+def sync_corpus(
+    vector_store,
+    embed_model,
+    manifest,
+    data_folder="data",
+    subfolder=None,
+    workers=1,
+    pipeline=None,
+    text_cache=None,
+    chunking=None,
+    dedup=None,
+    corpus=None,
+):
+    """
+    Brings a vector store namespace in line with the PDFs on disk.
+
+    Only files whose hash differs from the manifest are parsed, only chunks
+    whose ID is not already stored are embedded, and the vectors of chunks
+    (or files) that disappeared are deleted.
+
+    Progress is saved as batches are stored: a file enters the manifest once
+    all its new chunks are upserted, and the IDs of every committed batch go
+    to an IngestionCheckpoint. A run that crashes resumes from there instead
+    of re-embedding the work already stored.
+
+    Args:
+        pipeline (IngestionPipeline): Embed/upsert pipeline writing to
+            `vector_store` (built with default settings when omitted)
+        text_cache (PDFTextCache): Extracted page text cache
+        chunking (dict): chunk_size, chunk_overlap and splitter passed to
+            chunk_pages. Changing them re-chunks every file.
+        dedup (NearDuplicateIndex): Drops chunks that nearly duplicate a
+            chunk already kept, in the same file, in another file of the
+            corpus or (when the index is shared) in a corpus synced before.
+            Files whose dropped chunks relied on a file that changed are
+            synced again.
+        corpus (str): Corpus name stored in the chunk metadata. Namespaces
+            whose chunks were stored with older metadata (see
+            CHUNK_METADATA_VERSION) get every chunk upserted again; the
+            embedding cache keeps that from re-embedding them.
+
+    Returns:
+        dict: Counts of upserted and deleted vectors, of changed files and
+        of near-duplicate chunks dropped
+    """
+    pdf_files = {
+        Path(p).relative_to(data_folder).as_posix(): p
+        for p in find_pdf_files(data_folder, subfolder)
+    }
+
+    chunking = chunking or {}
+    dedup_settings = dedup.settings() if dedup is not None else {}
+    # Lossy vectors (an int8 snapshot restore) are embedded again as well
+    refresh = manifest.metadata_version != CHUNK_METADATA_VERSION or manifest.lossy_vectors
+    rechunk = refresh or manifest.chunking != chunking or manifest.dedup != dedup_settings
+    file_hashes = {source: file_sha256(path) for source, path in pdf_files.items()}
+    changed = {
+        source: file_hash
+        for source, file_hash in file_hashes.items()
+        if rechunk or manifest.file_hash(source) != file_hash
+    }
+    removed = [s for s in manifest.sources() if s not in pdf_files]
+
+    # Near-duplicates are labelled '<namespace manifest>/<source>'
+    scope = manifest.path.stem
+    if dedup is not None:
+        _stale_dependents(manifest, scope, changed, file_hashes, dedup)
+        for source in file_hashes:
+            if source not in changed:
+                dedup.add_source(f"{scope}/{source}", manifest.chunks(source))
+
+    if not changed and not removed:
+        print("✅ Index is up to date, nothing to embed.")
+        return {"upserted": 0, "deleted": 0, "changed_files": 0, "duplicates": 0}
+
+    checkpoint = IngestionCheckpoint.for_manifest(manifest)
+    committed = checkpoint.committed()
+    if committed:
+        print(f"⏯️ Resuming an interrupted sync: {len(committed)} chunks already stored.")
+
+    lock = threading.Lock()
+    # Changed files whose new chunks are not all stored yet: the IDs still
+    # pending, the manifest entries and the stale IDs to delete afterwards
+    progress = {}
+    deleted = duplicates = 0
+
+    def finish(source):
+        # Called under `lock` once every new chunk of `source` is stored
+        nonlocal deleted
+        state = progress.pop(source)
+        if state["stale"]:
+            vector_store.delete_nodes(node_ids=state["stale"])
+            deleted += len(state["stale"])
+        manifest.update_file(
+            source, changed[source], state["entries"], state["duplicate_of"]
+        )
+        manifest.save()
+
+    def changed_nodes():
+        # Parsed lazily so the pipeline embeds one file while the next is read
+        nonlocal duplicates
+        paths = [pdf_files[source] for source in changed]
+        for path, pages, elapsed in iter_pdf_pages(
+            paths, workers=workers, cache=text_cache
+        ):
+            source = Path(path).relative_to(data_folder).as_posix()
+            spans = chunk_page_spans(pages, **chunking)
+            nodes, entries = build_chunk_nodes(source, spans, corpus)
+            dropped, duplicate_of = 0, {}
+            if dedup is not None:
+                nodes, dropped, duplicate_of = dedup.filter(f"{scope}/{source}", nodes)
+                kept = {node.node_id for node in nodes}
+                entries = [entry for entry in entries if entry["id"] in kept]
+                duplicates += dropped
+                METRICS.increment("ingest_duplicate_chunks_total", dropped)
+
+            old_ids = set(manifest.chunk_ids(source))
+            new_ids = {entry["id"] for entry in entries}
+            todo = [
+                n
+                for n in nodes
+                if (refresh or n.node_id not in old_ids) and n.node_id not in committed
+            ]
+            print(
+                f"PDF '{Path(path).name}' changed: {len(new_ids - old_ids)} new chunks, "
+                f"{len(old_ids - new_ids)} stale, {dropped} near-duplicates dropped "
+                f"({elapsed:.2f}s)."
+            )
+            with lock:
+                progress[source] = {
+                    "pending": {n.node_id for n in todo},
+                    "entries": entries,
+                    "duplicate_of": duplicate_of,
+                    "stale": list(old_ids - new_ids),
+                }
+                if not todo:
+                    finish(source)
+            yield from todo
+
+    def on_commit(batch):
+        checkpoint.record(node.node_id for node in batch)
+        with lock:
+            for node in batch:
+                state = progress.get(node.metadata["source"])
+                if state is not None:
+                    state["pending"].discard(node.node_id)
+            for source in [s for s, state in progress.items() if not state["pending"]]:
+                finish(source)
+
+    if pipeline is None:
+        pipeline = IngestionPipeline(embed_model, vector_store)
+    print(f"🔧 Embedding and upserting chunks of {len(changed)} changed files...")
+    upserted = pipeline.run(changed_nodes(), on_commit=on_commit)
+
+    stale_ids = []
+    for source in removed:
+        stale_ids.extend(manifest.chunk_ids(source))
+        print(f"🗑️ '{source}' was removed from the corpus.")
+    if stale_ids:
+        vector_store.delete_nodes(node_ids=stale_ids)
+    if rechunk and isinstance(vector_store, LocalVectorStore):
+        # Every chunk was written again; drop the rows they replaced
+        vector_store.compact()
+
+    for source in removed:
+        manifest.remove_file(source)
+    manifest.chunking = chunking
+    manifest.dedup = dedup_settings
+    manifest.metadata_version = CHUNK_METADATA_VERSION
+    manifest.lossy_vectors = False
+    manifest.save()
+    checkpoint.clear()
+
+    deleted += len(stale_ids)
+    print(
+        f"✅ {upserted} chunks upserted, {deleted} deleted, "
+        f"{duplicates} near-duplicates skipped."
+    )
+    return {
+        "upserted": upserted,
+        "deleted": deleted,
+        "changed_files": len(changed) + len(removed),
+        "duplicates": duplicates,
+    }
+
+
+def sync_lexical_index(
+    lexical_index,
+    manifest,
+    data_folder="data",
+    workers=1,
+    text_cache=None,
+    chunking=None,
+    corpus=None,
+    refresh=False,
+):
+    """
+    Aligns a BM25 index with the chunks listed in the manifest.
+
+    Runs after sync_corpus, so the manifest matches the files on disk. Chunks
+    come from the same chunk_page_spans/build_chunk_nodes path as the vectors
+    and keep their IDs and metadata; only files with chunks missing from the
+    index are chunked again (from the page text cache when enabled).
+
+    Args:
+        refresh (bool): Rebuild every chunk, e.g. after the chunk metadata
+            changed
+
+    Returns:
+        dict: Counts of added and removed chunks
+    """
+    expected = {source: set(manifest.chunk_ids(source)) for source in manifest.sources()}
+    indexed = lexical_index.ids()
+    wanted = set().union(*expected.values())
+
+    extra = list(indexed if refresh else indexed - wanted)
+    if refresh:
+        indexed = set()
+    if extra:
+        lexical_index.remove(extra)
+
+    missing = [source for source, ids in expected.items() if not ids <= indexed]
+    added = 0
+    if missing:
+        print(f"🔤 Building the lexical index for {len(missing)} files...")
+        paths = [Path(data_folder) / source for source in missing]
+        for path, pages, _ in iter_pdf_pages(paths, workers=workers, cache=text_cache):
+            source = Path(path).relative_to(data_folder).as_posix()
+            spans = chunk_page_spans(pages, **(chunking or {}))
+            nodes, _ = build_chunk_nodes(source, spans, corpus)
+            # Near-duplicates dropped from the namespace are not in the manifest
+            nodes = [
+                node
+                for node in nodes
+                if node.node_id in expected[source] and node.node_id not in indexed
+            ]
+            lexical_index.add((node.node_id, node.text, node.metadata) for node in nodes)
+            added += len(nodes)
+    return {"added": added, "removed": len(extra)}
+
+
+def load_or_sync_index(
+    vector_store,
+    embed_model,
+    manifest,
+    total_vectors,
+    data_folder="data",
+    subfolder=None,
+    workers=1,
+    pipeline=None,
+    text_cache=None,
+    chunking=None,
+    lexical_index=None,
+    dedup=None,
+    corpus=None,
+):
+    """
+    Syncs the namespace with the corpus and returns an index over it.
+
+    Namespaces filled before manifests existed have random vector IDs that
+    cannot be diffed, so they are loaded as-is instead of being re-ingested
+    on top of themselves (and get no lexical index). Snapshots are served as
+    they were exported, with the lexical index built from their chunks.
+
+    Args:
+        lexical_index (BM25Index): Kept in step with the namespace when given
+        dedup (NearDuplicateIndex): Near-duplicate filter, see sync_corpus
+        corpus (str): Corpus name stored in the chunk metadata
+
+    Returns:
+        VectorStoreIndex or None when the namespace holds no vectors
+    """
+    if not total_vectors and manifest.sources():
+        # The namespace was wiped behind our back: everything must be re-embedded
+        manifest.clear()
+        IngestionCheckpoint.for_manifest(manifest).clear()
+
+    if isinstance(vector_store, SnapshotVectorStore):
+        print("📦 Serving the snapshot as exported, without syncing.")
+        if lexical_index is not None:
+            vector_store.fill_lexical_index(lexical_index)
+    elif total_vectors and not manifest.exists():
+        print(
+            "⚠️ Namespace was indexed without a manifest; skipping incremental sync. "
+            "Clear the namespace to rebuild it with deterministic IDs."
+        )
+    else:
+        refresh = manifest.metadata_version != CHUNK_METADATA_VERSION
+        sync_corpus(
+            vector_store,
+            embed_model,
+            manifest,
+            data_folder=data_folder,
+            subfolder=subfolder,
+            workers=workers,
+            pipeline=pipeline,
+            text_cache=text_cache,
+            chunking=chunking,
+            dedup=dedup,
+            corpus=corpus,
+        )
+        # A refresh or rechunk upserts chunks that were already stored, so
+        # the count comes from what the manifest now records
+        total_vectors = sum(len(manifest.chunks(source)) for source in manifest.sources())
+        if lexical_index is not None:
+            sync_lexical_index(
+                lexical_index,
+                manifest,
+                data_folder=data_folder,
+                workers=workers,
+                text_cache=text_cache,
+                chunking=chunking,
+                corpus=corpus,
+                refresh=refresh,
+            )
+
+    if total_vectors <= 0:
+        return None
+
+    print(f"📊 Loading index with {total_vectors} vectors...")
+    return VectorStoreIndex.from_vector_store(
+        vector_store=vector_store, embed_model=embed_model
+    )
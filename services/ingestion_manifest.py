@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path, block_size=1 << 20) -> str:
+    """Hashes a file in blocks so large PDFs are never fully loaded in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def vector_id(source: str, chunk_hash: str, occurrence: int = 0) -> str:
+    """
+    Deterministic vector ID for a chunk of a source file.
+
+    The same chunk of the same file always maps to the same ID, so unchanged
+    chunks are never re-embedded. `occurrence` separates identical chunks
+    repeated inside one file.
+    """
+    key = f"{source}\0{chunk_hash}\0{occurrence}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+class IngestionManifest:
+    """
+    Local record of what is stored in one index namespace.
+
+    For every source file it keeps the file hash and the (id, hash) of each
+    of its chunks, which is what incremental re-indexing diffs against.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.files = {}
+        # Chunking and near-duplicate settings the stored chunks were produced with
+        self.chunking = {}
+        self.dedup = {}
+        # Version of the chunk metadata stored with the vectors
+        self.metadata_version = None
+        # Set when the stored vectors are lossy reconstructions (an int8
+        # snapshot restore); the next sync embeds every chunk again
+        self.lossy_vectors = False
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.load_dict(json.load(f))
+
+    @classmethod
+    def for_namespace(cls, index_name, namespace, cache_dir=".cache"):
+        return cls(Path(cache_dir) / "manifests" / f"{index_name}__{namespace}.json")
+
+    def load_dict(self, data):
+        """Takes the content of a saved manifest (ignored if from another version)."""
+        if data.get("version") == MANIFEST_VERSION:
+            self.files = data.get("files", {})
+            self.chunking = data.get("chunking", {})
+            self.dedup = data.get("dedup", {})
+            self.metadata_version = data.get("metadata_version")
+            self.lossy_vectors = data.get("lossy_vectors", False)
+
+    def as_dict(self) -> dict:
+        return {
+            "version": MANIFEST_VERSION,
+            "chunking": self.chunking,
+            "dedup": self.dedup,
+            "metadata_version": self.metadata_version,
+            "lossy_vectors": self.lossy_vectors,
+            "files": self.files,
+        }
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def sources(self):
+        return list(self.files)
+
+    def file_hash(self, source):
+        return self.files.get(source, {}).get("sha256")
+
+    def chunks(self, source):
+        return self.files.get(source, {}).get("chunks", [])
+
+    def chunk_ids(self, source):
+        return [c["id"] for c in self.chunks(source)]
+
+    def duplicate_of(self, source):
+        return self.files.get(source, {}).get("duplicate_of", {})
+
+    def update_file(self, source, file_hash, chunks, duplicate_of=None):
+        """
+        Args:
+            source (str): File path relative to the data folder
+            file_hash (str): SHA-256 of the file
+            chunks (list): Dicts with the 'id' and 'hash' of each chunk
+            duplicate_of (dict): Version of each file whose chunks stand in
+                for near-duplicates dropped from this one
+        """
+        self.files[source] = {"sha256": file_hash, "chunks": chunks}
+        if duplicate_of:
+            self.files[source]["duplicate_of"] = duplicate_of
+
+    def remove_file(self, source):
+        self.files.pop(source, None)
+
+    def fingerprint(self) -> str:
+        """
+        Hash of the indexed file hashes and of the settings the chunks were
+        built with; changes whenever the namespace does, including a rechunk
+        or a metadata refresh that leaves every file untouched.
+        """
+        digest = hashlib.sha256()
+        settings = {
+            "chunking": self.chunking,
+            "dedup": self.dedup,
+            "metadata_version": self.metadata_version,
+        }
+        digest.update(json.dumps(settings, sort_keys=True).encode("utf-8") + b"\n")
+        for source in sorted(self.files):
+            digest.update(f"{source}\0{self.files[source]['sha256']}\n".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def clear(self):
+        self.files = {}
+
+    def save(self):
+        """Writes the manifest atomically so a crash never leaves it half written."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f)
+        os.replace(tmp_path, self.path)
+
+
+class IngestionCheckpoint:
+    """
+    Vector IDs committed by an interrupted sync, next to its manifest.
+
+    The manifest is only updated once every new chunk of a file is stored,
+    so this append-only file covers the files that were half done when a
+    run stopped. Each committed batch is one JSON line, flushed and synced
+    before the next batch is acknowledged; the file is removed when the
+    sync completes.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+
+    @classmethod
+    def for_manifest(cls, manifest):
+        return cls(manifest.path.with_suffix(".progress.jsonl"))
+
+    def committed(self) -> set:
+        """IDs recorded by earlier runs (a torn last line is ignored)."""
+        ids = set()
+        if not self.path.exists():
+            return ids
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ids.update(json.loads(line))
+                except ValueError:
+                    continue
+        return ids
+
+    def record(self, ids):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(list(ids)) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def clear(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from itertools import islice
+
+from llama_index.core.schema import MetadataMode
+
+_DONE = object()
+
+
+class IngestionPipeline:
+    """
+    Concurrent embed/upsert pipeline for llama-index nodes.
+
+    Nodes are read lazily from the source iterable, grouped into batches for
+    the embedding model and sent by `embed_concurrency` workers. Embedded
+    nodes go through a bounded queue to a single upsert stage that writes
+    large batches to the vector store. Both queues are bounded, so memory
+    stays flat whatever the corpus size: a slow stage simply makes the
+    previous one wait.
+    """
+
+    def __init__(
+        self,
+        embed_model,
+        vector_store,
+        embed_batch_size=32,
+        embed_concurrency=4,
+        upsert_batch_size=200,
+        queue_size=8,
+    ):
+        self.embed_model = embed_model
+        self.vector_store = vector_store
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.upsert_batch_size = upsert_batch_size
+        self.queue_size = queue_size
+
+    @classmethod
+    def from_env(cls, env, embed_model, vector_store):
+        return cls(
+            embed_model,
+            vector_store,
+            embed_batch_size=env.EMBED_BATCH_SIZE,
+            embed_concurrency=env.EMBED_CONCURRENCY,
+            upsert_batch_size=env.UPSERT_BATCH_SIZE,
+            queue_size=env.PIPELINE_QUEUE_SIZE,
+        )
+
+    def run(self, nodes, on_commit=None) -> int:
+        """
+        Embeds and upserts every node; returns how many were written.
+
+        Args:
+            on_commit (callable): Called (from a worker thread) with each
+                batch of nodes once the vector store has accepted it
+        """
+        return asyncio.run(self.arun(nodes, on_commit))
+
+    async def arun(self, nodes, on_commit=None) -> int:
+        self._on_commit = on_commit
+        embed_queue = asyncio.Queue(maxsize=self.queue_size)
+        upsert_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._started = time.perf_counter()
+
+        async with asyncio.TaskGroup() as group:
+            group.create_task(self._produce(iter(nodes), embed_queue))
+            for _ in range(self.embed_concurrency):
+                group.create_task(self._embed(embed_queue, upsert_queue))
+            upserted = group.create_task(self._upsert(upsert_queue))
+
+        return upserted.result()
+
+    async def _produce(self, nodes, embed_queue):
+        while True:
+            # The source may parse PDFs lazily; keep that off the event loop,
+            # one thread hop per batch rather than per node
+            batch = await asyncio.to_thread(list, islice(nodes, self.embed_batch_size))
+            if not batch:
+                break
+            await embed_queue.put(batch)
+        for _ in range(self.embed_concurrency):
+            await embed_queue.put(_DONE)
+
+    async def _embed(self, embed_queue, upsert_queue):
+        while True:
+            batch = await embed_queue.get()
+            if batch is _DONE:
+                await upsert_queue.put(_DONE)
+                return
+            texts = [n.get_content(metadata_mode=MetadataMode.EMBED) for n in batch]
+            # The whole batch goes to the model as one request; the public
+            # batch method would split it again by the model's own batch size
+            vectors = await self.embed_model._aget_text_embeddings(texts)
+            for node, vector in zip(batch, vectors):
+                node.embedding = vector
+            await upsert_queue.put(batch)
+
+    async def _upsert(self, upsert_queue):
+        buffer, written, finished = [], 0, 0
+        while finished < self.embed_concurrency:
+            batch = await upsert_queue.get()
+            if batch is _DONE:
+                finished += 1
+            else:
+                buffer.extend(batch)
+            if buffer and (
+                len(buffer) >= self.upsert_batch_size
+                or finished == self.embed_concurrency
+            ):
+                await asyncio.to_thread(self.vector_store.add, buffer)
+                if self._on_commit is not None:
+                    await asyncio.to_thread(self._on_commit, buffer)
+                written += len(buffer)
+                buffer = []
+                elapsed = time.perf_counter() - self._started
+                print(
+                    f"📈 {written} chunks upserted "
+                    f"({written / elapsed:.1f} docs/s)"
+                )
+        return written
@@ -0,0 +1,158 @@
+import datetime
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from services.telemetry import span
+
+_FLUSH = object()
+_STOP = object()
+
+
+class InteractionLog:
+    """
+    Buffered JSONL log of chat turns.
+
+    `write` only enqueues the record; a background thread appends batches of
+    records to `<log_dir>/<name>.jsonl` every `flush_interval` seconds or
+    every `batch_size` records. The active file is rotated once it exceeds
+    `max_bytes` or its first record is more than `max_age` seconds old, and rotated
+    files are gzip-compressed as `<name>-<timestamp>.jsonl.gz`.
+    """
+
+    def __init__(
+        self,
+        log_dir="logs",
+        name="interactions",
+        batch_size=50,
+        flush_interval=2.0,
+        max_bytes=20 * 1024 * 1024,
+        max_age=24 * 3600,
+    ):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.path = self.log_dir / f"{name}.jsonl"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._queue = queue.Queue()
+        self._opened_at = self._file_started_at()
+        self._thread = threading.Thread(target=self._run, name="interaction-log", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, env):
+        return cls(
+            log_dir=env.LOG_DIR,
+            batch_size=env.LOG_BATCH_SIZE,
+            flush_interval=env.LOG_FLUSH_INTERVAL,
+            max_bytes=env.LOG_MAX_BYTES,
+            max_age=env.LOG_MAX_AGE,
+        )
+
+    def write(self, record: dict):
+        """Queues a record; `ts` is added when missing."""
+        record.setdefault("ts", datetime.datetime.now().astimezone().isoformat())
+        self._queue.put(record)
+
+    def flush(self):
+        """Blocks until every record queued so far is on disk."""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _file_started_at(self):
+        """
+        When the active file was started: the time of its first record (the
+        mtime moves with every write, so an active log would never age).
+        """
+        if self.path.exists() and self.path.stat().st_size:
+            with open(self.path, "r", encoding="utf-8") as f:
+                first = f.readline()
+            try:
+                return datetime.datetime.fromisoformat(json.loads(first)["ts"]).timestamp()
+            except (ValueError, KeyError, TypeError):
+                return self.path.stat().st_mtime
+        return time.time()
+
+    def _run(self):
+        buffer, deadline = [], time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                buffer.append(item)
+                if len(buffer) < self.batch_size:
+                    continue
+
+            self._write_batch(buffer)
+            buffer, deadline = [], time.monotonic() + self.flush_interval
+            if isinstance(item, tuple) and item[0] is _FLUSH:
+                item[1].set()
+            elif item is _STOP:
+                return
+
+    def _write_batch(self, records):
+        if not records:
+            return
+        self._maybe_rotate()
+        lines = "".join(
+            json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records
+        )
+        with span("log_write"), open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _maybe_rotate(self):
+        if not self.path.exists():
+            self._opened_at = time.time()
+            return
+        too_big = self.path.stat().st_size >= self.max_bytes
+        too_old = time.time() - self._opened_at >= self.max_age
+        if not (too_big or too_old):
+            return
+
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        rotated = self.log_dir / f"{self.name}-{stamp}.jsonl"
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+        self._opened_at = time.time()
+
+
+def iter_log_records(log_dir="logs", name="interactions"):
+    """
+    Streams records from the active and rotated JSONL logs, oldest first.
+
+    Files are read line by line, so memory use does not depend on log size.
+    """
+    log_dir = Path(log_dir)
+    files = sorted(log_dir.glob(f"{name}-*.jsonl.gz"))
+    active = log_dir / f"{name}.jsonl"
+    if active.exists():
+        files.append(active)
+    for path in files:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
@@ -0,0 +1,426 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import (
+    metadata_dict_to_node,
+    node_to_metadata_dict,
+)
+from pydantic import PrivateAttr
+
+from services.metadata_filters import to_sql
+
+# The IVF lists are trained again once the namespace has grown this much
+IVF_RETRAIN_GROWTH = 2.0
+
+
+class LocalVectorStore(BasePydanticVectorStore):
+    """
+    Single-node vector store kept on local disk, one folder per namespace.
+
+    Embeddings are L2-normalised float32 rows appended to a memory-mapped
+    file, so cosine top-k is a single matrix-vector product. Node IDs, text
+    and metadata live in a SQLite side table indexed by row number. Deleted
+    or replaced rows are marked dead and skipped at query time; once they
+    make up `compact_ratio` of the rows, compact() rewrites the namespace
+    without them.
+
+    With `ivf_lists` set, namespaces larger than `ivf_min_vectors` get a
+    coarse k-means partition and queries only scan the `nprobe` closest lists.
+    The partition is trained again when the namespace has doubled since.
+
+    Metadata filters are pushed down to SQLite (json_extract over the
+    payload), so only the matching rows are scored; a filter matching fewer
+    than `ivf_min_vectors` rows is scanned exactly instead of probed.
+    """
+
+    stores_text: bool = True
+    is_embedding_query: bool = True
+
+    root_dir: str
+    index_name: str
+    namespace: str
+    ivf_lists: int = 0
+    nprobe: int = 8
+    ivf_min_vectors: int = 20_000
+    compact_ratio: float = 0.3
+
+    _dir: Path = PrivateAttr()
+    _conn: Any = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _dim: Optional[int] = PrivateAttr(default=None)
+    _alive: Any = PrivateAttr()
+    _row_ids: List[str] = PrivateAttr()
+    _id_rows: dict = PrivateAttr()
+    _matrix: Any = PrivateAttr(default=None)
+    _centroids: Any = PrivateAttr(default=None)
+    _assignments: Any = PrivateAttr(default=None)
+    _ivf_trained: int = PrivateAttr(default=0)
+    _generation: int = PrivateAttr(default=0)
+
+    def __init__(self, root_dir, index_name, namespace="default", **kwargs):
+        super().__init__(
+            root_dir=str(root_dir), index_name=index_name, namespace=namespace, **kwargs
+        )
+        self._dir = Path(root_dir) / index_name / namespace
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self._dir / "table.sqlite3", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL, alive INTEGER NOT NULL, "
+            "ref_doc_id TEXT, payload TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nodes_id ON nodes(id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nodes_ref ON nodes(ref_doc_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self._load()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return self._conn
+
+    @property
+    def _vectors_path(self) -> Path:
+        # Each compaction writes a new file, switched to in the same
+        # transaction that renumbers the rows
+        if not self._generation:
+            return self._dir / "vectors.f32"
+        return self._dir / f"vectors.{self._generation}.f32"
+
+    @property
+    def _ivf_path(self) -> Path:
+        return self._dir / "ivf.npz"
+
+    @property
+    def _assignments_path(self) -> Path:
+        return self._dir / "ivf_assignments.i32"
+
+    def _load(self):
+        row = self._conn.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+        self._dim = int(row[0]) if row else None
+        row = self._conn.execute("SELECT value FROM info WHERE key = 'generation'").fetchone()
+        self._generation = int(row[0]) if row else 0
+        # Left over by a compaction that crashed before or after switching files
+        for path in self._dir.glob("vectors*.f32"):
+            if path != self._vectors_path:
+                path.unlink()
+        rows = self._conn.execute("SELECT row, id, alive FROM nodes ORDER BY row").fetchall()
+        self._row_ids = [r[1] for r in rows]
+        self._alive = np.array([bool(r[2]) for r in rows], dtype=bool)
+        self._id_rows = {r[1]: r[0] for r in rows if r[2]}
+        self._matrix = None
+        # Vectors written by an add that crashed before its rows were committed
+        if self._dim and self._vectors_path.exists():
+            size = len(rows) * self._dim * 4
+            if self._vectors_path.stat().st_size > size:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(size)
+        if self._ivf_path.exists() and self._assignments_path.exists():
+            assignments = np.fromfile(self._assignments_path, dtype=np.int32)
+            # A partition that lost track of some rows is trained again on demand
+            if len(assignments) >= len(rows):
+                ivf = np.load(self._ivf_path)
+                self._centroids = ivf["centroids"]
+                self._ivf_trained = int(ivf["trained"]) if "trained" in ivf.files else len(rows)
+                self._assignments = assignments[: len(rows)]
+
+    def _vectors(self):
+        """Memory-maps the embedding matrix, remapping it after appends."""
+        rows = len(self._row_ids)
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            if rows == 0:
+                return np.empty((0, self._dim or 0), dtype=np.float32)
+            self._matrix = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim)
+            )
+        return self._matrix
+
+    def count(self) -> int:
+        """Number of live vectors in the namespace."""
+        return int(self._alive.sum())
+
+    def iter_vectors(self, batch_size=1000):
+        """
+        Yields the live vectors of the namespace in row order.
+
+        Yields:
+            tuple: (list of IDs, float32 matrix, list of node metadata dicts)
+
+        Raises:
+            RuntimeError: The namespace was compacted during the iteration
+        """
+        with self._lock:
+            live = np.flatnonzero(self._alive)
+            matrix = self._vectors()
+            generation = self._generation
+        for start in range(0, len(live), batch_size):
+            rows = live[start : start + batch_size].tolist()
+            placeholders = ",".join("?" * len(rows))
+            with self._lock:
+                if self._generation != generation:
+                    raise RuntimeError("The namespace was compacted while being read.")
+                payloads = dict(
+                    self._conn.execute(
+                        f"SELECT row, payload FROM nodes WHERE row IN ({placeholders})", rows
+                    ).fetchall()
+                )
+            yield (
+                [self._row_ids[r] for r in rows],
+                np.asarray(matrix[rows]),
+                [json.loads(payloads[r]) for r in rows],
+            )
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        vectors = np.asarray([n.get_embedding() for n in nodes], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO info (key, value) VALUES ('dim', ?)",
+                    (str(self._dim),),
+                )
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match "
+                    f"namespace dimension {self._dim}."
+                )
+
+            replaced = [self._id_rows[n.node_id] for n in nodes if n.node_id in self._id_rows]
+            self._mark_dead(replaced)
+
+            first_row = len(self._row_ids)
+            # Written at the offset of `first_row`, over any leftovers of an
+            # add that failed before its rows were committed
+            self._write_at(self._vectors_path, first_row * self._dim * 4, vectors)
+            self._conn.executemany(
+                "INSERT INTO nodes (row, id, alive, ref_doc_id, payload) VALUES (?, ?, 1, ?, ?)",
+                [
+                    (
+                        first_row + i,
+                        node.node_id,
+                        node.ref_doc_id,
+                        json.dumps(node_to_metadata_dict(node, flat_metadata=False)),
+                    )
+                    for i, node in enumerate(nodes)
+                ],
+            )
+            self._conn.commit()
+
+            for i, node in enumerate(nodes):
+                self._row_ids.append(node.node_id)
+                self._id_rows[node.node_id] = first_row + i
+            self._alive = np.concatenate([self._alive, np.ones(len(nodes), dtype=bool)])
+            if self._centroids is not None:
+                # Only the new rows' lists are appended, not the whole partition
+                new = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+                self._write_at(self._assignments_path, first_row * 4, new)
+                self._assignments = np.concatenate([self._assignments, new])
+        return [n.node_id for n in nodes]
+
+    @staticmethod
+    def _write_at(path, offset, array):
+        """Writes `array` at `offset` and drops anything stored after it."""
+        with open(path, "r+b" if path.exists() else "wb") as f:
+            f.seek(offset)
+            f.write(array.tobytes())
+            f.truncate()
+
+    def _mark_dead(self, rows):
+        if not rows:
+            return
+        self._conn.executemany(
+            "UPDATE nodes SET alive = 0 WHERE row = ?", [(int(r),) for r in rows]
+        )
+        self._conn.commit()
+        for r in rows:
+            self._alive[r] = False
+            self._id_rows.pop(self._row_ids[r], None)
+        dead = len(self._alive) - self.count()
+        if self.compact_ratio and dead and dead >= self.compact_ratio * len(self._alive):
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrites the namespace without its dead rows.
+
+        The live vectors are copied to a new file, then one SQLite transaction
+        drops the dead rows, renumbers the live ones and switches to the new
+        file, so a crash leaves either the old layout or the new one. IVF
+        assignments follow the rows; the lists themselves are kept.
+        """
+        with self._lock:
+            live = np.flatnonzero(self._alive)
+            if len(live) == len(self._alive):
+                return
+            matrix = self._vectors()
+            old_path = self._vectors_path
+            generation = self._generation + 1
+            new_path = self._dir / f"vectors.{generation}.f32"
+            with open(new_path, "wb") as f:
+                for start in range(0, len(live), 65_536):
+                    f.write(np.asarray(matrix[live[start : start + 65_536]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            # Stale assignments must not outlive the renumbering; without
+            # them the partition is trained again if the rewrite is lost
+            self._assignments_path.unlink(missing_ok=True)
+            self._conn.execute("DELETE FROM nodes WHERE alive = 0")
+            # Ascending order: each target row was freed by an earlier update
+            self._conn.executemany(
+                "UPDATE nodes SET row = ? WHERE row = ?",
+                [(new, int(old)) for new, old in enumerate(live) if new != old],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO info (key, value) VALUES ('generation', ?)",
+                (str(generation),),
+            )
+            self._conn.commit()
+
+            self._generation = generation
+            self._matrix = None
+            old_path.unlink(missing_ok=True)
+            self._row_ids = [self._row_ids[r] for r in live]
+            self._alive = np.ones(len(live), dtype=bool)
+            self._id_rows = {node_id: row for row, node_id in enumerate(self._row_ids)}
+            if self._centroids is not None:
+                self._assignments = self._assignments[live]
+                self._write_at(self._assignments_path, 0, self._assignments)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row FROM nodes WHERE ref_doc_id = ? AND alive = 1", (ref_doc_id,)
+            ).fetchall()
+            self._mark_dead([r[0] for r in rows])
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        """
+        Deletes the live nodes with the given IDs and/or matching `filters`;
+        with both, only nodes selected by both are deleted. Empty filters
+        select nothing on their own, so they never wipe the namespace.
+        """
+        if filters is not None and not filters.filters:
+            filters = None
+        if node_ids is None and filters is None:
+            return
+        with self._lock:
+            selected = self._alive.copy()
+            if node_ids is not None:
+                by_id = np.zeros_like(selected)
+                by_id[[self._id_rows[i] for i in node_ids if i in self._id_rows]] = True
+                selected &= by_id
+            if filters is not None:
+                selected &= self._filter_mask(filters)
+            self._mark_dead(np.flatnonzero(selected).tolist())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mark_dead(np.flatnonzero(self._alive).tolist())
+
+    def build_ivf(self, iterations=10, sample_size=50_000, seed=0):
+        """Trains the coarse k-means partition on a sample of live vectors."""
+        with self._lock:
+            matrix = self._vectors()
+            live = np.flatnonzero(self._alive)
+            rng = np.random.default_rng(seed)
+            sample = matrix[rng.choice(live, min(sample_size, len(live)), replace=False)]
+            centroids = sample[rng.choice(len(sample), self.ivf_lists, replace=False)]
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for k in range(self.ivf_lists):
+                    members = sample[labels == k]
+                    if len(members):
+                        centroid = members.mean(axis=0)
+                        centroids[k] = centroid / (np.linalg.norm(centroid) or 1)
+
+            assignments = np.empty(matrix.shape[0], dtype=np.int32)
+            for start in range(0, matrix.shape[0], 65_536):
+                block = matrix[start : start + 65_536]
+                assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            self._centroids, self._assignments = centroids, assignments
+            self._ivf_trained = len(live)
+            np.savez(self._ivf_path, centroids=centroids, trained=len(live))
+            self._write_at(self._assignments_path, 0, assignments)
+
+    def _filter_mask(self, filters):
+        """Rows whose metadata match `filters`, evaluated by SQLite."""
+        clause, params = to_sql(filters)
+        rows = self._conn.execute(
+            f"SELECT row FROM nodes WHERE alive = 1 AND ({clause})", params
+        ).fetchall()
+        mask = np.zeros(len(self._row_ids), dtype=bool)
+        mask[[r[0] for r in rows]] = True
+        return mask
+
+    def _candidate_rows(self, query_vector, filters=None):
+        live = self._alive
+        if filters is not None and filters.filters:
+            live = live & self._filter_mask(filters)
+        use_ivf = self.ivf_lists and int(live.sum()) >= self.ivf_min_vectors
+        if use_ivf and (
+            self._centroids is None
+            or self.count() > IVF_RETRAIN_GROWTH * self._ivf_trained
+        ):
+            self.build_ivf()
+        if not use_ivf:
+            return np.flatnonzero(live)
+        probes = np.argsort(self._centroids @ query_vector)[-self.nprobe :]
+        return np.flatnonzero(live & np.isin(self._assignments, probes))
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        query_vector = np.asarray(query.query_embedding, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1)
+
+        with self._lock:
+            if not self.count():
+                return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+            rows = self._candidate_rows(query_vector, query.filters)
+            if not len(rows):
+                return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+            scores = self._vectors()[rows] @ query_vector
+
+            k = min(query.similarity_top_k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            top_rows = rows[top].tolist()
+
+            # The connection is shared with add/delete on other threads
+            placeholders = ",".join("?" * len(top_rows))
+            payloads = dict(
+                self._conn.execute(
+                    f"SELECT row, payload FROM nodes WHERE row IN ({placeholders})", top_rows
+                ).fetchall()
+            )
+        nodes = [metadata_dict_to_node(json.loads(payloads[r])) for r in top_rows]
+        return VectorStoreQueryResult(
+            nodes=nodes,
+            similarities=scores[top].tolist(),
+            ids=[n.node_id for n in nodes],
+        )
@@ -0,0 +1,113 @@
+import re
+
+from llama_index.core.vector_stores.types import (
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+)
+
+# Operators every backend understands: Pinecone natively, the local store in
+# SQL and the BM25 / snapshot stores in Python
+_COMPARISONS = {
+    FilterOperator.EQ: ("=", lambda value, operand: value == operand),
+    FilterOperator.NE: ("!=", lambda value, operand: value != operand),
+    FilterOperator.GT: (">", lambda value, operand: value is not None and value > operand),
+    FilterOperator.GTE: (">=", lambda value, operand: value is not None and value >= operand),
+    FilterOperator.LT: ("<", lambda value, operand: value is not None and value < operand),
+    FilterOperator.LTE: ("<=", lambda value, operand: value is not None and value <= operand),
+}
+_KEY = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def build_filters(source=None, corpus=None, language=None, page_from=None, page_to=None):
+    """
+    Metadata filters over the chunk metadata written at ingestion.
+
+    Args:
+        source (str or list): Source file(s), relative to the data folder
+        corpus (str or list): Corpus name(s)
+        language (str or list): Detected language(s): 'pt', 'en' or 'unknown'
+        page_from (int): Only chunks ending on or after this page
+        page_to (int): Only chunks starting on or before this page
+
+    Returns:
+        MetadataFilters or None when no condition is given
+    """
+    filters = []
+    for key, value in (("source", source), ("corpus", corpus), ("language", language)):
+        if isinstance(value, (list, tuple)):
+            filters.append(MetadataFilter(key=key, value=list(value), operator=FilterOperator.IN))
+        elif value:
+            filters.append(MetadataFilter(key=key, value=value))
+    # A chunk matches when its page span overlaps [page_from, page_to]
+    if page_from is not None:
+        filters.append(
+            MetadataFilter(key="page_end", value=page_from, operator=FilterOperator.GTE)
+        )
+    if page_to is not None:
+        filters.append(
+            MetadataFilter(key="page_start", value=page_to, operator=FilterOperator.LTE)
+        )
+    return MetadataFilters(filters=filters) if filters else None
+
+
+def _condition(filters):
+    condition = filters.condition or FilterCondition.AND
+    if condition not in (FilterCondition.AND, FilterCondition.OR):
+        raise ValueError(f"Unsupported filter condition: {condition}")
+    return condition
+
+
+def matches(metadata, filters) -> bool:
+    """Evaluates MetadataFilters against one metadata dict."""
+    if filters is None or not filters.filters:
+        return True
+    results = []
+    for item in filters.filters:
+        if isinstance(item, MetadataFilters):
+            results.append(matches(metadata, item))
+            continue
+        value = metadata.get(item.key)
+        if item.operator == FilterOperator.IN:
+            results.append(value in item.value)
+        elif item.operator == FilterOperator.NIN:
+            results.append(value not in item.value)
+        elif item.operator in _COMPARISONS:
+            results.append(_COMPARISONS[item.operator][1](value, item.value))
+        else:
+            raise ValueError(f"Unsupported filter operator: {item.operator}")
+    if _condition(filters) == FilterCondition.OR:
+        return any(results)
+    return all(results)
+
+
+def to_sql(filters, column="payload"):
+    """
+    Translates MetadataFilters to a SQLite WHERE clause over a JSON column.
+
+    Returns:
+        tuple: (SQL expression, parameters)
+    """
+    clauses, params = [], []
+    for item in filters.filters:
+        if isinstance(item, MetadataFilters):
+            clause, nested = to_sql(item, column)
+            clauses.append(f"({clause})")
+            params.extend(nested)
+            continue
+        if not _KEY.fullmatch(item.key):
+            raise ValueError(f"Unsupported metadata key in filter: {item.key!r}")
+        field = f"json_extract({column}, '$.{item.key}')"
+        if item.operator in (FilterOperator.IN, FilterOperator.NIN):
+            values = list(item.value)
+            negation = "NOT " if item.operator == FilterOperator.NIN else ""
+            clauses.append(f"{field} {negation}IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        elif item.operator in _COMPARISONS:
+            clauses.append(f"{field} {_COMPARISONS[item.operator][0]} ?")
+            params.append(item.value)
+        else:
+            raise ValueError(f"Unsupported filter operator: {item.operator}")
+    joiner = " OR " if _condition(filters) == FilterCondition.OR else " AND "
+    return joiner.join(clauses) or "1", params
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Union
+
+from llama_index.embeddings.ollama import OllamaEmbedding
+from ollama import AsyncClient
+from pydantic import Field, PrivateAttr
+
+
+class BatchedOllamaEmbedding(OllamaEmbedding):
+    """
+    OllamaEmbedding that sends each batch as a single /api/embed request.
+
+    The upstream class embeds a batch with one HTTP call per text; Ollama's
+    embed endpoint accepts a list, which saves a round trip per text during
+    ingestion and lets a whole list of questions be embedded at once.
+
+    The async client is tied to the event loop it was first used on, so one
+    is created per loop: each ingestion run has its own asyncio.run().
+    """
+
+    keep_alive: Optional[Union[float, str]] = Field(
+        default=None,
+        description="How long Ollama keeps the model loaded after a request, e.g. '30m'.",
+    )
+
+    _client_kwargs: Dict[str, Any] = PrivateAttr()
+    _async_loop: Any = PrivateAttr(default=None)
+
+    def __init__(self, client_kwargs: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        super().__init__(client_kwargs=client_kwargs, **kwargs)
+        self._client_kwargs = client_kwargs or {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BatchedOllamaEmbedding"
+
+    def _loop_client(self) -> AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_client = AsyncClient(host=self.base_url, **self._client_kwargs)
+            self._async_loop = loop
+        return self._async_client
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        result = self._client.embed(
+            model=self.model_name,
+            input=texts,
+            options=self.ollama_additional_kwargs,
+            keep_alive=self.keep_alive,
+        )
+        return [list(vector) for vector in result.embeddings]
+
+    async def _aembed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        result = await self._loop_client().embed(
+            model=self.model_name,
+            input=texts,
+            options=self.ollama_additional_kwargs,
+            keep_alive=self.keep_alive,
+        )
+        return [list(vector) for vector in result.embeddings]
+
+    # Every path goes through _embed/_aembed so each request carries keep_alive;
+    # the upstream single-text calls would reset the model TTL to Ollama's default
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed([self._format_query(query)])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return (await self._aembed([self._format_query(query)]))[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed([self._format_text(text)])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aembed([self._format_text(text)]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([self._format_text(text) for text in texts])
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed([self._format_text(text) for text in texts])
+
+    def get_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """Embeds several queries with one request."""
+        return self._embed([self._format_query(query) for query in queries])
+
+    def warm_up(self):
+        """Loads the model into Ollama (bypassing any cache) so it is resident."""
+        self._embed(["warm-up"])
@@ -1,36 +1,476 @@
-from pinecone import Pinecone, ServerlessSpec
-from langchain_pinecone import PineconeVectorStore
+import json
+import random
+import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pinecone import Pinecone, ServerlessSpec
+
+from services.telemetry import METRICS, span, traced
+
+# Data plane calls timed as 'pinecone.<method>' stages
+TRACED_METHODS = {"upsert", "query", "delete", "fetch", "describe_index_stats"}
+# Throttling and server errors worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# gRPC status names mapped to the HTTP status they stand for
+GRPC_STATUSES = {"RESOURCE_EXHAUSTED": 429, "INTERNAL": 500, "UNAVAILABLE": 503}
+# Request limits of the Pinecone data plane
+MAX_UPSERT_BATCH = 1000
+MAX_DELETE_BATCH = 1000
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+
+
+def error_status(error):
+    """HTTP status of a Pinecone REST or gRPC error, or None."""
+    status = getattr(error, "status", None)
+    if isinstance(status, int):
+        return status
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            return GRPC_STATUSES.get(getattr(code(), "name", ""))
+        except Exception:
+            return None
+    return None
+
+
+def is_too_large(error) -> bool:
+    return error_status(error) in (400, 413) and "size" in str(error).lower()
+
+
+def with_retry(function, retries=4, base_delay=0.25, max_delay=8.0):
+    """
+    Calls `function`, retrying throttled (429) and 5xx failures.
+
+    Waits follow exponential backoff with full jitter, so parallel workers
+    that were throttled together do not retry in lockstep.
+    """
+    attempt = 0
+    while True:
+        try:
+            return function()
+        except Exception as e:
+            status = error_status(e)
+            if status not in RETRY_STATUSES or attempt >= retries:
+                raise
+            METRICS.increment("pinecone_retries_total", status=status)
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2**attempt)))
+            attempt += 1
+
+
+def _vector_bytes(vector) -> int:
+    """Rough request size of one vector (dict, tuple or SDK Vector)."""
+    if isinstance(vector, dict):
+        values, metadata = vector.get("values", ()), vector.get("metadata")
+    elif isinstance(vector, tuple):
+        values, metadata = vector[1], vector[2] if len(vector) > 2 else None
+    else:
+        values, metadata = getattr(vector, "values", ()), getattr(vector, "metadata", None)
+    # About 12 characters per float once serialized
+    return 64 + 12 * len(values) + len(json.dumps(metadata or {}, default=str))
+
+
+class AdaptiveBatchSize:
+    """
+    Batch size that follows the observed request latency.
+
+    Grows by a quarter while requests finish under `target_seconds`, shrinks
+    by a quarter when they are slower, and halves when a request is rejected
+    as too large.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=MAX_UPSERT_BATCH, target_seconds=1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.size = max(minimum, min(initial, maximum))
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            if seconds > self.target_seconds:
+                self.size = max(self.minimum, self.size * 3 // 4)
+            else:
+                self.size = min(self.maximum, self.size + max(1, self.size // 4))
+
+    def shrink(self):
+        with self._lock:
+            self.size = max(self.minimum, self.size // 2)
+
+
+class IndexHandle:
+    """
+    Pooled Pinecone index handle.
+
+    Data plane calls are timed as 'pinecone.<method>' stages and retried on
+    throttling and server errors. Batched upserts (as sent by the llama-index
+    and langchain vector stores) go through PineconeService.upsert, which
+    sends the batches in parallel; stats come from the service's TTL cache.
+    """
+
+    def __init__(self, index, service, index_name):
+        self._index = index
+        self._service = service
+        self._index_name = index_name
+
+    def upsert(self, vectors, namespace=None, batch_size=None, **kwargs):
+        if kwargs.get("async_req"):
+            # The caller manages its own futures
+            return self._call("upsert", vectors, namespace=namespace, **kwargs)
+        kwargs.pop("async_req", None)
+        kwargs.pop("show_progress", None)
+        return self._service.upsert(
+            self._index_name, vectors, namespace=namespace, batch_size=batch_size, **kwargs
+        )
+
+    def describe_index_stats(self, **kwargs):
+        if kwargs:
+            return self._call("describe_index_stats", **kwargs)
+        return self._service.describe_index_stats(self._index_name)
+
+    def _call(self, name, *args, **kwargs):
+        method = getattr(self._index, name)
+        with span(f"pinecone.{name}"):
+            result = with_retry(
+                lambda: method(*args, **kwargs), retries=self._service.retries
+            )
+        if name in ("upsert", "delete"):
+            self._service.invalidate_stats(self._index_name)
+        return result
+
+    def __getattr__(self, name):
+        attribute = getattr(self._index, name)
+        if name not in TRACED_METHODS:
+            return attribute
+        return lambda *args, **kwargs: self._call(name, *args, **kwargs)
 
 
 class PineconeService:
-    def __init__(self, api_key, cloud="aws", region="us-east-1"):
-        self.pc = Pinecone(api_key=api_key)
+    """
+    Pinecone control plane helpers plus a parallel, retrying data plane.
+
+    One service (see `shared`) owns the client, one reusable handle per
+    index and the thread pool the batched operations run on, so every
+    corpus reuses the same HTTP (or gRPC) connections.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        api_key,
+        cloud="aws",
+        region="us-east-1",
+        metadata_cache=None,
+        grpc=False,
+        pool_threads=8,
+        retries=4,
+        stats_ttl=10.0,
+    ):
+        """
+        Args:
+            metadata_cache (IndexMetadataCache): Remembers that an index exists
+                so restarts skip list_indexes
+            grpc (bool): Use the gRPC data plane (needs 'pinecone[grpc]')
+            pool_threads (int): Concurrent data plane requests
+            retries (int): Retries of a throttled or failed (5xx) request
+            stats_ttl (float): Seconds describe_index_stats results are reused
+        """
+        client = Pinecone
+        if grpc:
+            try:
+                from pinecone.grpc import PineconeGRPC as client
+            except ImportError as e:
+                raise ImportError(
+                    "PINECONE_GRPC needs the gRPC extra: pip install 'pinecone[grpc]'"
+                ) from e
+
+        self.pc = client(api_key=api_key)
         self.spec = ServerlessSpec(cloud=cloud, region=region)
+        self.metadata_cache = metadata_cache
+        self.pool_threads = pool_threads
+        self.retries = retries
+        self.stats_ttl = stats_ttl
+        self._handles = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=pool_threads, thread_name_prefix="pinecone"
+        )
+
+    @classmethod
+    def from_env(cls, env, metadata_cache=None):
+        return cls(
+            api_key=env.PINECONE_API_KEY,
+            cloud=env.PINECONE_CLOUD,
+            region=env.PINECONE_REGION,
+            metadata_cache=metadata_cache,
+            grpc=env.PINECONE_GRPC,
+            pool_threads=env.PINECONE_POOL_THREADS,
+            retries=env.PINECONE_RETRIES,
+            stats_ttl=env.PINECONE_STATS_TTL,
+        )
+
+    @classmethod
+    def shared(cls, env, metadata_cache=None):
+        """Returns the process-wide service for these settings, creating it once."""
+        key = (
+            env.PINECONE_API_KEY,
+            env.PINECONE_CLOUD,
+            env.PINECONE_REGION,
+            env.PINECONE_GRPC,
+        )
+        with cls._shared_lock:
+            service = cls._shared.get(key)
+            if service is None:
+                service = cls._shared[key] = cls.from_env(env, metadata_cache)
+            elif service.metadata_cache is None:
+                service.metadata_cache = metadata_cache
+            return service
 
-    def ensure_index(self, index_name, dimension, metric="cosine"):
+    @traced("pinecone.ensure_index")
+    def ensure_index(self, index_name, dimension, metric="cosine", ready_timeout=120.0):
+        key = f"{index_name}:exists"
+        if self.metadata_cache is not None and self.metadata_cache.get(key):
+            return
         if index_name not in self.pc.list_indexes().names():
+            # timeout=-1 returns at once; readiness is polled below
             self.pc.create_index(
-                name=index_name, dimension=dimension, metric=metric, spec=self.spec
+                name=index_name,
+                dimension=dimension,
+                metric=metric,
+                spec=self.spec,
+                timeout=-1,
             )
             print(f"🪴 Índice '{index_name}' criado.")
-            time.sleep(2)
+            self.wait_until_ready(index_name, timeout=ready_timeout)
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(key, True)
+
+    def wait_until_ready(self, index_name, timeout=120.0, interval=0.25):
+        """Polls describe_index with backoff until the index accepts requests."""
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.pc.describe_index(index_name).status
+            ready = status.get("ready") if isinstance(status, dict) else status.ready
+            if ready:
+                return
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Pinecone index '{index_name}' not ready after {timeout}s")
+            time.sleep(interval)
+            interval = min(interval * 2, 5.0)
+
+    def index(self, index_name):
+        """Returns the pooled handle of an index (created on first use)."""
+        with self._lock:
+            handle = self._handles.get(index_name)
+            if handle is None:
+                handle = self._handles[index_name] = IndexHandle(
+                    self.pc.Index(index_name), self, index_name
+                )
+            return handle
+
+    def _run_batches(self, items, send, sizer):
+        """
+        Sends `items` in batches on the pool, sizing each batch from `sizer`.
+
+        A batch rejected as too large is split in two and sent again.
+
+        Returns:
+            list: The results of `send`, in completion order
+        """
+        remaining = deque()
+        position, in_flight, results = 0, {}, []
+
+        def timed(batch):
+            began = time.perf_counter()
+            result = with_retry(lambda: send(batch), retries=self.retries)
+            return result, time.perf_counter() - began
+
+        while position < len(items) or remaining or in_flight:
+            while len(in_flight) < self.pool_threads and (
+                remaining or position < len(items)
+            ):
+                if remaining:
+                    batch = remaining.popleft()
+                else:
+                    batch = items[position : position + sizer.size]
+                    position += len(batch)
+                in_flight[self._pool.submit(timed, batch)] = batch
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    if not is_too_large(e) or len(batch) == 1:
+                        for other in in_flight:
+                            other.cancel()
+                        raise
+                    sizer.shrink()
+                    middle = len(batch) // 2
+                    remaining.extend([batch[:middle], batch[middle:]])
+                    continue
+                sizer.record(seconds)
+                results.append(result)
+        return results
+
+    def upsert(self, index_name, vectors, namespace=None, batch_size=None, **kwargs):
+        """
+        Upserts vectors in parallel batches.
+
+        The first batch size is `batch_size` (100 by default), capped so a
+        request stays under Pinecone's 2 MB limit; later batches adapt to the
+        observed latency.
+
+        Returns:
+            dict: {'upserted_count': number of vectors written}
+        """
+        vectors = list(vectors)
+        if not vectors:
+            return {"upserted_count": 0}
+        index = self.index(index_name)._index
+        by_size = max(1, int(MAX_REQUEST_BYTES * 0.8) // _vector_bytes(vectors[0]))
+        sizer = AdaptiveBatchSize(
+            min(batch_size or 100, by_size), maximum=min(MAX_UPSERT_BATCH, by_size)
+        )
+
+        def send(batch):
+            with span("pinecone.upsert"):
+                index.upsert(vectors=batch, namespace=namespace, **kwargs)
+            return len(batch)
+
+        written = sum(self._run_batches(vectors, send, sizer))
+        self.invalidate_stats(index_name)
+        return {"upserted_count": written}
+
+    def delete(self, index_name, ids, namespace=None):
+        """Deletes vectors by ID, 1000 per request, in parallel."""
+        ids = list(ids)
+        if not ids:
+            return
+        index = self.index(index_name)._index
+
+        def send(batch):
+            with span("pinecone.delete"):
+                index.delete(ids=batch, namespace=namespace)
+
+        sizer = AdaptiveBatchSize(MAX_DELETE_BATCH, maximum=MAX_DELETE_BATCH)
+        self._run_batches(ids, send, sizer)
+        self.invalidate_stats(index_name)
+
+    def query_many(self, index_name, vectors, top_k=10, namespace=None, **kwargs):
+        """
+        Runs one query per vector in parallel.
+
+        Returns:
+            list: The query responses, in the order of `vectors`
+        """
+        handle = self.index(index_name)
+        return list(
+            self._pool.map(
+                lambda vector: handle.query(
+                    vector=vector, top_k=top_k, namespace=namespace, **kwargs
+                ),
+                vectors,
+            )
+        )
+
+    def query_namespaces(
+        self, index_name, vector, namespaces, top_k=10, metric="cosine", **kwargs
+    ):
+        """
+        Queries several namespaces in parallel and merges their matches.
+
+        Returns:
+            list: The best `top_k` matches overall as dicts with 'id', 'score',
+                'metadata' and 'namespace'
+        """
+        handle = self.index(index_name)
+        responses = self._pool.map(
+            lambda namespace: handle.query(
+                vector=vector, top_k=top_k, namespace=namespace, **kwargs
+            ),
+            namespaces,
+        )
+        matches = [
+            {
+                "id": match["id"],
+                "score": match["score"],
+                "metadata": match.get("metadata"),
+                "namespace": namespace,
+            }
+            for namespace, response in zip(namespaces, responses)
+            for match in response["matches"]
+        ]
+        # Smaller is closer for euclidean distance, larger for the others
+        matches.sort(key=lambda m: m["score"], reverse=metric != "euclidean")
+        return matches[:top_k]
+
+    def iter_vectors(self, index_name, namespace=None, batch_size=100):
+        """
+        Yields every vector of a namespace with its values and metadata.
+
+        IDs are listed one page at a time; the fetches of the next pages run
+        on the pool while a page is being consumed.
+
+        Yields:
+            tuple: (list of IDs, list of value lists, list of metadata dicts)
+        """
+        handle = self.index(index_name)
+
+        def fetch(ids):
+            vectors = handle.fetch(ids=ids, namespace=namespace).vectors
+            found = [vectors[i] for i in ids if i in vectors]
+            return (
+                [v.id for v in found],
+                [list(v.values) for v in found],
+                [dict(v.metadata or {}) for v in found],
+            )
+
+        pending = deque()
+        for ids in handle._index.list(namespace=namespace, limit=batch_size):
+            pending.append(self._pool.submit(fetch, ids))
+            if len(pending) > self.pool_threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def describe_index_stats(self, index_name, max_age=None):
+        """describe_index_stats, reused for `stats_ttl` seconds (or `max_age`)."""
+        max_age = self.stats_ttl if max_age is None else max_age
+        with self._lock:
+            cached = self._stats.get(index_name)
+        if cached is not None and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+        stats = self.index(index_name)._call("describe_index_stats")
+        with self._lock:
+            self._stats[index_name] = (time.monotonic(), stats)
+        return stats
+
+    def invalidate_stats(self, index_name):
+        with self._lock:
+            self._stats.pop(index_name, None)
 
     def insert_texts(self, texts, index_name, embedding, namespace):
-        PineconeVectorStore.from_texts(
-            texts=texts,
-            index_name=index_name,
-            embedding=embedding,
-            namespace=namespace,
+        self.connect_to_index(index_name, embedding, namespace).add_texts(
+            texts, async_req=False
         )
         print(f"✅ {len(texts)} textos inseridos em '{index_name}'.")
 
     def connect_to_index(self, index_name, embedding, namespace):
-        return PineconeVectorStore.from_existing_index(
-            index_name=index_name,
-            embedding=embedding,
-            namespace=namespace,
+        """langchain vector store over the pooled handle (no new client)."""
+        # langchain is only needed by these helpers, so it is imported on use
+        from langchain_pinecone import PineconeVectorStore
+
+        return PineconeVectorStore(
+            index=self.index(index_name), embedding=embedding, namespace=namespace
         )
 
     def describe_index(self, index_name):
-        print(self.pc.Index(index_name).describe_index_stats())
+        print(self.describe_index_stats(index_name))
+
+    def close(self):
+        self._pool.shutdown(wait=True)
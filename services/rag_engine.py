@@ -0,0 +1,656 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from llama_index.core import QueryBundle, get_response_synthesizer
+from llama_index.core.base.response.schema import Response
+from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.llms.ollama import Ollama
+
+from loaders.pdf_text_cache import PDFTextCache
+from services.answer_cache import AnswerCache
+from services.bm25_index import BM25Index
+from services.chunk_dedup import NearDuplicateIndex
+from services.context_compressor import ContextCompressor
+from services.embedding_cache import CachedEmbedding, EmbeddingCache
+from services.ollama_embedding import BatchedOllamaEmbedding
+from services.index_metadata import IndexMetadataCache
+from services.indexing_service import LLM_EXCLUDED_METADATA, load_or_sync_index
+from services.ingestion_manifest import IngestionManifest
+from services.ingestion_pipeline import IngestionPipeline
+from services.telemetry import StartupProfile, Telemetry, observe_stage
+from services.vector_store_factory import (
+    count_vectors,
+    create_vector_store,
+    vector_count_key,
+)
+
+
+@dataclass(frozen=True)
+class Corpus:
+    name: str
+    index_name: str
+    subfolder: Optional[str]
+    namespace: str = "default"
+
+
+CORPORA = {
+    "news": Corpus("news", "news-example", "news"),
+    "blog": Corpus("blog", "blog-example", "blog"),
+    "weather": Corpus("weather", "weather-forecast-example", "weather_forecast"),
+    "llama": Corpus("llama", "llama-integration-example", None),
+}
+
+
+def chunking_options(env) -> dict:
+    """chunk_pages keyword arguments configured in EnvLoader."""
+    return {
+        "chunk_size": env.CHUNK_SIZE,
+        "chunk_overlap": env.CHUNK_OVERLAP,
+        "splitter": env.CHUNK_SPLITTER,
+    }
+
+
+class RagEngine:
+    """
+    One embedding model and one LLM serving several corpora.
+
+    Each corpus keeps its own index, but a question is embedded once, the
+    selected corpora are searched in parallel and the merged top-k nodes go
+    to a single synthesis call.
+
+    In 'hybrid' retrieval mode every corpus also has a BM25 index over the
+    same chunks; lexical and dense hits are combined with reciprocal rank
+    fusion, and the lexical side alone answers when the query embedding is
+    slow or failing.
+
+    With context compression enabled, RERANK_CANDIDATES nodes are fetched,
+    reranked down to `similarity_top_k` and cut to their query-relevant
+    sentences before synthesis, shrinking the phi3 prompt.
+
+    Near-duplicate chunks are dropped at ingestion (CHUNK_DEDUP), so the
+    top-k is not filled with copies of the same paragraph.
+
+    Every chunk carries its source file, corpus, page span and language.
+    Questions can be restricted with MetadataFilters (see build_filters),
+    which each vector store and BM25 index applies before ranking, and
+    answers list the citations of the chunks they were built from.
+    """
+
+    def __init__(self, env, corpora=None, similarity_top_k=3):
+        self.env = env
+        self.similarity_top_k = similarity_top_k
+        self.startup = StartupProfile()
+        self.telemetry = Telemetry.from_env(env)
+
+        # Embedding model (using local Ollama)
+        self.ollama_embedding = BatchedOllamaEmbedding(
+            model_name="nomic-embed-text",
+            base_url=env.OLLAMA_HOST,
+            keep_alive=env.MODEL_KEEP_ALIVE,
+            embed_batch_size=env.EMBED_BATCH_SIZE,
+        )
+        self.embed_model = self.ollama_embedding
+        embedding_cache = EmbeddingCache.from_env(env)
+        if embedding_cache is not None:
+            self.embed_model = CachedEmbedding(self.embed_model, embedding_cache)
+
+        print("🤖 Initializing Ollama model (phi3)...")
+        self.llm = Ollama(
+            model="phi3",
+            base_url=env.OLLAMA_HOST,
+            request_timeout=env.LLM_REQUEST_TIMEOUT,
+            context_window=8000,
+            keep_alive=env.MODEL_KEEP_ALIVE,
+        )
+        if env.FAST_START:
+            # Models load in Ollama while the corpora are synced
+            self.warm_up()
+        self.synthesizer = get_response_synthesizer(llm=self.llm)
+        self.streaming_synthesizer = get_response_synthesizer(
+            llm=self.llm, streaming=True
+        )
+
+        self.answer_cache = AnswerCache.from_env(env)
+        self.compressor = ContextCompressor.from_env(env, top_k=similarity_top_k)
+        # Candidates fetched per search: over-fetched when they get reranked
+        self.candidate_k = similarity_top_k
+        if self.compressor is not None:
+            self.candidate_k = max(env.RERANK_CANDIDATES, similarity_top_k)
+        self.text_cache = PDFTextCache(env.CACHE_DIR) if env.PDF_TEXT_CACHE else None
+        self.metadata_cache = IndexMetadataCache.from_env(env)
+        # Shared by every corpus with DEDUP_SCOPE='global': a corpus then
+        # skips chunks already kept by the corpora registered before it
+        self.dedup = None
+        if env.DEDUP_SCOPE == "global":
+            self.dedup = NearDuplicateIndex.from_env(env)
+
+        self.corpora = {}
+        self.indexes = {}
+        self.retrievers = {}
+        self.lexical = {}
+        self.versions = {}
+        for name in corpora or CORPORA:
+            self.register(CORPORA[name])
+        # Up to CORPUS_CONCURRENCY questions per corpus run at once (see the
+        # server's admission queue), each with a dense and a lexical search
+        # per corpus. The query embedding gets its own threads, so its
+        # EMBED_TIMEOUT never counts time queued behind other searches.
+        concurrency = max(self.env.CORPUS_CONCURRENCY, 1)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(2 * len(self.retrievers) * concurrency, 1)
+        )
+        self._embed_pool = ThreadPoolExecutor(
+            max_workers=max(len(self.retrievers) * concurrency, 1)
+        )
+
+    def close(self):
+        """Waits for in-flight searches and stops the telemetry exporters."""
+        self._pool.shutdown(wait=True)
+        self._embed_pool.shutdown(wait=True)
+        if self.telemetry is not None:
+            self.telemetry.close()
+
+    def warm_up(self):
+        """
+        Loads the embedding model and phi3 into Ollama in the background.
+
+        Both requests carry MODEL_KEEP_ALIVE, so the models stay resident and
+        the first question does not pay for loading them.
+
+        Returns:
+            list: The started (daemon) threads
+        """
+
+        def load(name, function):
+            try:
+                with self.startup.phase(f"warm_up.{name}"):
+                    function()
+            except Exception as e:
+                print(f"⚠️ Could not warm up {name}: {e!r}")
+
+        def load_llm():
+            self.llm.client.generate(
+                model=self.llm.model, prompt="", keep_alive=self.llm.keep_alive
+            )
+
+        threads = [
+            threading.Thread(
+                target=load, args=("embedding", self.ollama_embedding.warm_up), daemon=True
+            ),
+            threading.Thread(target=load, args=("llm", load_llm), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def register(self, corpus: Corpus):
+        """Syncs a corpus with its vector store and makes it searchable."""
+        with self.startup.phase(f"corpus.{corpus.name}"):
+            self._register(corpus)
+
+    def _register(self, corpus: Corpus):
+        vector_store = create_vector_store(
+            self.env,
+            corpus.index_name,
+            corpus.namespace,
+            metadata_cache=self.metadata_cache,
+        )
+        manifest = IngestionManifest.for_namespace(
+            corpus.index_name, corpus.namespace, cache_dir=self.env.CACHE_DIR
+        )
+        total_vectors = count_vectors(
+            vector_store,
+            corpus.namespace,
+            metadata_cache=self.metadata_cache,
+            index_name=corpus.index_name,
+        )
+        fingerprint = manifest.fingerprint() if manifest.exists() else None
+        lexical_index = None
+        if self.env.RETRIEVAL_MODE != "dense":
+            lexical_index = BM25Index.for_namespace(
+                corpus.index_name, corpus.namespace, cache_dir=self.env.CACHE_DIR
+            )
+        index = load_or_sync_index(
+            vector_store,
+            self.embed_model,
+            manifest,
+            total_vectors,
+            data_folder="data",
+            subfolder=corpus.subfolder,
+            workers=self.env.INGEST_WORKERS,
+            pipeline=IngestionPipeline.from_env(self.env, self.embed_model, vector_store),
+            text_cache=self.text_cache,
+            chunking=chunking_options(self.env),
+            lexical_index=lexical_index,
+            dedup=self.dedup or NearDuplicateIndex.from_env(self.env),
+            corpus=corpus.name,
+        )
+        if self.metadata_cache is not None and (
+            not manifest.exists() or manifest.fingerprint() != fingerprint
+        ):
+            # The sync changed the namespace: count it again next time
+            self.metadata_cache.invalidate(
+                vector_count_key(corpus.index_name, corpus.namespace)
+            )
+        if index is None:
+            print(f"⚠️ No documents found to index for '{corpus.name}'.")
+            return
+        self.corpora[corpus.name] = corpus
+        # Cached answers are only valid for the index content they came from
+        self.versions[corpus.name] = (
+            manifest.fingerprint() if manifest.exists() else f"legacy-{total_vectors}"
+        )
+        self.indexes[corpus.name] = index
+        self.retrievers[corpus.name] = index.as_retriever(
+            similarity_top_k=self.candidate_k
+        )
+        if lexical_index is not None and lexical_index.count():
+            self.lexical[corpus.name] = lexical_index
+        print(f"✅ Corpus '{corpus.name}' ready.")
+
+    def _select(self, corpora):
+        return [name for name in corpora or self.retrievers if name in self.retrievers]
+
+    def embed_query(self, question: str):
+        """
+        Embeds a question for dense search and the semantic answer cache.
+
+        Returns:
+            list or None: None in 'lexical' mode, or in 'hybrid' mode when the
+                embedding takes longer than EMBED_TIMEOUT or fails, so that
+                retrieval falls back to the BM25 indexes
+        """
+        mode = self.env.RETRIEVAL_MODE
+        if mode == "lexical":
+            return None
+        if mode == "dense" or not self.lexical:
+            return self.embed_model.get_query_embedding(question)
+        future = self._embed_pool.submit(self.embed_model.get_query_embedding, question)
+        try:
+            return future.result(timeout=self.env.EMBED_TIMEOUT)
+        except Exception as e:
+            print(f"⚠️ Query embedding unavailable ({e!r}); using lexical search only.")
+            return None
+
+    def embed_queries(self, questions: List[str]):
+        """
+        Embeds a batch of questions with a single embedding request.
+
+        Returns:
+            list: One embedding per question, or Nones in 'lexical' mode
+        """
+        if self.env.RETRIEVAL_MODE == "lexical":
+            return [None] * len(questions)
+        if not questions:
+            return []
+        return self.embed_model.get_query_embeddings(questions)
+
+    def _search_lexical(self, name, question, filters=None):
+        return [
+            NodeWithScore(
+                node=TextNode(
+                    id_=node_id,
+                    text=text,
+                    metadata=metadata,
+                    excluded_embed_metadata_keys=list(metadata),
+                    excluded_llm_metadata_keys=LLM_EXCLUDED_METADATA,
+                ),
+                score=score,
+            )
+            for node_id, text, metadata, score in self.lexical[name].search(
+                question, top_k=self.candidate_k, filters=filters
+            )
+        ]
+
+    def _retriever(self, name, filters=None):
+        if filters is None:
+            return self.retrievers[name]
+        # The store applies the filters before ranking, so the top-k is
+        # drawn from the matching chunks only
+        return self.indexes[name].as_retriever(
+            similarity_top_k=self.candidate_k, filters=filters
+        )
+
+    @staticmethod
+    def _dedupe(nodes):
+        """Sorts hits by score, keeping one copy of each chunk."""
+        # The 'llama' corpus overlaps the others
+        merged, seen = [], set()
+        for node in sorted(nodes, key=lambda n: n.score or 0.0, reverse=True):
+            key = node.node.metadata.get("chunk_hash") or node.node.get_content()
+            if key not in seen:
+                seen.add(key)
+                merged.append(node)
+        return merged
+
+    def _fuse(self, rankings):
+        """Reciprocal rank fusion: each list adds 1 / (RRF_K + rank) per chunk."""
+        fused, scores = {}, {}
+        for ranking in rankings:
+            for rank, node in enumerate(ranking, start=1):
+                key = node.node.metadata.get("chunk_hash") or node.node.get_content()
+                fused.setdefault(key, node)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.env.RRF_K + rank)
+        for key, node in fused.items():
+            node.score = scores[key]
+        return sorted(fused.values(), key=lambda n: n.score, reverse=True)
+
+    def retrieve(
+        self,
+        question: str,
+        corpora: Optional[List[str]] = None,
+        embedding=None,
+        dense=True,
+        top_k=None,
+        filters=None,
+    ):
+        """
+        Searches the selected corpora in parallel and merges their hits.
+
+        Dense hits are merged by similarity score; with BM25 indexes available
+        the dense and lexical rankings are combined by reciprocal rank fusion.
+
+        Args:
+            embedding (list): Query embedding, computed when omitted
+            dense (bool): False skips vector search, e.g. when the query
+                embedding already failed
+            top_k (int): Hits to return (`similarity_top_k` when omitted)
+            filters (MetadataFilters): Only search chunks whose metadata
+                match, e.g. build_filters(source='news/report.pdf', page_to=5)
+
+        Returns:
+            list: The overall top-k NodeWithScore objects
+        """
+        top_k = top_k or self.similarity_top_k
+        selected = self._select(corpora)
+        if not selected:
+            return []
+        lexical = [name for name in selected if name in self.lexical]
+        if dense and embedding is None:
+            embedding = self.embed_query(question)
+        if embedding is None and not lexical:
+            raise RuntimeError("No query embedding and no lexical index to search.")
+
+        dense_futures = []
+        if embedding is not None:
+            query_bundle = QueryBundle(question, embedding=embedding)
+            dense_futures = [
+                self._pool.submit(self._retriever(name, filters).retrieve, query_bundle)
+                for name in selected
+            ]
+        lexical_futures = [
+            self._pool.submit(self._search_lexical, name, question, filters)
+            for name in lexical
+        ]
+        rankings = [
+            self._dedupe([node for future in futures for node in future.result()])
+            for futures in (dense_futures, lexical_futures)
+            if futures
+        ]
+        if len(rankings) == 1:
+            return rankings[0][:top_k]
+        return self._fuse(rankings)[:top_k]
+
+    def _cache_scope(self, selected, filters=None):
+        scope = ",".join(sorted(selected))
+        if filters is not None:
+            # A filtered answer only stands for the same filters
+            scope += "|" + filters.model_dump_json()
+        version = ",".join(self.versions[name] for name in sorted(selected))
+        return scope, version
+
+    def _cached_answer(self, question, selected, timings, embedding=None, filters=None):
+        """
+        Looks the question up in the answer cache, embedding it if needed.
+
+        An `embedding` computed beforehand (see embed_queries) is reused.
+
+        Stage durations (seconds) are recorded in `timings`.
+
+        Returns:
+            tuple: (cached answer or None, cache tier, query embedding)
+        """
+        if self.answer_cache is not None:
+            began = time.perf_counter()
+            scope, version = self._cache_scope(selected, filters)
+            answer = self.answer_cache.get_exact(question, scope, version)
+            timings["cache_lookup"] = time.perf_counter() - began
+            if answer is not None:
+                return answer, "exact", None
+
+        if embedding is None:
+            began = time.perf_counter()
+            embedding = self.embed_query(question)
+            timings["embed"] = time.perf_counter() - began
+
+        if self.answer_cache is not None and embedding is not None:
+            began = time.perf_counter()
+            answer = self.answer_cache.get_similar(embedding, scope, version)
+            timings["cache_lookup"] += time.perf_counter() - began
+            if answer is not None:
+                return answer, "semantic", embedding
+        return None, None, embedding
+
+    def _remember(self, question, selected, answer, embedding, filters=None):
+        if self.answer_cache is not None and answer:
+            scope, version = self._cache_scope(selected, filters)
+            self.answer_cache.put(question, scope, version, answer, embedding)
+
+    def _retrieve_timed(self, question, selected, embedding, timings, filters=None):
+        """
+        Retrieves (and compresses, when enabled) the context of a question.
+
+        Returns:
+            tuple: (nodes, prompt token counts before/after compression or None)
+        """
+        began = time.perf_counter()
+        nodes = self.retrieve(
+            question,
+            selected,
+            embedding=embedding,
+            dense=embedding is not None,
+            top_k=self.candidate_k,
+            filters=filters,
+        )
+        timings["retrieve"] = time.perf_counter() - began
+        if self.compressor is None:
+            return nodes, None
+
+        began = time.perf_counter()
+        nodes, prompt_tokens = self.compressor(question, nodes)
+        timings["compress"] = time.perf_counter() - began
+        return nodes, prompt_tokens
+
+    def query(
+        self,
+        question: str,
+        corpora: Optional[List[str]] = None,
+        embedding: Optional[List[float]] = None,
+        filters=None,
+    ):
+        """
+        Answers a question with one LLM call over the merged context.
+
+        Repeated or reworded questions are served from the answer cache; the
+        returned Response then carries `metadata["cache"]` ('exact' or
+        'semantic') and no source nodes. `metadata["timings"]` holds the
+        duration of each stage in seconds, `metadata["citations"]` the
+        sources of the context (see citations) and, with context compression,
+        `metadata["prompt_tokens"]` the prompt size before and after it.
+
+        An `embedding` from embed_queries skips embedding the question again;
+        `filters` (MetadataFilters) restrict the chunks searched.
+        """
+        timings = {}
+        selected = self._select(corpora)
+        answer, tier, embedding = self._cached_answer(
+            question, selected, timings, embedding, filters
+        )
+        if answer is not None:
+            record_timings(timings)
+            return Response(
+                response=answer,
+                metadata={"cache": tier, "timings": timings, "citations": []},
+            )
+
+        nodes, prompt_tokens = self._retrieve_timed(
+            question, selected, embedding, timings, filters
+        )
+        began = time.perf_counter()
+        response = self.synthesizer.synthesize(question, nodes=nodes)
+        timings["synthesize"] = time.perf_counter() - began
+        record_timings(timings)
+        response.metadata = {
+            **(response.metadata or {}),
+            "timings": timings,
+            "prompt_tokens": prompt_tokens,
+            "citations": citations(response.source_nodes),
+        }
+        self._remember(question, selected, response.response, embedding, filters)
+        return response
+
+    def stream_query(
+        self, question: str, corpora: Optional[List[str]] = None, filters=None
+    ):
+        """
+        Answers a question token by token as phi3 generates it.
+
+        `filters` (MetadataFilters) restrict the chunks searched, as in query.
+
+        Returns:
+            AnswerStream: Iterate it to receive tokens; once exhausted it holds
+                the full response and its latency metrics
+        """
+        started = time.perf_counter()
+        timings = {}
+        selected = self._select(corpora)
+        answer, tier, embedding = self._cached_answer(
+            question, selected, timings, filters=filters
+        )
+        if answer is not None:
+            return AnswerStream(
+                iter([answer]),
+                started,
+                metadata={"cache": tier, "timings": timings, "citations": []},
+            )
+
+        nodes, prompt_tokens = self._retrieve_timed(
+            question, selected, embedding, timings, filters
+        )
+        streaming = self.streaming_synthesizer.synthesize(question, nodes=nodes)
+        return AnswerStream(
+            streaming.response_gen,
+            started,
+            source_nodes=streaming.source_nodes,
+            metadata={
+                "timings": timings,
+                "prompt_tokens": prompt_tokens,
+                "citations": citations(streaming.source_nodes),
+            },
+            on_complete=lambda text: self._remember(
+                question, selected, text, embedding, filters
+            ),
+        )
+
+
+def citations(nodes):
+    """
+    Source references of the chunks an answer was built from, best first.
+
+    Returns:
+        list: Dicts with the chunk 'id', its 'source' file, 'corpus',
+        'pages' ('3' or '3-4', None for chunks stored without pages),
+        'language' and retrieval 'score'
+    """
+    cited = []
+    for node in nodes:
+        metadata = node.node.metadata
+        start, end = metadata.get("page_start"), metadata.get("page_end")
+        pages = None
+        if start is not None:
+            pages = str(start) if start == end else f"{start}-{end}"
+        cited.append(
+            {
+                "id": node.node.node_id,
+                "source": metadata.get("source"),
+                "corpus": metadata.get("corpus"),
+                "pages": pages,
+                "language": metadata.get("language"),
+                "score": node.score,
+            }
+        )
+    return cited
+
+
+def format_citations(cited) -> str:
+    """One line per cited file, e.g. 'news/report.pdf (p. 3, 5-6)'."""
+    pages = {}
+    for citation in cited:
+        spans = pages.setdefault(citation["source"], [])
+        if citation["pages"] and citation["pages"] not in spans:
+            spans.append(citation["pages"])
+    return "\n".join(
+        f"{source} (p. {', '.join(spans)})" if spans else str(source)
+        for source, spans in pages.items()
+    )
+
+
+def record_timings(timings):
+    """Adds the stage durations of one answered question to telemetry."""
+    for stage, seconds in timings.items():
+        observe_stage(f"rag.{stage}", seconds)
+    observe_stage("rag.turn", sum(timings.values()))
+
+
+class AnswerStream:
+    """
+    Token iterator over a streamed answer that records its latency.
+
+    After iteration, `response` holds the full text, `time_to_first_token`
+    and `total_time` are in seconds and `tokens_per_second` measures the
+    generation rate after the first token.
+    """
+
+    def __init__(self, tokens, started, source_nodes=None, metadata=None, on_complete=None):
+        self._tokens = tokens
+        self._started = started
+        self._on_complete = on_complete
+        self.source_nodes = source_nodes or []
+        self.metadata = metadata or {}
+        self.response = ""
+        self.token_count = 0
+        self.time_to_first_token = None
+        self.total_time = None
+        self.tokens_per_second = None
+
+    def __iter__(self):
+        parts = []
+        for token in self._tokens:
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - self._started
+            self.token_count += 1
+            parts.append(token)
+            yield token
+
+        self.total_time = time.perf_counter() - self._started
+        self.response = "".join(parts)
+        if "cache" not in self.metadata:
+            timings = self.metadata.setdefault("timings", {})
+            timings["synthesize"] = self.total_time - sum(timings.values())
+        record_timings(self.metadata.get("timings", {}))
+        generation_time = self.total_time - (self.time_to_first_token or 0.0)
+        if self.token_count > 1 and generation_time > 0:
+            self.tokens_per_second = (self.token_count - 1) / generation_time
+        if self._on_complete is not None:
+            self._on_complete(self.response)
+
+    def metrics(self) -> dict:
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "total_time": self.total_time,
+            "tokens": self.token_count,
+            "tokens_per_second": self.tokens_per_second,
+        }
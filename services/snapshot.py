@@ -0,0 +1,460 @@
+import datetime
+import json
+import os
+import struct
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Any, List
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from pydantic import PrivateAttr
+
+from services.metadata_filters import matches
+
+SNAPSHOT_MAGIC = b"RAGSNAP\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".ragsnap"
+COMPRESSIONS = ("int8", "pq", "float32")
+# Sections start on 64-byte boundaries so they can be memory-mapped as arrays
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sII")
+_BLOCK = 65_536
+
+
+def snapshot_path(snapshot_dir, index_name, namespace):
+    return Path(snapshot_dir) / f"{index_name}__{namespace}{SNAPSHOT_SUFFIX}"
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _normalized(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _train_codebooks(matrix, subvectors, iterations=12, sample_size=20_000, seed=0):
+    """k-means (up to 256 centroids) in each subspace of a sample of rows."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(matrix), min(sample_size, len(matrix)), replace=False)
+    sample = np.asarray(matrix[np.sort(rows)], dtype=np.float32)
+    sub_dim = sample.shape[1] // subvectors
+    centroids = min(256, len(sample))
+    codebooks = np.empty((subvectors, centroids, sub_dim), dtype=np.float32)
+    for j in range(subvectors):
+        part = sample[:, j * sub_dim : (j + 1) * sub_dim]
+        book = part[rng.choice(len(part), centroids, replace=False)].copy()
+        for _ in range(iterations):
+            labels = _nearest(part, book)
+            sums = np.zeros_like(book)
+            np.add.at(sums, labels, part)
+            sizes = np.bincount(labels, minlength=centroids)
+            # Empty clusters keep their previous centroid
+            filled = sizes > 0
+            book[filled] = sums[filled] / sizes[filled, None]
+        codebooks[j] = book
+    return codebooks
+
+
+def _nearest(part, book):
+    distances = (book**2).sum(axis=1)[None, :] - 2 * part @ book.T
+    return np.argmin(distances, axis=1)
+
+
+def _writer(values):
+    return lambda out, matrix: out.write(values.tobytes())
+
+
+def _pq_encode(block, codebooks):
+    subvectors, _, sub_dim = codebooks.shape
+    codes = np.empty((len(block), subvectors), dtype=np.uint8)
+    for j in range(subvectors):
+        codes[:, j] = _nearest(block[:, j * sub_dim : (j + 1) * sub_dim], codebooks[j])
+    return codes
+
+
+def write_snapshot(path, batches, compression="int8", info=None, pq_sub_dim=8):
+    """
+    Writes vectors and their nodes to a single snapshot file.
+
+    The file starts with a magic string, the format version and a JSON
+    header describing each section (offset, dtype, shape); the sections
+    follow, aligned for memory-mapping. Vectors are L2-normalised and
+    stored as:
+
+    - 'int8': one signed byte per dimension plus a float32 scale per
+      vector (about 4x smaller than float32, cosine error around 1e-3);
+    - 'pq': product quantization, one byte per `pq_sub_dim` dimensions
+      (32x smaller for 8-dimension subvectors, plus about 0.8 MB of
+      codebooks for 768 dimensions), for search-only snapshots;
+    - 'float32': uncompressed.
+
+    Node payloads (ID plus the llama-index metadata dict holding the text)
+    are stored as JSON documents addressed by an offset table.
+
+    Args:
+        batches (iterable): (IDs, vectors, metadata dicts) tuples, as
+            yielded by LocalVectorStore.iter_vectors or
+            PineconeService.iter_vectors
+        info (dict): Extra header entries (index name, manifest, ...)
+
+    Returns:
+        dict: The header written
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError("Unsupported compression: use 'int8', 'pq' or 'float32'.")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=path.parent) as scratch:
+        # First pass: spool vectors and payloads to disk, so memory stays
+        # flat whatever the namespace size
+        vectors_path = Path(scratch) / "vectors.f32"
+        payloads_path = Path(scratch) / "payloads.jsonl"
+        offsets = array("Q", [0])
+        count, dimension = 0, None
+        with open(vectors_path, "wb") as vectors_out, open(payloads_path, "wb") as payloads_out:
+            for ids, vectors, payloads in batches:
+                if not len(ids):
+                    continue
+                vectors = _normalized(np.asarray(vectors, dtype=np.float32))
+                if dimension is None:
+                    dimension = vectors.shape[1]
+                vectors_out.write(vectors.tobytes())
+                for vector_id, metadata in zip(ids, payloads):
+                    data = json.dumps(
+                        {"id": vector_id, "metadata": metadata}, ensure_ascii=False
+                    ).encode("utf-8")
+                    payloads_out.write(data)
+                    offsets.append(offsets[-1] + len(data))
+                count += len(ids)
+
+        dimension = dimension or 0
+        matrix = (
+            np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(count, dimension))
+            if count
+            else np.empty((0, dimension), dtype=np.float32)
+        )
+
+        # Each section is a (name, dtype, shape, writer) entry; writers stream
+        # their bytes block by block and get the spooled matrix as an
+        # argument, so it can be released before the scratch folder goes
+        sections = []
+        if compression == "int8":
+            scales = np.empty(count, dtype=np.float32)
+
+            def int8_codes(out, matrix):
+                for start in range(0, count, _BLOCK):
+                    block = np.asarray(matrix[start : start + _BLOCK])
+                    scale = np.abs(block).max(axis=1) / 127
+                    scale[scale == 0] = 1
+                    scales[start : start + len(block)] = scale
+                    out.write(np.rint(block / scale[:, None]).astype(np.int8).tobytes())
+
+            # Scales are filled while the codes are written, so they come after
+            sections.append(("codes", "int8", (count, dimension), int8_codes))
+            sections.append(("scales", "float32", (count,), _writer(scales)))
+        elif compression == "pq":
+            if dimension % pq_sub_dim:
+                raise ValueError(
+                    f"Dimension {dimension} is not a multiple of pq_sub_dim {pq_sub_dim}."
+                )
+            subvectors = dimension // pq_sub_dim
+            codebooks = (
+                _train_codebooks(matrix, subvectors)
+                if count
+                else np.zeros((subvectors, 1, pq_sub_dim), dtype=np.float32)
+            )
+
+            def pq_codes(out, matrix):
+                for start in range(0, count, _BLOCK):
+                    block = np.asarray(matrix[start : start + _BLOCK])
+                    out.write(_pq_encode(block, codebooks).tobytes())
+
+            sections.append(("codebooks", "float32", codebooks.shape, _writer(codebooks)))
+            sections.append(("codes", "uint8", (count, subvectors), pq_codes))
+        else:
+
+            def float32_vectors(out, matrix):
+                for start in range(0, count, _BLOCK):
+                    out.write(np.asarray(matrix[start : start + _BLOCK]).tobytes())
+
+            sections.append(("vectors", "float32", (count, dimension), float32_vectors))
+
+        def copy_payloads(out, matrix):
+            with open(payloads_path, "rb") as f:
+                while chunk := f.read(1 << 20):
+                    out.write(chunk)
+
+        sections.append(("payload_offsets", "uint64", (count + 1,), _writer(offsets)))
+        sections.append(("payloads", "uint8", (offsets[-1],), copy_payloads))
+
+        layout, offset = {}, 0
+        for name, dtype, shape, _ in sections:
+            layout[name] = {"offset": offset, "dtype": dtype, "shape": list(shape)}
+            offset = _aligned(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+
+        header = {
+            **(info or {}),
+            "version": SNAPSHOT_VERSION,
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "count": count,
+            "dimension": dimension,
+            "metric": "cosine",
+            "compression": compression,
+            "sections": layout,
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        data_start = _aligned(_PREAMBLE.size + len(header_bytes))
+
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header_bytes)))
+            out.write(header_bytes)
+            for name, _, _, write in sections:
+                out.write(b"\0" * (data_start + layout[name]["offset"] - out.tell()))
+                write(out, matrix)
+            out.write(b"\0" * (data_start + offset - out.tell()))
+        del matrix
+    os.replace(tmp_path, path)
+    return header
+
+
+class Snapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+
+    Only the pages touched by a search or a decode are read from disk, so
+    opening a snapshot is instant whatever its size.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            magic, version, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"'{self.path}' is not a snapshot file.")
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(
+                    f"Snapshot version {version} is not supported (expected {SNAPSHOT_VERSION})."
+                )
+            self.header = json.loads(f.read(header_length))
+        data_start = _aligned(_PREAMBLE.size + header_length)
+        self.count = self.header["count"]
+        self.dimension = self.header["dimension"]
+        self.compression = self.header["compression"]
+        self.sections = {}
+        for name, section in self.header["sections"].items():
+            shape = tuple(section["shape"])
+            if not int(np.prod(shape)):
+                self.sections[name] = np.empty(shape, dtype=section["dtype"])
+                continue
+            self.sections[name] = np.memmap(
+                self.path,
+                dtype=section["dtype"],
+                mode="r",
+                offset=data_start + section["offset"],
+                shape=shape,
+            )
+
+    @property
+    def manifest(self):
+        return self.header.get("manifest")
+
+    def payload(self, row) -> dict:
+        offsets = self.sections["payload_offsets"]
+        data = self.sections["payloads"][int(offsets[row]) : int(offsets[row + 1])]
+        return json.loads(data.tobytes())
+
+    def vectors(self, start, stop):
+        """Decompressed (L2-normalised) vectors of rows [start, stop)."""
+        if self.compression == "int8":
+            codes = self.sections["codes"][start:stop].astype(np.float32)
+            return codes * self.sections["scales"][start:stop, None]
+        if self.compression == "pq":
+            codebooks = self.sections["codebooks"]
+            codes = self.sections["codes"][start:stop]
+            return np.concatenate(
+                [codebooks[j][codes[:, j]] for j in range(codebooks.shape[0])], axis=1
+            )
+        return np.asarray(self.sections["vectors"][start:stop])
+
+    def scores(self, query_vector):
+        """Cosine similarity of every row to a query, computed block by block."""
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1)
+        scores = np.empty(self.count, dtype=np.float32)
+        if self.compression == "pq":
+            # Asymmetric distance: one lookup table of partial dot products
+            codebooks = self.sections["codebooks"]
+            subvectors, _, sub_dim = codebooks.shape
+            table = np.einsum("jkd,jd->jk", codebooks, query_vector.reshape(subvectors, sub_dim))
+            columns = np.arange(subvectors)
+        for start in range(0, self.count, _BLOCK):
+            stop = min(start + _BLOCK, self.count)
+            if self.compression == "int8":
+                block = self.sections["codes"][start:stop].astype(np.float32) @ query_vector
+                scores[start:stop] = block * self.sections["scales"][start:stop]
+            elif self.compression == "pq":
+                codes = self.sections["codes"][start:stop]
+                scores[start:stop] = table[columns, codes].sum(axis=1)
+            else:
+                scores[start:stop] = self.sections["vectors"][start:stop] @ query_vector
+        return scores
+
+    def iter_nodes(self, batch_size=1000):
+        """Yields lists of nodes carrying their decompressed embeddings."""
+        for start in range(0, self.count, batch_size):
+            stop = min(start + batch_size, self.count)
+            vectors = self.vectors(start, stop)
+            nodes = []
+            for row, vector in zip(range(start, stop), vectors):
+                node = metadata_dict_to_node(self.payload(row)["metadata"])
+                node.embedding = vector.tolist()
+                nodes.append(node)
+            yield nodes
+
+
+def restore_snapshot(snapshot, vector_store, manifest=None, lexical_index=None, batch_size=1000):
+    """
+    Bulk-loads a snapshot into a vector store.
+
+    The vectors written are the decompressed ones: exact for 'float32' and
+    within about 1e-3 cosine for 'int8'. 'pq' snapshots are search-only and
+    refused: their reconstructions would be stored as if they were real
+    embeddings.
+
+    Args:
+        manifest (IngestionManifest): Replaced by the manifest stored in the
+            snapshot, so the next sync only embeds what changed since. After
+            an 'int8' restore it is marked so the next sync embeds every
+            chunk again; a snapshot without a manifest deletes it, and the
+            namespace is then served as restored.
+        lexical_index (BM25Index): Filled with the snapshot chunks
+
+    Returns:
+        int: Number of vectors restored
+    """
+    if snapshot.compression == "pq":
+        raise ValueError(
+            "PQ snapshots are search-only and cannot be restored; "
+            "export an 'int8' or 'float32' snapshot instead."
+        )
+    restored = 0
+    for nodes in snapshot.iter_nodes(batch_size):
+        vector_store.add(nodes)
+        if lexical_index is not None:
+            lexical_index.add((n.node_id, n.text, n.metadata) for n in nodes)
+        restored += len(nodes)
+        print(f"📦 {restored}/{snapshot.count} vectors restored")
+    if manifest is not None and snapshot.manifest is not None:
+        manifest.load_dict(snapshot.manifest)
+        manifest.lossy_vectors = manifest.lossy_vectors or snapshot.compression != "float32"
+        manifest.save()
+    elif manifest is not None:
+        # The local manifest describes the vectors that were just replaced
+        manifest.clear()
+        manifest.path.unlink(missing_ok=True)
+    return restored
+
+
+class SnapshotVectorStore(BasePydanticVectorStore):
+    """
+    Read-only vector store searching a snapshot file in place.
+
+    Serves a namespace without Pinecone and without re-embedding: the
+    quantized vectors are scanned from the memory map and only the top-k
+    payloads are decoded. Metadata filters are evaluated in Python against
+    the filterable fields, decoded once on the first filtered query.
+    """
+
+    stores_text: bool = True
+    is_embedding_query: bool = True
+
+    path: str
+
+    _snapshot: Any = PrivateAttr()
+    _fields: Any = PrivateAttr(default=None)
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path=str(path), **kwargs)
+        self._snapshot = Snapshot(path)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SnapshotVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return self._snapshot
+
+    def count(self) -> int:
+        return self._snapshot.count
+
+    def fill_lexical_index(self, lexical_index):
+        """Makes a BM25 index hold exactly the chunks of the snapshot."""
+        snapshot = self._snapshot
+        ids = [snapshot.payload(row)["id"] for row in range(snapshot.count)]
+        indexed = lexical_index.ids()
+        extra = list(indexed - set(ids))
+        if extra:
+            lexical_index.remove(extra)
+        missing = [row for row, node_id in enumerate(ids) if node_id not in indexed]
+        if missing:
+            print(f"🔤 Building the lexical index from the snapshot ({len(missing)} chunks)...")
+            nodes = (metadata_dict_to_node(snapshot.payload(r)["metadata"]) for r in missing)
+            lexical_index.add((n.node_id, n.text, n.metadata) for n in nodes)
+
+    def _filter_mask(self, filters):
+        if self._fields is None:
+            # Scalar metadata only: the node content JSON is not needed
+            self._fields = [
+                {
+                    key: value
+                    for key, value in self._snapshot.payload(row)["metadata"].items()
+                    if not key.startswith("_") and isinstance(value, (str, int, float))
+                }
+                for row in range(self._snapshot.count)
+            ]
+        return np.fromiter(
+            (matches(fields, filters) for fields in self._fields),
+            dtype=bool,
+            count=len(self._fields),
+        )
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        raise NotImplementedError("Snapshot vector stores are read-only.")
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        raise NotImplementedError("Snapshot vector stores are read-only.")
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        snapshot = self._snapshot
+        if not snapshot.count:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        scores = snapshot.scores(query.query_embedding)
+        candidates = snapshot.count
+        if query.filters is not None and query.filters.filters:
+            mask = self._filter_mask(query.filters)
+            candidates = int(mask.sum())
+            if not candidates:
+                return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+            scores[~mask] = -np.inf
+        k = min(query.similarity_top_k, candidates)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        nodes = [metadata_dict_to_node(snapshot.payload(r)["metadata"]) for r in top.tolist()]
+        return VectorStoreQueryResult(
+            nodes=nodes,
+            similarities=scores[top].tolist(),
+            ids=[n.node_id for n in nodes],
+        )
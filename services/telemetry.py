@@ -0,0 +1,371 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events.embedding import EmbeddingEndEvent
+from llama_index.core.instrumentation.events.llm import LLMChatEndEvent
+from llama_index.core.instrumentation.span.simple import SimpleSpan
+from llama_index.core.instrumentation.span_handlers import BaseSpanHandler
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimates a quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Thread-safe histograms and counters keyed by metric name and labels.
+
+    Recording is a dictionary lookup and a bisect under a lock, cheap enough
+    to leave on for every request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines, typed = [], set()
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{label_text(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f"{name}_bucket{label_text(labels, [('le', bound)])} {cumulative}"
+                    )
+                lines.append(
+                    f"{name}_bucket{label_text(labels, [('le', '+Inf')])} {histogram.count}"
+                )
+                lines.append(f"{name}_sum{label_text(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, name="rag_stage_seconds", limit=10):
+        """
+        Per-label statistics of a histogram, by total time spent.
+
+        Returns:
+            list: dicts with the labels, count, total, p50 and p95 (seconds)
+        """
+        with self._lock:
+            rows = [
+                {
+                    **dict(labels),
+                    "count": h.count,
+                    "total": h.sum,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                }
+                for (metric, labels), h in self._histograms.items()
+                if metric == name and h.count
+            ]
+        rows.sort(key=lambda r: r["total"], reverse=True)
+        return rows[:limit]
+
+
+METRICS = MetricsRegistry()
+
+
+def observe_stage(stage, seconds):
+    METRICS.observe("rag_stage_seconds", seconds, stage=stage)
+
+
+@contextmanager
+def span(stage):
+    """Times a block into the rag_stage_seconds histogram."""
+    began = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        METRICS.increment("rag_stage_errors_total", stage=stage)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - began)
+
+
+def traced(stage):
+    """Decorator form of span()."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_tokens(stage, prompt=None, completion=None):
+    if prompt:
+        METRICS.increment("rag_tokens_total", prompt, stage=stage, kind="prompt")
+    if completion:
+        METRICS.increment("rag_tokens_total", completion, stage=stage, kind="completion")
+
+
+def record_ollama_tokens(stage, response):
+    """Counts the prompt/generated tokens an Ollama response reports."""
+    get = response.get if isinstance(response, dict) else lambda k: getattr(response, k, None)
+    record_tokens(stage, get("prompt_eval_count"), get("eval_count"))
+
+
+class StageSpanHandler(BaseSpanHandler[SimpleSpan]):
+    """
+    Records the duration of every llama-index span into rag_stage_seconds.
+
+    The stage label is the instrumented method (e.g. 'BaseRetriever.retrieve').
+    Finished spans are not kept, unlike SimpleSpanHandler, so memory stays flat.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StageSpanHandler"
+
+    def new_span(self, id_, bound_args, instance=None, parent_span_id=None, tags=None, **kwargs):
+        return SimpleSpan(id_=id_, parent_id=parent_span_id, tags=tags or {})
+
+    def prepare_to_exit_span(self, id_, bound_args, instance=None, result=None, **kwargs):
+        span_ = self.open_spans.get(id_)
+        if span_ is not None:
+            # Span ids are '<qualified method name>-<uuid>'
+            elapsed = time.time() - span_.start_time.timestamp()
+            observe_stage(id_.partition("-")[0], elapsed)
+        return span_
+
+    def prepare_to_drop_span(self, id_, bound_args, instance=None, err=None, **kwargs):
+        span_ = self.open_spans.get(id_)
+        if span_ is not None:
+            METRICS.increment("rag_stage_errors_total", stage=id_.partition("-")[0])
+        return span_
+
+
+class TokenEventHandler(BaseEventHandler):
+    """Counts LLM prompt/completion tokens and embedded texts from llama-index events."""
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TokenEventHandler"
+
+    def handle(self, event: Any, **kwargs: Any) -> None:
+        if isinstance(event, LLMChatEndEvent) and event.response is not None:
+            raw = event.response.raw or {}
+            record_ollama_tokens("llm", raw)
+        elif isinstance(event, EmbeddingEndEvent):
+            METRICS.increment("rag_embedded_texts_total", len(event.chunks))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def format_summary(rows) -> str:
+    lines = ["📈 Stage timings (total, count, p50, p95):"]
+    for row in rows:
+        lines.append(
+            f"   {row['stage']}: {row['total']:.2f}s, {row['count']}x, "
+            f"p50 {row['p50']:.3f}s, p95 {row['p95']:.3f}s"
+        )
+    return "\n".join(lines)
+
+
+class StartupProfile:
+    """
+    Durations of the startup phases, for the STARTUP_PROFILE report.
+
+    Phases may run in background threads (e.g. model warm-up) and finish
+    after the report is first printed. Each phase is also recorded as a
+    'startup.<phase>' stage.
+    """
+
+    def __init__(self):
+        # CPU time spent before the profile exists: interpreter and imports
+        self.imports = time.process_time()
+        self.began = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        began = time.perf_counter()
+        with self._lock:
+            self.phases[name] = None
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - began
+            with self._lock:
+                self.phases[name] = elapsed
+            observe_stage(f"startup.{name}", elapsed)
+
+    def report(self) -> str:
+        lines = [
+            "🚦 Startup profile:",
+            f"   imports (CPU): {self.imports:.2f}s",
+        ]
+        with self._lock:
+            phases = list(self.phases.items())
+        for name, seconds in phases:
+            if seconds is None:
+                lines.append(f"   {name}: still running")
+            else:
+                lines.append(f"   {name}: {seconds:.2f}s")
+        lines.append(f"   ready after {time.perf_counter() - self.began:.2f}s")
+        return "\n".join(lines)
+
+
+class Telemetry:
+    """
+    Hooks the metrics registry into llama-index and optionally exports it.
+
+    Exposes /metrics on METRICS_HOST:METRICS_PORT (port 0 disables it) and
+    prints a stage summary every METRICS_SUMMARY_INTERVAL seconds (0
+    disables it).
+    """
+
+    _installed = False
+    _install_lock = threading.Lock()
+
+    def __init__(self, port=0, summary_interval=0.0, host="127.0.0.1"):
+        self.install()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._summary_thread = None
+        if port:
+            try:
+                self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"⚠️ Metrics endpoint not started on port {port}: {e}")
+            else:
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, daemon=True).start()
+                print(f"📡 Prometheus metrics on http://{host}:{port}/metrics")
+        if summary_interval > 0:
+            self._summary_thread = threading.Thread(
+                target=self._print_summaries, args=(summary_interval,), daemon=True
+            )
+            self._summary_thread.start()
+
+    @classmethod
+    def from_env(cls, env):
+        """Builds the telemetry configured in EnvLoader, or None when disabled."""
+        if not env.TELEMETRY:
+            return None
+        return cls(
+            port=env.METRICS_PORT,
+            summary_interval=env.METRICS_SUMMARY_INTERVAL,
+            host=env.METRICS_HOST,
+        )
+
+    @classmethod
+    def install(cls):
+        """Registers the span and event handlers on the root dispatcher once."""
+        with cls._install_lock:
+            if cls._installed:
+                return
+            dispatcher = get_dispatcher()
+            dispatcher.add_span_handler(StageSpanHandler())
+            dispatcher.add_event_handler(TokenEventHandler())
+            cls._installed = True
+
+    def _print_summaries(self, interval):
+        while not self._stop.wait(interval):
+            rows = METRICS.summary()
+            if rows:
+                print("\n" + format_summary(rows))
+
+    def close(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from services.local_vector_store import LocalVectorStore
+from services.snapshot import SnapshotVectorStore, snapshot_path
+
+
+def create_vector_store(
+    env, index_name, namespace="default", dimension=768, metadata_cache=None
+):
+    """
+    Builds the vector store selected by VECTOR_BACKEND ('pinecone', 'local'
+    or 'snapshot', a read-only store searching SNAPSHOT_DIR files in place).
+
+    The Pinecone SDK and its llama-index integration are only imported when
+    that backend is selected.
+
+    Returns:
+        BasePydanticVectorStore usable with StorageContext.from_defaults
+    """
+    backend = env.VECTOR_BACKEND
+    if backend == "local":
+        print(f"💽 Opening local vector store '{index_name}/{namespace}'...")
+        return LocalVectorStore(
+            Path(env.LOCAL_VECTOR_DIR),
+            index_name,
+            namespace,
+            ivf_lists=env.LOCAL_IVF_LISTS,
+            nprobe=env.LOCAL_IVF_NPROBE,
+            compact_ratio=env.LOCAL_COMPACT_RATIO,
+        )
+    if backend == "snapshot":
+        path = snapshot_path(env.SNAPSHOT_DIR, index_name, namespace)
+        print(f"📦 Opening snapshot '{path}'...")
+        return SnapshotVectorStore(path)
+    if backend == "pinecone":
+        from llama_index.vector_stores.pinecone import PineconeVectorStore
+
+        from services.pinecone_service import PineconeService
+
+        # One service per process: corpora share its client and index handles
+        pc = PineconeService.shared(env, metadata_cache=metadata_cache)
+        pc.ensure_index(index_name=index_name, dimension=dimension)
+        print(f"🌦️ Connecting to Pinecone index '{index_name}'...")
+        return PineconeVectorStore(
+            pinecone_index=pc.index(index_name), namespace=namespace
+        )
+    raise ValueError(
+        "Unsupported VECTOR_BACKEND: use 'pinecone', 'local' or 'snapshot'."
+    )
+
+
+def vector_count_key(index_name, namespace):
+    return f"{index_name}/{namespace}:vector_count"
+
+
+def count_vectors(vector_store, namespace="default", metadata_cache=None, index_name=None):
+    """
+    Returns how many vectors the namespace of a vector store holds.
+
+    With a `metadata_cache`, a fresh non-zero Pinecone count is reused instead
+    of calling describe_index_stats. Empty namespaces are never cached.
+    """
+    if isinstance(vector_store, (LocalVectorStore, SnapshotVectorStore)):
+        return vector_store.count()
+    key = vector_count_key(index_name, namespace)
+    if metadata_cache is not None:
+        cached = metadata_cache.get(key)
+        if cached:
+            return cached
+    stats = vector_store.client.describe_index_stats()
+    count = stats.get("namespaces", {}).get(namespace, {}).get("vector_count", 0)
+    if metadata_cache is not None and count:
+        metadata_cache.put(key, count)
+    return count
@@ -0,0 +1,175 @@
+import argparse
+import time
+from pathlib import Path
+
+from services.bm25_index import BM25Index
+from services.env_loader import EnvLoader
+from services.index_metadata import IndexMetadataCache
+from services.ingestion_manifest import IngestionCheckpoint, IngestionManifest
+from services.local_vector_store import LocalVectorStore
+from services.rag_engine import CORPORA
+from services.snapshot import (
+    COMPRESSIONS,
+    Snapshot,
+    restore_snapshot,
+    snapshot_path,
+    write_snapshot,
+)
+from services.vector_store_factory import (
+    count_vectors,
+    create_vector_store,
+    vector_count_key,
+)
+
+
+def source_vectors(env, corpus):
+    """Batches of (IDs, vectors, metadata) of a corpus namespace."""
+    backend = env.VECTOR_BACKEND
+    if backend == "local":
+        store = LocalVectorStore(Path(env.LOCAL_VECTOR_DIR), corpus.index_name, corpus.namespace)
+        return store.iter_vectors()
+    if backend == "pinecone":
+        from services.pinecone_service import PineconeService
+
+        return PineconeService.shared(env).iter_vectors(corpus.index_name, corpus.namespace)
+    raise SystemExit("Snapshots are exported from the 'pinecone' or 'local' backend.")
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def export(env, args):
+    corpus = CORPORA[args.corpus]
+    output = Path(
+        args.output or snapshot_path(env.SNAPSHOT_DIR, corpus.index_name, corpus.namespace)
+    )
+    manifest = IngestionManifest.for_namespace(
+        corpus.index_name, corpus.namespace, cache_dir=env.CACHE_DIR
+    )
+    began = time.perf_counter()
+    header = write_snapshot(
+        output,
+        source_vectors(env, corpus),
+        compression=args.compression or env.SNAPSHOT_COMPRESSION,
+        info={
+            "corpus": corpus.name,
+            "index_name": corpus.index_name,
+            "namespace": corpus.namespace,
+            "source": env.VECTOR_BACKEND,
+            "manifest": manifest.as_dict() if manifest.exists() else None,
+        },
+    )
+    raw = header["count"] * header["dimension"] * 4
+    vectors = sum(
+        Snapshot(output).sections[name].nbytes
+        for name in ("codes", "scales", "codebooks", "vectors")
+        if name in header["sections"]
+    )
+    print(
+        f"📦 {header['count']} vectors of '{corpus.name}' written to '{output}' "
+        f"in {time.perf_counter() - began:.2f}s: {format_size(output.stat().st_size)}, "
+        f"vectors {format_size(vectors)} ({header['compression']}, "
+        f"{raw / max(vectors, 1):.1f}x smaller than float32)."
+    )
+
+
+def restore(env, args):
+    corpus = CORPORA[args.corpus]
+    path = args.input or snapshot_path(env.SNAPSHOT_DIR, corpus.index_name, corpus.namespace)
+    snapshot = Snapshot(path)
+    if env.VECTOR_BACKEND == "snapshot":
+        raise SystemExit("Restore into the 'pinecone' or 'local' backend.")
+    if snapshot.compression == "pq":
+        raise SystemExit(
+            f"'{path}' is a PQ snapshot: it can only be searched (VECTOR_BACKEND="
+            "snapshot). Export an 'int8' or 'float32' snapshot to restore."
+        )
+
+    vector_store = create_vector_store(
+        env, corpus.index_name, corpus.namespace, dimension=snapshot.dimension
+    )
+    existing = count_vectors(vector_store, corpus.namespace, index_name=corpus.index_name)
+    if existing and not args.replace:
+        raise SystemExit(
+            f"Namespace '{corpus.index_name}/{corpus.namespace}' already holds "
+            f"{existing} vectors; pass --replace to clear it first."
+        )
+    if existing:
+        print(f"🗑️ Clearing {existing} vectors...")
+        vector_store.clear()
+
+    manifest = IngestionManifest.for_namespace(
+        corpus.index_name, corpus.namespace, cache_dir=env.CACHE_DIR
+    )
+    IngestionCheckpoint.for_manifest(manifest).clear()
+    lexical_index = None
+    if env.RETRIEVAL_MODE != "dense":
+        lexical_index = BM25Index.for_namespace(
+            corpus.index_name, corpus.namespace, cache_dir=env.CACHE_DIR
+        )
+        lexical_index.remove(list(lexical_index.ids()))
+
+    began = time.perf_counter()
+    restored = restore_snapshot(snapshot, vector_store, manifest, lexical_index)
+    metadata_cache = IndexMetadataCache.from_env(env)
+    if metadata_cache is not None:
+        metadata_cache.invalidate(vector_count_key(corpus.index_name, corpus.namespace))
+    print(
+        f"✅ {restored} vectors restored into '{corpus.index_name}/{corpus.namespace}' "
+        f"in {time.perf_counter() - began:.2f}s."
+    )
+    if snapshot.manifest is None:
+        print("⚠️ The snapshot has no manifest: the next start will not sync this namespace.")
+    elif snapshot.compression != "float32":
+        print("📦 Restored vectors are approximate: the next start embeds the corpus again.")
+
+
+def info(env, args):
+    snapshot = Snapshot(args.path)
+    header = snapshot.header
+    print(f"📦 {args.path} (format v{header['version']}, created {header['created']})")
+    for key in ("corpus", "index_name", "namespace", "source", "count", "dimension", "compression"):
+        print(f"   {key}: {header.get(key)}")
+    for name, section in header["sections"].items():
+        print(f"   section {name}: {section['dtype']} {tuple(section['shape'])}")
+    files = (snapshot.manifest or {}).get("files", {})
+    print(f"   manifest: {len(files)} files" if snapshot.manifest else "   manifest: none")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export a corpus namespace to a snapshot file, or restore one."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write a namespace to a snapshot")
+    export_parser.add_argument("--corpus", choices=sorted(CORPORA), required=True)
+    export_parser.add_argument("--output", help="Snapshot file (in SNAPSHOT_DIR by default)")
+    export_parser.add_argument(
+        "--compression", choices=COMPRESSIONS, help="Defaults to SNAPSHOT_COMPRESSION"
+    )
+
+    restore_parser = commands.add_parser(
+        "restore", help="Bulk-load a snapshot into the configured VECTOR_BACKEND"
+    )
+    restore_parser.add_argument("--corpus", choices=sorted(CORPORA), required=True)
+    restore_parser.add_argument("--input", help="Snapshot file (in SNAPSHOT_DIR by default)")
+    restore_parser.add_argument(
+        "--replace", action="store_true", help="Clear a non-empty namespace first"
+    )
+
+    info_parser = commands.add_parser("info", help="Describe a snapshot file")
+    info_parser.add_argument("path")
+
+    args = parser.parse_args()
+    # Describing a file needs no credentials
+    env = EnvLoader() if args.command != "info" else None
+    {"export": export, "restore": restore, "info": info}[args.command](env, args)
+
+
+if __name__ == "__main__":
+    main()